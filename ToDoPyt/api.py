@@ -1,24 +1,156 @@
 # api.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, make_response, stream_with_context
+import queue
+import time
 from flask_cors import CORS
 import database as db
 from database import StatusTarefa
+import api_comum as comum
+import metricas
 
 app = Flask(__name__)
 CORS(app) # Permite a comunicação com o frontend
 
+# --- Métricas de desempenho (GET /metrics) ---
+metricas.registrar_coletor("todo_db_pool", db.estatisticas_pool)
+metricas.registrar_coletor("todo_cache", db.estatisticas_cache)
+
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def _medir_requisicao(resposta):
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        # O padrão da rota ('/tarefas/<int:id>'), não a URL: uma série por rota, não por id
+        rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+        tamanho = None if resposta.is_streamed else resposta.content_length
+        metricas.observar_requisicao(rota, request.method, resposta.status_code, inicio, tamanho)
+    return resposta
+
 # --- Endpoints da API REST ---
 
+def _com_etag(gerar_resposta):
+    """GET condicional: 304 se o If-None-Match do cliente bate com a revisão atual das tarefas."""
+    revisao = db.revisao_atual()
+    etag = comum.etag(revisao)
+    if request.if_none_match.contains(etag):
+        resposta = make_response('', 304)
+    else:
+        # O corpo vem do cache só se foi lido nesta revisão (ou depois): nunca mais velho que o ETag
+        with db.lendo_na_revisao(revisao):
+            resposta = make_response(gerar_resposta())
+        if resposta.status_code != 200:
+            return resposta
+    resposta.set_etag(etag)
+    # Permite guardar a resposta, mas obriga a revalidar (o navegador manda If-None-Match sozinho)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+def _json(texto):
+    """Resposta com o JSON já serializado por api_comum (sem passar por dicionários e jsonify)."""
+    return Response(texto, mimetype='application/json')
+
+def _stream_json(ativo):
+    """Lista completa enviada enquanto o cursor é lido: memória constante, primeiro byte na hora."""
+    codificador = comum.ListaJsonEmPartes(gzip=comum.aceita_gzip(request.headers))
+
+    def gerar():
+        yield codificador.inicio()
+        for lote in db.iterar_tarefas(ativo):
+            yield codificador.lote(lote)
+        yield codificador.fim()
+
+    return Response(gerar(), headers=codificador.cabecalhos())
+
+def _listar_ativas():
+    if comum.paginado(request.args):
+        params, erro = comum.ler_paginacao(request.args)
+        if erro:
+            return jsonify({'erro': erro}), 400
+        return _json(comum.pagina(*db.listar_tarefas_paginado(**params)))
+    if comum.quer_stream(request.args):
+        return _stream_json(True)
+    tarefas = db.listar_tarefas()
+    return _json(comum.lista_json(tarefas))
+
+def _listar_excluidas():
+    if comum.paginado(request.args):
+        params, erro = comum.ler_paginacao(request.args)
+        if erro:
+            return jsonify({'erro': erro}), 400
+        return _json(comum.pagina(*db.listar_tarefas_excluidas_paginado(**params)))
+    if comum.quer_stream(request.args):
+        return _stream_json(False)
+    tarefas = db.listar_tarefas_excluidas()
+    return _json(comum.lista_json(tarefas))
+
 @app.route('/tarefas', methods=['GET'])
 def get_tarefas_ativas():
-    tarefas = db.listar_tarefas()
-    return jsonify([task.__dict__ for task in tarefas])
+    return _com_etag(_listar_ativas)
 
 @app.route('/tarefas/excluidas', methods=['GET'])
 def get_tarefas_excluidas():
     """NOVO ENDPOINT: para a lixeira."""
-    tarefas = db.listar_tarefas_excluidas()
-    return jsonify([task.__dict__ for task in tarefas])
+    return _com_etag(_listar_excluidas)
+
+def _buscar():
+    params, erro = comum.ler_busca(request.args)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    return _json(comum.pagina_busca(*db.buscar_tarefas(**params)))
+
+@app.route('/tarefas/search', methods=['GET'])
+def buscar_tarefas():
+    """Busca nos títulos: ?q=texto[&lixeira=1][&offset=0&limit=100], das mais relevantes para as menos."""
+    return _com_etag(_buscar)
+
+@app.route('/tarefas/stats', methods=['GET'])
+def get_estatisticas():
+    """Totais por status e da lixeira, dos contadores mantidos pelo banco (sem baixar as listas)."""
+    return _com_etag(lambda: jsonify(comum.estatisticas(*db.contar_tarefas())))
+
+@app.route('/tarefas/changes', methods=['GET'])
+def get_alteracoes():
+    """Sincronização incremental: só o que mudou desde a revisão que o cliente já tem."""
+    desde, erro = comum.ler_desde(request.args)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    return _json(comum.alteracoes(*db.listar_alteracoes(desde)))
+
+@app.route('/tarefas/revisao', methods=['GET'])
+def get_revisao():
+    """Revisão atual, para o cliente saber de onde pedir /changes depois de carregar as páginas."""
+    return jsonify({'revisao': db.revisao_atual()})
+
+@app.route('/tarefas/stream', methods=['GET'])
+def stream_alteracoes():
+    """Server-Sent Events: um evento 'revisao' a cada escrita confirmada nas tarefas.
+
+    Cada cliente ligado ocupa uma thread; rode o gunicorn com workers gthread ou gevent.
+    """
+    fila = db.assinar_alteracoes()
+    revisao_inicial = db.revisao_atual()
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            yield comum.evento_sse(revisao_inicial)
+            while True:
+                try:
+                    revisao = fila.get(timeout=comum.SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield comum.evento_sse(revisao)
+        finally:
+            db.cancelar_assinatura(fila)
+
+    return Response(stream_with_context(gerar()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
 @app.route('/tarefas', methods=['POST'])
 def add_tarefa():
@@ -26,7 +158,7 @@ def add_tarefa():
     if not dados or not dados.get('text'):
         return jsonify({'erro': 'O texto da tarefa é obrigatório'}), 400
     nova_tarefa = db.adicionar_tarefa(dados['text'])
-    return jsonify(nova_tarefa.__dict__), 201
+    return jsonify(nova_tarefa._asdict()), 201
 
 @app.route('/tarefas/<int:id>/status', methods=['PUT'])
 def update_tarefa_status(id):
@@ -36,24 +168,80 @@ def update_tarefa_status(id):
         novo_status_enum = StatusTarefa(novo_status_str)
     except ValueError:
         return jsonify({'erro': 'Status inválido'}), 400
-    if db.atualizar_status(id, novo_status_enum):
+    if comum.id_valido(id) and db.atualizar_status(id, novo_status_enum):
         return jsonify({'sucesso': True})
     return jsonify({'erro': 'Tarefa não encontrada'}), 404
 
 @app.route('/tarefas/<int:id>', methods=['DELETE'])
 def mover_para_lixeira(id):
     """Este endpoint agora faz a exclusão LÓGICA."""
-    if db.desativar_tarefa(id):
+    if comum.id_valido(id) and db.desativar_tarefa(id):
         return jsonify({'sucesso': True})
     return jsonify({'erro': 'Tarefa não encontrada'}), 404
 
 @app.route('/tarefas/<int:id>/recuperar', methods=['PUT'])
 def recuperar_tarefa_da_lixeira(id):
     """NOVO ENDPOINT: para restaurar uma tarefa."""
-    if db.recuperar_tarefa(id):
+    if comum.id_valido(id) and db.recuperar_tarefa(id):
         return jsonify({'sucesso': True})
     return jsonify({'erro': 'Tarefa não encontrada na lixeira'}), 404
 
+# --- Endpoints em lote: um único round trip e uma única transação para N tarefas ---
+
+@app.route('/tarefas/batch', methods=['POST'])
+def add_tarefas_em_lote():
+    itens = (request.get_json(silent=True) or {}).get('tarefas')
+    erro = comum.validar_lote(itens)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    validos, titulos = comum.titulos_validos(itens)
+    chaves, erro = comum.ler_chaves_criacao(itens, validos)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    novas = db.adicionar_tarefas(titulos, chaves)
+    return jsonify({'resultados': comum.resultados_criacao(len(itens), validos, novas)})
+
+@app.route('/tarefas/status/batch', methods=['PUT'])
+def update_status_em_lote():
+    itens = (request.get_json(silent=True) or {}).get('itens')
+    erro = comum.validar_lote(itens)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    mudancas, resultados = comum.ler_mudancas_status(itens)
+    atualizados = db.atualizar_status_em_lote(mudancas)
+    return jsonify({'resultados': comum.completar_resultados_status(resultados, atualizados)})
+
+@app.route('/tarefas/lixeira/batch', methods=['PUT'])
+def mover_para_lixeira_em_lote():
+    ids, erro = comum.ler_ids(request.get_json(silent=True))
+    if erro:
+        return jsonify({'erro': erro}), 400
+    encontrados = db.desativar_tarefas(ids)
+    return jsonify({'resultados': comum.resultados_por_id(ids, encontrados, 'Tarefa não encontrada')})
+
+@app.route('/tarefas/recuperar/batch', methods=['PUT'])
+def recuperar_da_lixeira_em_lote():
+    ids, erro = comum.ler_ids(request.get_json(silent=True))
+    if erro:
+        return jsonify({'erro': erro}), 400
+    encontrados = db.recuperar_tarefas(ids)
+    return jsonify({'resultados': comum.resultados_por_id(ids, encontrados, 'Tarefa não encontrada na lixeira')})
+
+@app.route('/pool', methods=['GET'])
+def get_estatisticas_pool():
+    """Estatísticas do pool de conexões deste worker (para dimensionar DB_POOL_MAX)."""
+    return jsonify(db.estatisticas_pool())
+
+@app.route('/metrics', methods=['GET'])
+def get_metricas():
+    """Métricas deste worker no formato do Prometheus."""
+    return Response(metricas.texto(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache', methods=['GET'])
+def get_estatisticas_cache():
+    """Acertos e faltas do cache das listagens."""
+    return jsonify(db.estatisticas_cache())
+
 if __name__ == '__main__':
     db.init_db()
     app.run(debug=True)
\ No newline at end of file
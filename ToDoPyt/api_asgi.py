@@ -0,0 +1,256 @@
+# api_asgi.py
+# Mesmas rotas de api.py, servidas por ASGI (Quart) sobre o database_async (asyncpg).
+# Uma requisição esperando o PostgreSQL não prende thread: um processo atende milhares de conexões.
+#
+# Para rodar:  uvicorn api_asgi:app --host 0.0.0.0 --port 5000 --workers 2
+# As migrações continuam em database.init_db() (rodar 'python api_asgi.py' uma vez as aplica).
+import asyncio
+import time
+
+from quart import Quart, g, request, jsonify, make_response
+from quart_cors import cors
+
+import database as db
+import database_async as adb
+from database import StatusTarefa
+import api_comum as comum
+import metricas
+
+app = Quart(__name__)
+app = cors(app, allow_origin="*") # Permite a comunicação com o frontend
+
+@app.before_serving
+async def iniciar():
+    await adb.abrir_pool()
+
+@app.after_serving
+async def encerrar():
+    await adb.fechar_pool()
+
+# --- Métricas de desempenho (GET /metrics) ---
+metricas.registrar_coletor("todo_db_pool", adb.estatisticas_pool)
+metricas.registrar_coletor("todo_cache", db.estatisticas_cache)
+
+@app.before_request
+async def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+async def _medir_requisicao(resposta):
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+        metricas.observar_requisicao(rota, request.method, resposta.status_code, inicio, resposta.content_length)
+    return resposta
+
+# --- Endpoints da API REST ---
+
+async def _com_etag(gerar_resposta):
+    """GET condicional: 304 se o If-None-Match do cliente bate com a revisão atual das tarefas."""
+    revisao = await adb.revisao_atual()
+    etag = comum.etag(revisao)
+    if request.if_none_match.contains(etag):
+        resposta = await make_response('', 304)
+    else:
+        # O corpo vem do cache só se foi lido nesta revisão (ou depois): nunca mais velho que o ETag
+        with db.lendo_na_revisao(revisao):
+            resposta = await make_response(await gerar_resposta())
+        if resposta.status_code != 200:
+            return resposta
+    resposta.set_etag(etag)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+def _json(texto):
+    """Resposta com o JSON já serializado por api_comum (sem passar por dicionários e jsonify)."""
+    return texto, 200, {'Content-Type': 'application/json'}
+
+async def _stream_json(ativo):
+    codificador = comum.ListaJsonEmPartes(gzip=comum.aceita_gzip(request.headers))
+
+    async def gerar():
+        yield codificador.inicio()
+        async for lote in adb.iterar_tarefas(ativo):
+            yield codificador.lote(lote)
+        yield codificador.fim()
+
+    resposta = await make_response(gerar(), 200, codificador.cabecalhos())
+    resposta.timeout = None
+    return resposta
+
+async def _listar_ativas():
+    if comum.paginado(request.args):
+        params, erro = comum.ler_paginacao(request.args)
+        if erro:
+            return jsonify({'erro': erro}), 400
+        return _json(comum.pagina(*await adb.listar_tarefas_paginado(**params)))
+    if comum.quer_stream(request.args):
+        return await _stream_json(True)
+    tarefas = await adb.listar_tarefas()
+    return _json(comum.lista_json(tarefas))
+
+async def _listar_excluidas():
+    if comum.paginado(request.args):
+        params, erro = comum.ler_paginacao(request.args)
+        if erro:
+            return jsonify({'erro': erro}), 400
+        return _json(comum.pagina(*await adb.listar_tarefas_excluidas_paginado(**params)))
+    if comum.quer_stream(request.args):
+        return await _stream_json(False)
+    tarefas = await adb.listar_tarefas_excluidas()
+    return _json(comum.lista_json(tarefas))
+
+@app.route('/tarefas', methods=['GET'])
+async def get_tarefas_ativas():
+    return await _com_etag(_listar_ativas)
+
+@app.route('/tarefas/excluidas', methods=['GET'])
+async def get_tarefas_excluidas():
+    return await _com_etag(_listar_excluidas)
+
+async def _buscar():
+    params, erro = comum.ler_busca(request.args)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    return _json(comum.pagina_busca(*await adb.buscar_tarefas(**params)))
+
+@app.route('/tarefas/search', methods=['GET'])
+async def buscar_tarefas():
+    return await _com_etag(_buscar)
+
+async def _estatisticas():
+    return jsonify(comum.estatisticas(*await adb.contar_tarefas()))
+
+@app.route('/tarefas/stats', methods=['GET'])
+async def get_estatisticas():
+    return await _com_etag(_estatisticas)
+
+@app.route('/tarefas/changes', methods=['GET'])
+async def get_alteracoes():
+    desde, erro = comum.ler_desde(request.args)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    return _json(comum.alteracoes(*await adb.listar_alteracoes(desde)))
+
+@app.route('/tarefas/revisao', methods=['GET'])
+async def get_revisao():
+    return jsonify({'revisao': await adb.revisao_atual()})
+
+@app.route('/tarefas/stream', methods=['GET'])
+async def stream_alteracoes():
+    """Server-Sent Events. Aqui cada cliente ligado custa só uma fila, não uma thread."""
+    fila = adb.assinar_alteracoes()
+    revisao_inicial = await adb.revisao_atual()
+
+    async def gerar():
+        try:
+            yield b"retry: 3000\n\n"
+            yield comum.evento_sse(revisao_inicial).encode()
+            while True:
+                try:
+                    revisao = await asyncio.wait_for(fila.get(), timeout=comum.SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield comum.evento_sse(revisao).encode()
+        finally:
+            adb.cancelar_assinatura(fila)
+
+    resposta = await make_response(gerar(), 200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    resposta.timeout = None
+    return resposta
+
+@app.route('/tarefas', methods=['POST'])
+async def add_tarefa():
+    dados = await request.get_json()
+    if not dados or not dados.get('text'):
+        return jsonify({'erro': 'O texto da tarefa é obrigatório'}), 400
+    nova_tarefa = await adb.adicionar_tarefa(dados['text'])
+    return jsonify(nova_tarefa._asdict()), 201
+
+@app.route('/tarefas/<int:id>/status', methods=['PUT'])
+async def update_tarefa_status(id):
+    dados = await request.get_json()
+    novo_status_str = dados.get('status')
+    try:
+        novo_status_enum = StatusTarefa(novo_status_str)
+    except ValueError:
+        return jsonify({'erro': 'Status inválido'}), 400
+    if comum.id_valido(id) and await adb.atualizar_status(id, novo_status_enum):
+        return jsonify({'sucesso': True})
+    return jsonify({'erro': 'Tarefa não encontrada'}), 404
+
+@app.route('/tarefas/<int:id>', methods=['DELETE'])
+async def mover_para_lixeira(id):
+    """Exclusão LÓGICA, como em api.py."""
+    if comum.id_valido(id) and await adb.desativar_tarefa(id):
+        return jsonify({'sucesso': True})
+    return jsonify({'erro': 'Tarefa não encontrada'}), 404
+
+@app.route('/tarefas/<int:id>/recuperar', methods=['PUT'])
+async def recuperar_tarefa_da_lixeira(id):
+    if comum.id_valido(id) and await adb.recuperar_tarefa(id):
+        return jsonify({'sucesso': True})
+    return jsonify({'erro': 'Tarefa não encontrada na lixeira'}), 404
+
+# --- Endpoints em lote ---
+
+@app.route('/tarefas/batch', methods=['POST'])
+async def add_tarefas_em_lote():
+    itens = (await request.get_json(silent=True) or {}).get('tarefas')
+    erro = comum.validar_lote(itens)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    validos, titulos = comum.titulos_validos(itens)
+    chaves, erro = comum.ler_chaves_criacao(itens, validos)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    novas = await adb.adicionar_tarefas(titulos, chaves)
+    return jsonify({'resultados': comum.resultados_criacao(len(itens), validos, novas)})
+
+@app.route('/tarefas/status/batch', methods=['PUT'])
+async def update_status_em_lote():
+    itens = (await request.get_json(silent=True) or {}).get('itens')
+    erro = comum.validar_lote(itens)
+    if erro:
+        return jsonify({'erro': erro}), 400
+    mudancas, resultados = comum.ler_mudancas_status(itens)
+    atualizados = await adb.atualizar_status_em_lote(mudancas)
+    return jsonify({'resultados': comum.completar_resultados_status(resultados, atualizados)})
+
+@app.route('/tarefas/lixeira/batch', methods=['PUT'])
+async def mover_para_lixeira_em_lote():
+    ids, erro = comum.ler_ids(await request.get_json(silent=True))
+    if erro:
+        return jsonify({'erro': erro}), 400
+    encontrados = await adb.desativar_tarefas(ids)
+    return jsonify({'resultados': comum.resultados_por_id(ids, encontrados, 'Tarefa não encontrada')})
+
+@app.route('/tarefas/recuperar/batch', methods=['PUT'])
+async def recuperar_da_lixeira_em_lote():
+    ids, erro = comum.ler_ids(await request.get_json(silent=True))
+    if erro:
+        return jsonify({'erro': erro}), 400
+    encontrados = await adb.recuperar_tarefas(ids)
+    return jsonify({'resultados': comum.resultados_por_id(ids, encontrados, 'Tarefa não encontrada na lixeira')})
+
+@app.route('/pool', methods=['GET'])
+async def get_estatisticas_pool():
+    return jsonify(adb.estatisticas_pool())
+
+@app.route('/metrics', methods=['GET'])
+async def get_metricas():
+    return metricas.texto(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+@app.route('/cache', methods=['GET'])
+async def get_estatisticas_cache():
+    return jsonify(db.estatisticas_cache())
+
+if __name__ == '__main__':
+    import uvicorn
+    db.init_db()
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,252 @@
+# api_comum.py
+# Regras de entrada e formato de saída compartilhadas pela API Flask (api.py) e pela ASGI (api_asgi.py).
+# Nada aqui depende do framework: as funções recebem dicionários e devolvem dados ou mensagens de erro.
+import json
+import zlib
+from json.encoder import encode_basestring_ascii
+
+from database import StatusTarefa, LIMITE_LOTE, LIMITE_PAGINA_MAXIMO, LIMITE_PAGINA_PADRAO
+
+# --- Serialização direta das tarefas ---
+# Mesmo texto que o jsonify produziria (chaves em ordem alfabética, compacto, ASCII), mas escrito
+# direto da tupla Tarefa, sem montar um dicionário por linha.
+
+_STATUS_JSON = {status.value: encode_basestring_ascii(status.value) for status in StatusTarefa}
+_BOOL_JSON = ('false', 'true')
+
+def tarefa_json(task) -> str:
+    id_tarefa, titulo, status, ativo = task
+    return '{"ativo":%s,"id":%d,"status":%s,"titulo":%s}' % (
+        _BOOL_JSON[ativo], id_tarefa,
+        _STATUS_JSON.get(status) or encode_basestring_ascii(status), encode_basestring_ascii(titulo),
+    )
+
+def lista_json(tarefas) -> str:
+    return "[" + ",".join(map(tarefa_json, tarefas)) + "]"
+
+# Intervalo (s) entre comentários de keep-alive no stream, para proxies não cortarem a conexão
+SSE_KEEPALIVE = 15
+
+def paginado(args):
+    """Clientes antigos não mandam parâmetros e continuam recebendo a lista simples."""
+    return any(p in args for p in ('after_id', 'limit', 'status'))
+
+def ler_paginacao(args):
+    """Lê after_id, limit e status da query string. Retorna (params, mensagem de erro)."""
+    try:
+        # Sem o 'type=' do Flask, que trocaria valores inválidos pelo padrão em silêncio
+        after_id = int(args['after_id']) if args.get('after_id') else None
+        limit = int(args.get('limit') or LIMITE_PAGINA_PADRAO)
+        status_str = args.get('status')
+        status = StatusTarefa(status_str) if status_str else None
+    except ValueError:
+        return None, 'Parâmetros de paginação inválidos'
+    if limit < 1 or limit > LIMITE_PAGINA_MAXIMO:
+        return None, f'limit deve estar entre 1 e {LIMITE_PAGINA_MAXIMO}'
+    if after_id is not None and not id_valido(after_id):
+        return None, 'after_id fora da faixa dos ids'
+    return {'after_id': after_id, 'limit': limit, 'status': status}, None
+
+# Tamanho máximo (em caracteres) do texto buscado
+LIMITE_TEXTO_BUSCA = 200
+
+def ler_busca(args):
+    """Lê q, lixeira, offset e limit de /tarefas/search. Retorna (params, mensagem de erro)."""
+    q = (args.get('q') or '').strip()
+    if not q:
+        return None, 'Informe o texto a buscar em q'
+    if len(q) > LIMITE_TEXTO_BUSCA:
+        return None, f'q pode ter no máximo {LIMITE_TEXTO_BUSCA} caracteres'
+    try:
+        offset = int(args.get('offset') or 0)
+        limit = int(args.get('limit') or LIMITE_PAGINA_PADRAO)
+    except ValueError:
+        return None, 'Parâmetros de paginação inválidos'
+    if offset < 0 or limit < 1 or limit > LIMITE_PAGINA_MAXIMO:
+        return None, f'offset não pode ser negativo e limit deve estar entre 1 e {LIMITE_PAGINA_MAXIMO}'
+    return {'q': q, 'ativo': args.get('lixeira') not in ('1', 'true'), 'offset': offset, 'limit': limit}, None
+
+def ler_desde(args):
+    try:
+        return int(args.get('since') or 0), None
+    except ValueError:
+        return None, 'since deve ser um número inteiro'
+
+def quer_stream(args):
+    """?stream=1 na lista simples: resposta enviada aos pedaços, direto do cursor."""
+    return args.get('stream') in ('1', 'true')
+
+def aceita_gzip(headers):
+    return 'gzip' in headers.get('Accept-Encoding', '')
+
+class ListaJsonEmPartes:
+    """Codifica uma lista JSON de tarefas um lote por vez, opcionalmente em gzip.
+
+    Usada pelos dois servidores: inicio(), lote(tarefas) a cada lote do cursor e fim().
+    Cada chamada devolve os bytes já prontos para ir ao cliente.
+    """
+
+    def __init__(self, gzip):
+        # wbits=31: formato gzip; Z_SYNC_FLUSH a cada lote para o cliente não esperar o fim
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        self._primeiro = True
+
+    def cabecalhos(self):
+        cabecalhos = {'Content-Type': 'application/json'}
+        if self._compressor:
+            cabecalhos.update({'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+        return cabecalhos
+
+    def _saida(self, texto):
+        dados = texto.encode()
+        if self._compressor:
+            dados = self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return dados
+
+    def inicio(self):
+        return self._saida("[")
+
+    def lote(self, tarefas):
+        if not tarefas:
+            return b""
+        texto = ",".join(map(tarefa_json, tarefas))
+        if not self._primeiro:
+            texto = "," + texto
+        self._primeiro = False
+        return self._saida(texto)
+
+    def fim(self):
+        dados = self._saida("]")
+        if self._compressor:
+            dados += self._compressor.flush()
+        return dados
+
+def estatisticas(revisao, contagens):
+    """Totais de /tarefas/stats a partir de {(status, ativo): total}; status sem tarefas aparecem com 0."""
+    resultado = {'revisao': revisao}
+    for chave, ativo in (('ativas', True), ('excluidas', False)):
+        por_status = {status.value: 0 for status in StatusTarefa}
+        for (status, ativo_contagem), total in contagens.items():
+            if ativo_contagem == ativo and total:
+                por_status[status] = total
+        resultado[chave] = {'total': sum(por_status.values()), 'por_status': por_status}
+    return resultado
+
+def pagina(tarefas, proximo_cursor) -> str:
+    """JSON de {'proximo_cursor', 'tarefas'}."""
+    return '{"proximo_cursor":%s,"tarefas":%s}' % (json.dumps(proximo_cursor), lista_json(tarefas))
+
+def pagina_busca(tarefas, proximo_offset, truncada) -> str:
+    """JSON de {'proximo_cursor', 'tarefas', 'truncada'}: truncada diz que só parte do que casou foi ordenada."""
+    return '{"proximo_cursor":%s,"tarefas":%s,"truncada":%s}' % (
+        json.dumps(proximo_offset), lista_json(tarefas), json.dumps(bool(truncada)))
+
+def alteracoes(revisao, tarefas) -> str:
+    """JSON de {'ativas', 'excluidas', 'revisao'}."""
+    return '{"ativas":%s,"excluidas":%s,"revisao":%d}' % (
+        lista_json(task for task in tarefas if task.ativo),
+        lista_json(task for task in tarefas if not task.ativo),
+        revisao,
+    )
+
+def etag(revisao):
+    return f"r{revisao}"
+
+def evento_sse(revisao):
+    return f"event: revisao\ndata: {json.dumps({'revisao': revisao})}\n\n"
+
+# --- Lotes ---
+
+def validar_lote(itens):
+    if not isinstance(itens, list) or not itens:
+        return 'A lista de itens é obrigatória'
+    if len(itens) > LIMITE_LOTE:
+        return f'Máximo de {LIMITE_LOTE} itens por lote'
+    return None
+
+# Faixa da coluna id (INTEGER): fora dela o PostgreSQL recusaria o comando (e o lote inteiro).
+# As rotas com id na URL respondem 404 para ids fora dela, já que nenhuma tarefa os teria
+ID_MINIMO, ID_MAXIMO = -2**31, 2**31 - 1
+
+def id_valido(valor):
+    """Inteiro de verdade (nem bool, nem 5.7, nem "5") e dentro da faixa da coluna id."""
+    return isinstance(valor, int) and not isinstance(valor, bool) and ID_MINIMO <= valor <= ID_MAXIMO
+
+def ler_ids(dados):
+    """Extrai a lista 'ids' do corpo; retorna (ids, mensagem de erro)."""
+    ids = (dados or {}).get('ids')
+    erro = validar_lote(ids)
+    if erro:
+        return None, erro
+    if not all(map(id_valido, ids)):
+        return None, 'Os ids devem ser números inteiros'
+    return ids, None
+
+def titulos_validos(itens):
+    """Índices dos itens com texto preenchido e os respectivos títulos, na ordem do lote.
+
+    Só vale texto de verdade: um número, lista ou objeto em 'text' sai como item inválido, como os ids.
+    """
+    validos = [i for i, item in enumerate(itens)
+               if isinstance(item, dict) and isinstance(item.get('text'), str) and item['text'].strip()]
+    return validos, [itens[i]['text'] for i in validos]
+
+# Tamanho máximo (em caracteres) da chave de idempotência de cada criação
+LIMITE_CHAVE_CRIACAO = 100
+
+def ler_chaves_criacao(itens, validos):
+    """Chave de idempotência ('chave', opcional) de cada item válido. Retorna (chaves, mensagem de erro).
+
+    Reenviar um item com a mesma chave devolve a tarefa já criada em vez de criar outra.
+    """
+    chaves = [itens[i].get('chave') for i in validos]
+    for chave in chaves:
+        if chave is not None and not (isinstance(chave, str) and 1 <= len(chave) <= LIMITE_CHAVE_CRIACAO):
+            return None, f'A chave deve ser um texto de 1 a {LIMITE_CHAVE_CRIACAO} caracteres'
+    return chaves, None
+
+def resultados_criacao(total, validos, novas):
+    novas = iter(novas)
+    validos = set(validos)
+    return [
+        {'sucesso': True, 'tarefa': next(novas)._asdict()} if i in validos
+        else {'sucesso': False, 'erro': 'O texto da tarefa é obrigatório'}
+        for i in range(total)
+    ]
+
+def ler_mudancas_status(itens):
+    """Converte os itens em (id, StatusTarefa); os inválidos já saem com resultado de erro.
+
+    Vários itens válidos com o mesmo id: vale o último, e os anteriores saem como substituídos.
+    """
+    lidos = []
+    for item in itens:
+        item = item if isinstance(item, dict) else {}
+        try:
+            if not id_valido(item.get('id')):
+                raise ValueError(item.get('id'))
+            lidos.append((item['id'], StatusTarefa(item.get('status'))))
+        except ValueError:
+            lidos.append((item.get('id'), None))
+    ultimo = {id_tarefa: posicao for posicao, (id_tarefa, status) in enumerate(lidos) if status is not None}
+    mudancas, resultados = [], []
+    for posicao, (id_tarefa, status) in enumerate(lidos):
+        if status is None:
+            resultados.append({'id': id_tarefa, 'sucesso': False, 'erro': 'Status ou id inválido'})
+        elif ultimo[id_tarefa] != posicao:
+            resultados.append({'id': id_tarefa, 'sucesso': False, 'erro': 'Substituído por um item posterior com o mesmo id'})
+        else:
+            mudancas.append((id_tarefa, status))
+            resultados.append({'id': id_tarefa})
+    return mudancas, resultados
+
+def completar_resultados_status(resultados, atualizados):
+    for resultado in resultados:
+        if 'sucesso' not in resultado:
+            resultado['sucesso'] = resultado['id'] in atualizados
+            if not resultado['sucesso']:
+                resultado['erro'] = 'Tarefa não encontrada'
+    return resultados
+
+def resultados_por_id(ids, encontrados, erro):
+    return [{'id': i, 'sucesso': True} if i in encontrados else {'id': i, 'sucesso': False, 'erro': erro} for i in ids]
@@ -1,6 +1,12 @@
 # app_flet_final.py
 import flet as ft
+import threading
+import time
 import requests
+from quadro_flet import QuadroDeTarefas, ContadoresDasAbas, TAMANHO_PAGINA
+from busca_flet import CaixaDeBusca
+from cliente_api import ClienteApi
+from replica_local import ReplicaLocal, caminho_padrao
 
 # --- PONTO DE CONFIGURAÇÃO CRÍTICO ---
 # Se você estiver testando com a API rodando localmente, use a primeira linha.
@@ -32,39 +38,37 @@ def main(page: ft.Page):
         page.snack_bar.open = True
         page.update()
 
-    def get_tasks_from_api(url_path):
-        try:
-            response = requests.get(f"{API_URL}{url_path}")
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao buscar dados de {url_path}: {e}")
-            show_error_snackbar(f"Não foi possível buscar dados. A API está rodando?")
-            return []
-
-    def api_call_handler(method, url_path, json_data=None):
-        try:
-            response = requests.request(method, f"{API_URL}{url_path}", json=json_data)
-            response.raise_for_status()
-            update_ui()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro na operação de API em {url_path}: {e}")
-            show_error_snackbar("A operação falhou.")
+    # Sessão keep-alive com timeouts, compartilhada por todas as chamadas do app
+    cliente = ClienteApi(API_URL)
+
+    def aplicar_local(tarefas):
+        with ui_lock:
+            controles = quadro.aplicar(tarefas) + busca.aplicar(tarefas) + contadores.atualizar(replica.estatisticas())
+            if controles:
+                page.update(*controles)
+
+    # A tela lê e escreve na réplica local; a thread de sincronização conversa com a API
+    replica = ReplicaLocal(
+        cliente, caminho_padrao(API_URL), ao_alterar=aplicar_local,
+        ao_descartar=lambda n: show_error_snackbar(f"{n} alteração(ões) recusada(s) pelo servidor foram desfeitas."),
+    )
 
     def add_task_clicked(e=None):
-        if new_task_field.value.strip():
-            api_call_handler("POST", "/tarefas", json_data={"text": new_task_field.value})
+        titulo = new_task_field.value
+        if titulo.strip():
+            aplicar_local(replica.adicionar(titulo))
             new_task_field.value = ""
             new_task_field.focus()
+            new_task_field.update()
 
     def status_changed(e):
-        api_call_handler("PUT", f"/tarefas/{e.control.data['id']}/status", json_data={"status": e.control.data['status']})
+        aplicar_local(replica.alterar_status(e.control.data['id'], e.control.data['status']))
 
     def move_to_trash_clicked(e):
-        api_call_handler("DELETE", f"/tarefas/{e.control.data}")
+        aplicar_local(replica.mover_para_lixeira(e.control.data))
 
     def restore_from_trash_clicked(e):
-        api_call_handler("PUT", f"/tarefas/{e.control.data}/recuperar")
+        aplicar_local(replica.restaurar(e.control.data))
 
     def create_task_view(task):
         return ft.Row(
@@ -105,39 +109,58 @@ def main(page: ft.Page):
         )
 
     new_task_field = ft.TextField(hint_text="O que precisa ser feito?", expand=True, on_submit=add_task_clicked)
-    active_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
-    trashed_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
-
-    def update_ui():
-        active_tasks_column.controls.clear()
-        trashed_tasks_column.controls.clear()
-        
-        for task in get_tasks_from_api("/tarefas"):
-            active_tasks_column.controls.append(create_task_view(task))
-        if not active_tasks_column.controls:
-            active_tasks_column.controls.append(ft.Container(ft.Text("Nenhuma tarefa ativa."), alignment=ft.alignment.center, padding=20))
-            
-        for task in get_tasks_from_api("/tarefas/excluidas"):
-            trashed_tasks_column.controls.append(create_trashed_task_view(task))
-        if not trashed_tasks_column.controls:
-            trashed_tasks_column.controls.append(ft.Container(ft.Text("A lixeira está vazia."), alignment=ft.alignment.center, padding=20))
-            
-        page.update()
+
+    # Páginas vêm da réplica: rolar a lista não espera a rede
+    quadro = QuadroDeTarefas(
+        create_task_view, create_trashed_task_view,
+        lambda ativo, after_id: replica.pagina(ativo, after_id, TAMANHO_PAGINA),
+    )
+    # A busca também é local: acha inclusive tarefas criadas offline e ainda não enviadas
+    busca = CaixaDeBusca(replica.buscar, create_task_view, create_trashed_task_view, page.update)
+    # Totais das abas contados na réplica, junto com cada mudança: valem offline também
+    contadores = ContadoresDasAbas()
+
+    # aplicar_local roda tanto nos cliques quanto na thread de sincronização
+    ui_lock = threading.Lock()
+
+    def update_ui(e=None):
+        replica.sincronizar_agora()
+
+    def escutar_alteracoes():
+        """Assina o stream SSE da API e antecipa a sincronização quando as tarefas mudam em outro lugar."""
+        espera = 1
+        while True:
+            try:
+                for revisao in cliente.revisoes_do_stream():
+                    espera = 1
+                    if revisao > replica.revisao():
+                        replica.sincronizar_agora()
+                if not cliente.stream_disponivel:
+                    return  # API sem stream: resta a sincronização periódica
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Stream de alterações interrompido: {e}")
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
 
     tabs = ft.Tabs(
         selected_index=0, expand=1,
         tabs=[
-            ft.Tab(text="Tarefas Ativas", icon="list_alt_rounded", content=active_tasks_column),
-            ft.Tab(text="Lixeira", icon="delete_sweep_outlined", content=trashed_tasks_column),
+            ft.Tab(tab_content=contadores.rotulo(True, "Tarefas Ativas", "list_alt_rounded"), content=busca.conteudo(True, quadro.coluna_ativas)),
+            ft.Tab(tab_content=contadores.rotulo(False, "Lixeira", "delete_sweep_outlined"), content=busca.conteudo(False, quadro.coluna_lixeira)),
         ]
     )
     
     page.add(
         ft.Row(controls=[new_task_field]),
+        ft.Row(controls=[busca.campo]),
         ft.Container(content=tabs, expand=True)
     )
     
-    update_ui()
+    # A primeira tela sai da réplica, mesmo offline; a sincronização corre em paralelo
+    with ui_lock:
+        page.update(*quadro.carregar(), *contadores.atualizar(replica.estatisticas()))
+    replica.iniciar()
+    threading.Thread(target=escutar_alteracoes, daemon=True).start()
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
@@ -0,0 +1,592 @@
+# armazenamento_sqlite.py
+# Armazenamento local em SQLite (modo WAL), com as mesmas funções de database.py.
+# É escolhido pelo esquema da URL: DB_CONNECTION_STRING=sqlite:///tarefas_local.db
+# Pensado para o app de desktop de um usuário só: leituras locais, sem rede e sem servidor.
+#
+# Diferenças em relação ao PostgreSQL:
+#  - uma conexão por thread (o sqlite3 não compartilha conexões entre threads) no lugar do pool;
+#  - as notificações de escrita valem só dentro do processo (não há LISTEN/NOTIFY);
+#  - as consultas usam sempre o mesmo texto SQL com parâmetros '?', então o cache de statements
+#    do sqlite3 as prepara uma vez por conexão e só reexecuta.
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, Optional, List, Set, Tuple
+
+import database as db
+import metricas
+from database import Tarefa, StatusTarefa, COLUNAS_TAREFA, _STATUS_INTERNADO, _cacheado, _invalidar
+
+# Statements preparados mantidos por conexão (o padrão do sqlite3 é 128)
+STATEMENTS_EM_CACHE = 256
+# Espera (ms) por outra conexão que esteja escrevendo antes de dar 'database is locked'
+ESPERA_BLOQUEIO_MS = 5000
+
+def caminho_da_url(url: str) -> str:
+    """sqlite:///tarefas.db -> tarefas.db (relativo); sqlite:////dados/tarefas.db -> /dados/tarefas.db."""
+    return url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite:"):]
+
+CAMINHO = caminho_da_url(db.DATABASE_URL or "sqlite:///tarefas_local.db")
+
+# --- CONEXÕES: uma por thread, abertas sob demanda ---
+
+class _CursorMedido(sqlite3.Cursor):
+    """Como database._CursorMedido: execute e fetch vão para metricas; COMMIT/ROLLBACK contam como tais."""
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            comando = sql.lstrip()[:8].upper()
+            fase = 'confirmar' if comando.startswith("COMMIT") else 'desfazer' if comando.startswith("ROLLBACK") else 'executar'
+            metricas.fase(fase, inicio, sql)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        row = super().fetchone()
+        metricas.fase('buscar', inicio, None, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        metricas.fase('buscar', inicio, None, len(rows))
+        return rows
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        rows = super().fetchall()
+        metricas.fase('buscar', inicio, None, len(rows))
+        return rows
+
+class _ConexaoMedida(sqlite3.Connection):
+    # Connection.execute não passa por cursor(): os dois são trocados
+    def cursor(self, factory=_CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+_local = threading.local()
+_conexoes_lock = threading.Lock()
+_conexoes_abertas = 0
+
+def _conexao() -> sqlite3.Connection:
+    conn = getattr(_local, 'conn', None)
+    # Depois de um fork a conexão herdada não é reutilizada (mesma regra do pool do PostgreSQL)
+    if conn is None or _local.pid != os.getpid():
+        global _conexoes_abertas
+        # isolation_level=None: as transações são abertas à mão, com BEGIN IMMEDIATE nas escritas
+        conn = sqlite3.connect(CAMINHO, isolation_level=None, check_same_thread=False,
+                               cached_statements=STATEMENTS_EM_CACHE, factory=_ConexaoMedida)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {ESPERA_BLOQUEIO_MS};")
+        conn.execute("PRAGMA journal_mode = WAL;")
+        # Em WAL, NORMAL só perde transações recentes se o sistema operacional cair, nunca corrompe
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        _local.conn, _local.pid = conn, os.getpid()
+        with _conexoes_lock:
+            _conexoes_abertas += 1
+    return conn
+
+def estatisticas_pool() -> dict:
+    with _conexoes_lock:
+        return {'backend': 'sqlite', 'arquivo': CAMINHO, 'conexoes_abertas': _conexoes_abertas}
+
+# --- NOTIFICAÇÕES DENTRO DO PROCESSO ---
+
+_assinantes = set()
+_assinantes_lock = threading.Lock()
+
+def assinar_alteracoes() -> queue.Queue:
+    fila = queue.Queue(maxsize=1)
+    with _assinantes_lock:
+        _assinantes.add(fila)
+    return fila
+
+def cancelar_assinatura(fila):
+    with _assinantes_lock:
+        _assinantes.discard(fila)
+
+def _notificar(revisao):
+    with _assinantes_lock:
+        filas = list(_assinantes)
+    for fila in filas:
+        # Fila de tamanho 1: só a revisão mais recente importa
+        try:
+            fila.get_nowait()
+        except queue.Empty:
+            pass
+        # Outra escrita pode ter enchido a fila entre o get e o put: a revisão dela já basta
+        try:
+            fila.put_nowait(revisao)
+        except queue.Full:
+            pass
+
+# --- ESQUEMA E MIGRAÇÕES (mesmas versões e índices de database.MIGRACOES) ---
+
+MIGRACOES = [
+    (1, "índices parciais para listagens e filtro por status", """
+        CREATE INDEX IF NOT EXISTS idx_tarefas_ativas_id ON tarefas (id) WHERE ativo = 1;
+        CREATE INDEX IF NOT EXISTS idx_tarefas_excluidas_id ON tarefas (id) WHERE ativo = 0;
+        CREATE INDEX IF NOT EXISTS idx_tarefas_ativas_status_id ON tarefas (status, id) WHERE ativo = 1;
+    """),
+    (2, "contador de revisão do conjunto de tarefas (ETag)", """
+        CREATE TABLE IF NOT EXISTS tarefas_revisao (
+            unica INTEGER PRIMARY KEY DEFAULT 1 CHECK (unica = 1),
+            revisao INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO tarefas_revisao (revisao) VALUES (0);
+    """),
+    (3, "revisão e data de alteração por tarefa (sincronização incremental)", """
+        ALTER TABLE tarefas ADD COLUMN revisao INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE tarefas ADD COLUMN atualizada_em TEXT NOT NULL DEFAULT '';
+        UPDATE tarefas SET atualizada_em = strftime('%Y-%m-%dT%H:%M:%fZ', 'now');
+        CREATE INDEX IF NOT EXISTS idx_tarefas_revisao ON tarefas (revisao);
+    """),
+    # FTS5 no lugar de tsvector + pg_trgm: prefixos e sem acentos, mas sem a tolerância a erros de digitação
+    (4, "busca textual (tsvector em português sem acentos) e por trigramas nos títulos", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tarefas_busca USING fts5(
+            titulo, content='tarefas', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS tarefas_busca_inserir AFTER INSERT ON tarefas BEGIN
+            INSERT INTO tarefas_busca (rowid, titulo) VALUES (new.id, new.titulo);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tarefas_busca_apagar AFTER DELETE ON tarefas BEGIN
+            INSERT INTO tarefas_busca (tarefas_busca, rowid, titulo) VALUES ('delete', old.id, old.titulo);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tarefas_busca_alterar AFTER UPDATE OF titulo ON tarefas BEGIN
+            INSERT INTO tarefas_busca (tarefas_busca, rowid, titulo) VALUES ('delete', old.id, old.titulo);
+            INSERT INTO tarefas_busca (rowid, titulo) VALUES (new.id, new.titulo);
+        END;
+        INSERT INTO tarefas_busca (tarefas_busca) VALUES ('rebuild');
+    """),
+    (5, "contadores por status e ativo, mantidos por triggers (/tarefas/stats)", """
+        CREATE TABLE IF NOT EXISTS tarefas_contagem (
+            status TEXT NOT NULL,
+            ativo INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            PRIMARY KEY (status, ativo)
+        );
+        CREATE TRIGGER IF NOT EXISTS tarefas_contar_inserir AFTER INSERT ON tarefas BEGIN
+            INSERT INTO tarefas_contagem (status, ativo, total) VALUES (new.status, new.ativo, 1)
+                ON CONFLICT (status, ativo) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS tarefas_contar_apagar AFTER DELETE ON tarefas BEGIN
+            UPDATE tarefas_contagem SET total = total - 1 WHERE status = old.status AND ativo = old.ativo;
+        END;
+        CREATE TRIGGER IF NOT EXISTS tarefas_contar_alterar AFTER UPDATE OF status, ativo ON tarefas
+            WHEN old.status IS NOT new.status OR old.ativo IS NOT new.ativo BEGIN
+            UPDATE tarefas_contagem SET total = total - 1 WHERE status = old.status AND ativo = old.ativo;
+            INSERT INTO tarefas_contagem (status, ativo, total) VALUES (new.status, new.ativo, 1)
+                ON CONFLICT (status, ativo) DO UPDATE SET total = total + 1;
+        END;
+        DELETE FROM tarefas_contagem;
+        INSERT INTO tarefas_contagem (status, ativo, total)
+        SELECT status, ativo, count(*) FROM tarefas GROUP BY status, ativo;
+    """),
+    (6, "arquivo da lixeira (tarefas excluídas há mais de LIXEIRA_RETENCAO_DIAS)", """
+        CREATE TABLE IF NOT EXISTS tarefas_arquivo (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            ativo INTEGER NOT NULL DEFAULT 0 CHECK (ativo = 0),
+            revisao INTEGER NOT NULL,
+            atualizada_em TEXT NOT NULL,
+            arquivada_em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_revisao ON tarefas_arquivo (revisao);
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_status_id ON tarefas_arquivo (status, id);
+        CREATE INDEX IF NOT EXISTS idx_tarefas_excluidas_atualizada ON tarefas (atualizada_em) WHERE ativo = 0;
+        CREATE TRIGGER IF NOT EXISTS tarefas_arquivo_contar_inserir AFTER INSERT ON tarefas_arquivo BEGIN
+            INSERT INTO tarefas_contagem (status, ativo, total) VALUES (new.status, 0, 1)
+                ON CONFLICT (status, ativo) DO UPDATE SET total = total + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS tarefas_arquivo_contar_apagar AFTER DELETE ON tarefas_arquivo BEGIN
+            UPDATE tarefas_contagem SET total = total - 1 WHERE status = old.status AND ativo = 0;
+        END;
+    """),
+    (7, "índice da purga do arquivo da lixeira (ARQUIVO_RETENCAO_DIAS)", """
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_arquivada ON tarefas_arquivo (arquivada_em);
+    """),
+    # O ON DELETE CASCADE do PostgreSQL vira um trigger (as foreign keys do SQLite ficam desligadas)
+    (8, "chaves de idempotência das criações em lote (POST /tarefas/batch)", """
+        CREATE TABLE IF NOT EXISTS tarefas_criacoes (
+            chave TEXT PRIMARY KEY,
+            id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tarefas_criacoes_id ON tarefas_criacoes (id);
+        CREATE TRIGGER IF NOT EXISTS tarefas_criacoes_apagar AFTER DELETE ON tarefas BEGIN
+            DELETE FROM tarefas_criacoes WHERE id = old.id;
+        END;
+    """),
+    # Sem unaccent no SQLite: só mantém a numeração igual à do PostgreSQL
+    (9, "tarefas_sem_acento chama o unaccent pelo schema da extensão, independente do search_path", ""),
+]
+
+_AGORA = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+def _comandos(sql: str) -> Iterator[str]:
+    """Separa o script nos ';' que terminam comandos (os de dentro de um CREATE TRIGGER não contam)."""
+    comando = ""
+    for parte in sql.split(";"):
+        comando += parte + ";"
+        if sqlite3.complete_statement(comando):
+            if comando.strip(" \n;"):
+                yield comando
+            comando = ""
+
+def _aplicar_migracoes(conn) -> List[int]:
+    aplicadas = []
+    # BEGIN IMMEDIATE faz o papel do advisory lock: um processo migra de cada vez
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_versao (
+                versao INTEGER PRIMARY KEY,
+                descricao TEXT NOT NULL,
+                aplicada_em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            );
+        """)
+        versao_atual = conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao;").fetchone()[0]
+        for versao, descricao, sql in MIGRACOES:
+            if versao <= versao_atual:
+                continue
+            # executescript faria COMMIT por conta própria: os comandos vão um a um
+            for comando in _comandos(sql):
+                conn.execute(comando)
+            conn.execute("INSERT INTO schema_versao (versao, descricao) VALUES (?, ?);", (versao, descricao))
+            aplicadas.append(versao)
+        conn.execute("COMMIT;")
+    except BaseException:
+        conn.execute("ROLLBACK;")
+        raise
+    return aplicadas
+
+def init_db():
+    """Cria o arquivo e a tabela de tarefas se não existirem e aplica as migrações pendentes."""
+    conn = _conexao()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            ativo INTEGER NOT NULL DEFAULT 1
+        );
+    """)
+    _aplicar_migracoes(conn)
+
+# --- ESCRITAS: BEGIN IMMEDIATE + revisão, confirmadas só se algo mudou ---
+
+def _escrever(operacao):
+    """Roda operacao(conn, revisao) numa transação de escrita; confirma só se ela retornar algo."""
+    conn = _conexao()
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        # fetchall: com RETURNING, o statement só termina depois de lidas todas as linhas
+        revisao = conn.execute("UPDATE tarefas_revisao SET revisao = revisao + 1 RETURNING revisao;").fetchall()[0][0]
+        resultado = operacao(conn, revisao)
+    except BaseException:
+        conn.execute("ROLLBACK;")
+        raise
+    if resultado:
+        conn.execute("COMMIT;")
+        _notificar(revisao)
+    else:
+        conn.execute("ROLLBACK;")
+    return resultado
+
+def _tarefa_da_linha(row) -> Tarefa:
+    # O SQLite guarda booleanos como 0/1
+    status = row[2]
+    return Tarefa(row[0], row[1], _STATUS_INTERNADO.get(status, status), bool(row[3]))
+
+def _map_row_to_tarefa(row):
+    if not row:
+        return None
+    return _tarefa_da_linha(row)
+
+# --- LEITURAS ---
+
+def revisao_atual() -> int:
+    return _conexao().execute("SELECT revisao FROM tarefas_revisao;").fetchone()[0]
+
+def listar_alteracoes(desde: int) -> Tuple[int, List[Tarefa]]:
+    conn = _conexao()
+    # Em WAL a transação de leitura enxerga um único snapshot: contador e linhas batem
+    conn.execute("BEGIN;")
+    try:
+        revisao = conn.execute("SELECT revisao FROM tarefas_revisao;").fetchone()[0]
+        desde = desde if desde > 0 else -1
+        rows = conn.execute(
+            f"""SELECT {COLUNAS_TAREFA} FROM tarefas WHERE revisao > ?
+                UNION ALL
+                SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE revisao > ?
+                ORDER BY id;""",
+            (desde, desde)
+        ).fetchall()
+    finally:
+        conn.execute("COMMIT;")
+    return revisao, list(map(_tarefa_da_linha, rows))
+
+def contar_tarefas() -> Tuple[int, Dict[Tuple[str, bool], int]]:
+    conn = _conexao()
+    conn.execute("BEGIN;")
+    try:
+        revisao = conn.execute("SELECT revisao FROM tarefas_revisao;").fetchone()[0]
+        rows = conn.execute("SELECT status, ativo, total FROM tarefas_contagem;").fetchall()
+    finally:
+        conn.execute("COMMIT;")
+    return revisao, {(status, bool(ativo)): total for status, ativo, total in rows}
+
+@_cacheado('ativas')
+def listar_tarefas() -> List[Tarefa]:
+    rows = _conexao().execute(f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = 1 ORDER BY id;").fetchall()
+    return list(map(_tarefa_da_linha, rows))
+
+# A lixeira soma a tabela quente e o arquivo. Com ORDER BY no composto, o SQLite intercala os dois
+# lados já ordenados pelos índices e para no LIMIT. 'filtro' entra nos dois lados (parâmetros repetidos).
+def _sql_lixeira(filtro: str = "", limite: str = "") -> str:
+    return f"""
+        SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = 0 {filtro}
+        UNION ALL
+        SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE 1 {filtro}
+        ORDER BY id {limite};"""
+
+_LISTAR_LIXEIRA = _sql_lixeira()
+_PAGINA_LIXEIRA = _sql_lixeira("AND id > ?", "LIMIT ?")
+_PAGINA_LIXEIRA_STATUS = _sql_lixeira("AND id > ? AND status = ?", "LIMIT ?")
+
+@_cacheado('excluidas')
+def listar_tarefas_excluidas() -> List[Tarefa]:
+    rows = _conexao().execute(_LISTAR_LIXEIRA).fetchall()
+    return list(map(_tarefa_da_linha, rows))
+
+def _listar_pagina(ativo: bool, after_id: Optional[int], limit: int, status: Optional[StatusTarefa]) -> Tuple[List[Tarefa], Optional[int]]:
+    limit = max(1, min(limit, db.LIMITE_PAGINA_MAXIMO))
+    # Textos fixos (com e sem status) em vez de SQL montado: cada um é preparado uma vez só
+    if not ativo:
+        if status is None:
+            params = (after_id or 0, after_id or 0, limit + 1)
+        else:
+            params = (after_id or 0, status.value, after_id or 0, status.value, limit + 1)
+        rows = _conexao().execute(_PAGINA_LIXEIRA if status is None else _PAGINA_LIXEIRA_STATUS, params).fetchall()
+    elif status is None:
+        rows = _conexao().execute(
+            f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = ? AND id > ? ORDER BY id LIMIT ?;",
+            (1, after_id or 0, limit + 1)
+        ).fetchall()
+    else:
+        rows = _conexao().execute(
+            f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = ? AND id > ? AND status = ? ORDER BY id LIMIT ?;",
+            (1, after_id or 0, status.value, limit + 1)
+        ).fetchall()
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    proximo_cursor = tarefas[-1].id if len(rows) > limit else None
+    return tarefas, proximo_cursor
+
+@_cacheado('ativas')
+def listar_tarefas_paginado(after_id: Optional[int] = None, limit: int = db.LIMITE_PAGINA_PADRAO,
+                            status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return _listar_pagina(True, after_id, limit, status)
+
+@_cacheado('excluidas')
+def listar_tarefas_excluidas_paginado(after_id: Optional[int] = None, limit: int = db.LIMITE_PAGINA_PADRAO,
+                                      status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return _listar_pagina(False, after_id, limit, status)
+
+def iterar_tarefas(ativo: bool, tamanho_lote: int = db.TAMANHO_LOTE_STREAM) -> Iterator[List[Tarefa]]:
+    if ativo:
+        cur = _conexao().execute(f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = 1 ORDER BY id;")
+    else:
+        cur = _conexao().execute(_LISTAR_LIXEIRA)
+    try:
+        while (rows := cur.fetchmany(tamanho_lote)):
+            yield list(map(_tarefa_da_linha, rows))
+    finally:
+        cur.close()
+
+_BUSCAR = """
+    SELECT t.id, t.titulo, t.status, t.ativo
+    FROM tarefas_busca JOIN tarefas AS t ON t.id = tarefas_busca.rowid
+    WHERE tarefas_busca MATCH ? AND t.ativo = ?
+    ORDER BY tarefas_busca.rank, t.id
+    LIMIT ? OFFSET ?;
+"""
+
+def buscar_tarefas(q: str, ativo: bool = True, offset: int = 0,
+                   limit: int = db.LIMITE_PAGINA_PADRAO) -> Tuple[List[Tarefa], Optional[int], bool]:
+    termos = db.termos_de_busca(q)
+    if not termos:
+        return [], None, False
+    limit = max(1, min(limit, db.LIMITE_PAGINA_MAXIMO))
+    # Cada palavra como prefixo ("acao"* AND "urg"*); o tokenizador tira acentos e maiúsculas
+    consulta = " AND ".join(f'"{t}"*' for t in termos)
+    rows = _conexao().execute(_BUSCAR, (consulta, int(ativo), limit + 1, offset)).fetchall()
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    # O FTS5 ordena todas as linhas que casaram: não há teto de candidatos, nada fica de fora
+    return tarefas, (offset + limit if len(rows) > limit else None), False
+
+def buscar_tarefa_por_id(id_tarefa: int) -> Optional[Tarefa]:
+    row = _conexao().execute(
+        f"""SELECT {COLUNAS_TAREFA} FROM tarefas WHERE id = ?
+            UNION ALL
+            SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE id = ?;""",
+        (id_tarefa, id_tarefa)
+    ).fetchone()
+    return _map_row_to_tarefa(row)
+
+# --- ESCRITAS UNITÁRIAS ---
+
+_INSERIR = f"INSERT INTO tarefas (titulo, status, revisao, atualizada_em) VALUES (?, ?, ?, {_AGORA}) RETURNING {COLUNAS_TAREFA};"
+_ATUALIZAR_STATUS = f"UPDATE tarefas SET status = ?, revisao = ?, atualizada_em = {_AGORA} WHERE id = ? AND ativo = 1;"
+_DEFINIR_ATIVO = f"UPDATE tarefas SET ativo = ?, revisao = ?, atualizada_em = {_AGORA} WHERE id = ?;"
+_SAIR_DO_ARQUIVO = "DELETE FROM tarefas_arquivo WHERE id = ? RETURNING id, titulo, status;"
+_VOLTAR_DO_ARQUIVO = f"INSERT INTO tarefas (id, titulo, status, ativo, revisao, atualizada_em) VALUES (?, ?, ?, 1, ?, {_AGORA});"
+
+def _restaurar_arquivada(conn, revisao, id_tarefa) -> bool:
+    """Devolve à tabela quente, já ativa e com o mesmo id, uma tarefa do arquivo da lixeira."""
+    rows = conn.execute(_SAIR_DO_ARQUIVO, (id_tarefa,)).fetchall()
+    for row in rows:
+        conn.execute(_VOLTAR_DO_ARQUIVO, (row[0], row[1], row[2], revisao))
+    return bool(rows)
+
+def adicionar_tarefa(titulo: str) -> Tarefa:
+    row = _escrever(lambda conn, revisao: conn.execute(_INSERIR, (titulo, StatusTarefa.PENDENTE.value, revisao)).fetchall()[0])
+    _invalidar('ativas')
+    return _map_row_to_tarefa(row)
+
+def atualizar_status(id_tarefa: int, novo_status: StatusTarefa) -> bool:
+    alterou = bool(_escrever(
+        lambda conn, revisao: conn.execute(_ATUALIZAR_STATUS, (novo_status.value, revisao, id_tarefa)).rowcount
+    ))
+    if alterou:
+        _invalidar('ativas')
+    return alterou
+
+def _definir_ativo(id_tarefa: int, ativo: bool) -> bool:
+    # Fora da tabela quente, a tarefa a restaurar ainda pode estar no arquivo da lixeira
+    alterou = bool(_escrever(
+        lambda conn, revisao: conn.execute(_DEFINIR_ATIVO, (int(ativo), revisao, id_tarefa)).rowcount
+        or (ativo and _restaurar_arquivada(conn, revisao, id_tarefa))
+    ))
+    if alterou:
+        _invalidar('ativas', 'excluidas')
+    return alterou
+
+def desativar_tarefa(id_tarefa: int) -> bool:
+    return _definir_ativo(id_tarefa, False)
+
+def recuperar_tarefa(id_tarefa: int) -> bool:
+    return _definir_ativo(id_tarefa, True)
+
+# --- ESCRITAS EM LOTE: uma transação, o mesmo statement preparado para cada item ---
+
+_TAREFA_DA_CHAVE = """
+    SELECT t.id, t.titulo, t.status, t.ativo FROM tarefas_criacoes c JOIN tarefas t ON t.id = c.id WHERE c.chave = ?;
+"""
+
+def adicionar_tarefas(titulos: List[str], chaves: Optional[List[Optional[str]]] = None) -> List[Tarefa]:
+    """Como database.adicionar_tarefas, inclusive as chaves de idempotência."""
+    if not titulos:
+        return []
+    chaves = chaves or [None] * len(titulos)
+    existentes, pendentes = {}, []
+    def operacao(conn, revisao):
+        for chave in {chave for chave in chaves if chave is not None}:
+            row = conn.execute(_TAREFA_DA_CHAVE, (chave,)).fetchone()
+            if row is not None:
+                existentes[chave] = _tarefa_da_linha(row)
+        pendentes.extend(db._criacoes_pendentes(chaves, existentes))
+        rows = []
+        for i in pendentes:
+            rows.append(conn.execute(_INSERIR, (titulos[i], StatusTarefa.PENDENTE.value, revisao)).fetchall()[0])
+            if chaves[i] is not None:
+                conn.execute("INSERT INTO tarefas_criacoes (chave, id) VALUES (?, ?);", (chaves[i], rows[-1][0]))
+        return rows
+    rows = _escrever(operacao) or []
+    if rows:
+        _invalidar('ativas')
+    return db._montar_criacoes(chaves, existentes, pendentes, list(map(_tarefa_da_linha, rows)))
+
+def atualizar_status_em_lote(mudancas: List[Tuple[int, StatusTarefa]]) -> Set[int]:
+    if not mudancas:
+        return set()
+    def operacao(conn, revisao):
+        return {i for i, status in mudancas if conn.execute(_ATUALIZAR_STATUS, (status.value, revisao, i)).rowcount}
+    atualizados = _escrever(operacao) or set()
+    if atualizados:
+        _invalidar('ativas')
+    return atualizados
+
+def _definir_ativo_em_lote(ids: List[int], ativo: bool) -> Set[int]:
+    if not ids:
+        return set()
+    def operacao(conn, revisao):
+        return {i for i in ids if conn.execute(_DEFINIR_ATIVO, (int(ativo), revisao, i)).rowcount
+                or (ativo and _restaurar_arquivada(conn, revisao, i))}
+    encontrados = _escrever(operacao) or set()
+    if encontrados:
+        _invalidar('ativas', 'excluidas')
+    return encontrados
+
+def desativar_tarefas(ids: List[int]) -> Set[int]:
+    return _definir_ativo_em_lote(ids, False)
+
+def recuperar_tarefas(ids: List[int]) -> Set[int]:
+    return _definir_ativo_em_lote(ids, True)
+
+# --- ARQUIVAMENTO DA LIXEIRA (como database.arquivar_lixeira) ---
+
+_ARQUIVAR = """
+    DELETE FROM tarefas WHERE id IN (
+        SELECT id FROM tarefas
+        WHERE ativo = 0 AND atualizada_em < strftime('%Y-%m-%dT%H:%M:%fZ', 'now', ?)
+        ORDER BY atualizada_em LIMIT ?
+    ) RETURNING id, titulo, status, revisao, atualizada_em;
+"""
+_GUARDAR_NO_ARQUIVO = "INSERT INTO tarefas_arquivo (id, titulo, status, revisao, atualizada_em) VALUES (?, ?, ?, ?, ?);"
+
+def arquivar_lixeira(dias: float = db.LIXEIRA_RETENCAO_DIAS, lote: int = db.ARQUIVO_LOTE, pausa: float = 0.0) -> int:
+    """Um BEGIN IMMEDIATE curto por lote, sem revisão nova; entre os lotes as outras escritas passam."""
+    db.validar_retencao(dias, lote)
+    conn = _conexao()
+    total = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            rows = conn.execute(_ARQUIVAR, (f"-{dias} days", lote)).fetchall()
+            conn.executemany(_GUARDAR_NO_ARQUIVO, [tuple(row) for row in rows])
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        conn.execute("COMMIT;")
+        total += len(rows)
+        if len(rows) < lote:
+            return total
+        if pausa:
+            time.sleep(pausa)
+
+_PURGAR = """
+    DELETE FROM tarefas_arquivo WHERE id IN (
+        SELECT id FROM tarefas_arquivo WHERE arquivada_em < strftime('%Y-%m-%dT%H:%M:%fZ', 'now', ?)
+        ORDER BY arquivada_em LIMIT ?
+    );
+"""
+
+def purgar_arquivo(dias: float, lote: int = db.ARQUIVO_LOTE, pausa: float = 0.0) -> int:
+    """Como database.purgar_arquivo: cada lote é uma escrita comum, com revisão nova."""
+    db.validar_retencao(dias, lote)
+    total = 0
+    while True:
+        apagadas = _escrever(lambda conn, revisao: conn.execute(_PURGAR, (f"-{dias} days", lote)).rowcount) or 0
+        if apagadas:
+            _invalidar('excluidas')
+        total += apagadas
+        if apagadas < lote:
+            return total
+        if pausa:
+            time.sleep(pausa)
@@ -0,0 +1,69 @@
+# arquivar_lixeira.py
+# Rotina de retenção da lixeira, em duas etapas:
+#  1. as tarefas na lixeira sem alteração há mais de --dias saem da tabela quente (tarefas) para
+#     tarefas_arquivo. Para a API nada muda: continuam em /tarefas/excluidas, em /tarefas/stats e
+#     podem ser restauradas;
+#  2. com --purgar-dias (ou ARQUIVO_RETENCAO_DIAS), as tarefas arquivadas há mais tempo que isso são
+#     apagadas de vez. Sem ele, o arquivo guarda tudo.
+# As duas andam em lotes de --lote linhas, cada um numa transação curta.
+#
+# Uso: DB_CONNECTION_STRING=... python arquivar_lixeira.py [--dias 30] [--purgar-dias 365] [--lote 1000]
+#      [--pausa 0.05] [--intervalo 3600]
+# Sem --intervalo roda uma vez (cron, timer do systemd); com ele, fica rodando e repete a cada
+# --intervalo segundos. Pode rodar junto com a API, e duas cópias ao mesmo tempo não se atrapalham.
+import argparse
+import time
+
+import database as db
+
+def dias_validos(texto):
+    dias = float(texto)
+    if dias < 0:
+        raise argparse.ArgumentTypeError(f"não pode ser negativo: {texto}")
+    return dias
+
+def lote_valido(texto):
+    lote = int(texto)
+    if lote < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1: {texto}")
+    return lote
+
+def rodar_uma_vez(dias, purgar_dias, lote, pausa):
+    inicio = time.perf_counter()
+    movidas = db.arquivar_lixeira(dias=dias, lote=lote, pausa=pausa)
+    print(f"{movidas} tarefas da lixeira arquivadas em {time.perf_counter() - inicio:.2f} s "
+          f"(sem alteração há mais de {dias:g} dias)")
+    if purgar_dias is not None:
+        inicio = time.perf_counter()
+        apagadas = db.purgar_arquivo(dias=purgar_dias, lote=lote, pausa=pausa)
+        print(f"{apagadas} tarefas apagadas do arquivo em {time.perf_counter() - inicio:.2f} s "
+              f"(arquivadas há mais de {purgar_dias:g} dias)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Move a lixeira antiga para o arquivo e purga o arquivo antigo.")
+    parser.add_argument("--dias", type=dias_validos, default=db.LIXEIRA_RETENCAO_DIAS,
+                        help="idade mínima na lixeira para arquivar (padrão: LIXEIRA_RETENCAO_DIAS)")
+    parser.add_argument("--purgar-dias", type=dias_validos, default=db.ARQUIVO_RETENCAO_DIAS,
+                        help="idade mínima no arquivo para apagar de vez (padrão: ARQUIVO_RETENCAO_DIAS; "
+                             "sem ele, não apaga)")
+    parser.add_argument("--lote", type=lote_valido, default=db.ARQUIVO_LOTE,
+                        help="linhas por transação (padrão: ARQUIVO_LOTE)")
+    parser.add_argument("--pausa", type=float, default=0.05, help="segundos entre lotes")
+    parser.add_argument("--intervalo", type=float, help="repete a cada tantos segundos em vez de rodar uma vez")
+    args = parser.parse_args()
+
+    db.init_db()
+    while True:
+        try:
+            rodar_uma_vez(args.dias, args.purgar_dias, args.lote, args.pausa)
+        except Exception as e:
+            if args.intervalo is None:
+                raise
+            # Em modo contínuo, uma falha (ex.: banco fora do ar) só adia para a próxima rodada
+            print(f"Erro ao arquivar a lixeira: {e}")
+        if args.intervalo is None:
+            return
+        time.sleep(args.intervalo)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# bench_carga.py
+# Teste de carga HTTP com conexões keep-alive concorrentes (só biblioteca padrão, asyncio).
+# Serve para comparar a API Flask/gunicorn (api.py) com a ASGI/uvicorn (api_asgi.py):
+#
+#   gunicorn -w 4 -k gthread --threads 8 -b 127.0.0.1:5000 api:app
+#   uvicorn api_asgi:app --workers 4 --port 5001
+#   python bench_carga.py --url http://127.0.0.1:5000 --url http://127.0.0.1:5001 --conexoes 500
+#
+# Cada --url é medida separadamente com as mesmas rotas, conexões e duração.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+class _Conexao:
+    """Cliente HTTP/1.1 mínimo que mantém a conexão aberta entre as requisições."""
+
+    def __init__(self, host, porta):
+        self.host, self.porta = host, porta
+        self.leitor = self.escritor = None
+
+    async def abrir(self):
+        self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta)
+
+    async def requisitar(self, metodo, caminho, corpo=None):
+        if self.escritor is None:
+            await self.abrir()
+        dados = json.dumps(corpo).encode() if corpo is not None else b""
+        cabecalhos = f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n"
+        if corpo is not None:
+            cabecalhos += f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n"
+        self.escritor.write(cabecalhos.encode() + b"\r\n" + dados)
+        await self.escritor.drain()
+        status = int((await self.leitor.readline()).split()[1])
+        tamanho, fechar, chunked = 0, False, False
+        while (linha := await self.leitor.readline()) not in (b"\r\n", b""):
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            nome, valor = nome.strip().lower(), valor.strip().lower()
+            if nome == "content-length":
+                tamanho = int(valor)
+            elif nome == "connection" and valor == "close":
+                fechar = True
+            elif nome == "transfer-encoding" and "chunked" in valor:
+                chunked = True
+        if chunked:
+            recebido = 0
+            while (parte := int((await self.leitor.readline()).strip() or b"0", 16)):
+                recebido += len(await self.leitor.readexactly(parte + 2)) - 2
+            await self.leitor.readline()
+        else:
+            recebido = len(await self.leitor.readexactly(tamanho))
+        if fechar:
+            self.fechar()
+        return status, recebido
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
+
+async def _trabalhador(url, rotas, prazo, latencias, erros, contador_bytes, i=0):
+    # i: posição inicial na lista de rotas; cada conexão começa numa, para não disputarem as mesmas linhas
+    partes = urlsplit(url)
+    conexao = _Conexao(partes.hostname, partes.port or 80)
+    while time.perf_counter() < prazo:
+        metodo, caminho, corpo = rotas[i % len(rotas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            status, tamanho = await conexao.requisitar(metodo, partes.path.rstrip("/") + caminho, corpo)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            erros.append("conexão")
+            conexao.fechar()
+            continue
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        contador_bytes[0] += tamanho
+        if status >= 400:
+            erros.append(status)
+    conexao.fechar()
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+async def medir(url, rotas, conexoes, duracao):
+    latencias, erros, contador_bytes = [], [], [0]
+    inicio = time.perf_counter()
+    prazo = inicio + duracao
+    await asyncio.gather(*(_trabalhador(url, rotas, prazo, latencias, erros, contador_bytes, i) for i in range(conexoes)))
+    decorrido = time.perf_counter() - inicio
+    return {
+        'url': url,
+        'conexoes': conexoes,
+        'requisicoes': len(latencias),
+        'erros': len(erros),
+        'rps': round(len(latencias) / decorrido, 1),
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'media_ms': round(statistics.fmean(latencias), 3) if latencias else 0.0,
+        'bytes': contador_bytes[0],
+    }
+
+def ler_rota(texto):
+    """'GET /tarefas?limit=100' ou 'PUT /tarefas/1/status {"status": "fazendo"}'."""
+    metodo, _, resto = texto.partition(" ")
+    caminho, _, corpo = resto.partition(" ")
+    return metodo.upper(), caminho, json.loads(corpo) if corpo else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga das APIs de tarefas.")
+    parser.add_argument("--url", action="append", required=True, help="pode repetir para comparar servidores")
+    parser.add_argument("--rota", action="append", type=ler_rota,
+                        help="ex.: 'GET /tarefas?limit=100' (padrão: listagens paginadas)")
+    parser.add_argument("--conexoes", type=int, default=100)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por servidor")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+    rotas = args.rota or [("GET", "/tarefas?limit=100", None), ("GET", "/tarefas/excluidas?limit=100", None)]
+
+    resultados = [asyncio.run(medir(url, rotas, args.conexoes, args.duracao)) for url in args.url]
+    print(f"{'url':<30} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>7}")
+    for r in resultados:
+        print(f"{r['url']:<30} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['erros']:>7}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# bench_completo.py
+# Suíte de benchmark reprodutível da API e da camada de armazenamento, sobre um banco só de benchmark:
+#  1. semeia N tarefas (títulos variados, status em rodízio, uma fração na lixeira) com semente fixa;
+#  2. mede cada função pública de database.py (p50/p95/p99) e o mapeamento linha -> Tarefa -> JSON;
+#  3. sobe a API (gunicorn, uvicorn ou o servidor do Flask) e aplica carga concorrente em cada rota
+#     com bench_carga: req/s e p50/p95/p99;
+#  4. grava os resultados em JSON e, com --comparar, mostra a variação contra uma rodada anterior.
+#
+# Uso:
+#   DB_CONNECTION_STRING=postgresql://localhost/todo_bench python bench_completo.py --linhas 100000 --json hoje.json
+#   DB_CONNECTION_STRING=sqlite:////tmp/todo_bench.db python bench_completo.py --servidor flask
+#   python bench_completo.py --url http://127.0.0.1:5000 --comparar ontem.json --json hoje.json
+#
+# Semeia e escreve no banco de DB_CONNECTION_STRING: aponte para um banco descartável. Um banco que já
+# tem tarefas é reaproveitado como está. As leituras passam pelo cache das listagens, como na API;
+# CACHE_BACKEND=desligado mede só o banco. /tarefas/stream fica de fora: é uma conexão longa de
+# eventos, não requisição e resposta.
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from itertools import cycle
+from urllib.parse import quote
+
+import api_comum as comum
+import bench_carga
+import bench_tarefa
+import database as db
+from database import StatusTarefa
+
+PALAVRAS = ["Revisar", "relatório", "reunião", "orçamento", "cliente", "contrato", "apresentação", "fatura",
+            "migração", "servidor", "backup", "código", "lançamento", "pesquisa", "equipe", "ligação"]
+TERMO_BUSCA = "relatorio"   # sem acento, como se digita
+TAMANHO_LOTE = 10           # tarefas por chamada nas operações em lote
+RESERVADAS = 1000           # tarefas ativas que as medições de escrita alteram (e devolvem como estavam)
+
+SERVIDORES = {
+    'gunicorn': lambda porta, workers: [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread",
+                                        "--threads", "8", "-b", f"127.0.0.1:{porta}", "api:app"],
+    'uvicorn': lambda porta, workers: [sys.executable, "-m", "uvicorn", "api_asgi:app", "--workers", str(workers),
+                                       "--port", str(porta), "--log-level", "warning"],
+    'flask': lambda porta, workers: [sys.executable, "-c",
+                                     f"import api; api.app.run(host='127.0.0.1', port={porta}, threaded=True)"],
+}
+
+# --- SEMEADURA ---
+
+def semear(linhas, fracao_lixeira, semente):
+    """Insere as tarefas em lotes pelas funções de database.py, então vale para os dois backends."""
+    aleatorio = random.Random(semente)
+    status = list(StatusTarefa)
+    for comeco in range(0, linhas, db.LIMITE_LOTE):
+        n = min(db.LIMITE_LOTE, linhas - comeco)
+        titulos = [" ".join(aleatorio.sample(PALAVRAS, 3)) + f" {comeco + i + 1}" for i in range(n)]
+        novas = db.adicionar_tarefas(titulos)
+        db.atualizar_status_em_lote([(task.id, status[task.id % 3]) for task in novas if task.id % 3])
+        db.desativar_tarefas([task.id for task in novas if aleatorio.random() < fracao_lixeira])
+        print(f"  {comeco + n}/{linhas}", end="\r")
+    print()
+
+def ids_das_tarefas(ativo):
+    return [task.id for lote in db.iterar_tarefas(ativo) for task in lote]
+
+# --- FUNÇÕES DO BANCO ---
+
+def resumir(tempos_ms):
+    return {
+        'n': len(tempos_ms),
+        'p50_ms': round(bench_carga.percentil(tempos_ms, 50), 4),
+        'p95_ms': round(bench_carga.percentil(tempos_ms, 95), 4),
+        'p99_ms': round(bench_carga.percentil(tempos_ms, 99), 4),
+        'media_ms': round(sum(tempos_ms) / len(tempos_ms), 4),
+        'ops_s': round(len(tempos_ms) / (sum(tempos_ms) / 1000), 1) if sum(tempos_ms) else 0.0,
+    }
+
+def medir_chamadas(chamar, repeticoes, aquecimento=3):
+    """chamar(i) para i = 0..repeticoes-1, depois do aquecimento; latência de cada chamada em ms."""
+    for i in range(aquecimento):
+        chamar(i)
+    tempos = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        chamar(i)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resumir(tempos)
+
+def casos_do_banco(ativas, reservadas, revisao, termo):
+    """(nome, chamar(i), pesada). As pesadas leem a tabela inteira e rodam menos vezes.
+
+    As escritas vêm em pares (desativar/recuperar) que percorrem os mesmos ids na mesma ordem, então o
+    banco termina como começou; atualizar_status só troca o status de tarefas reservadas.
+    """
+    meio = ativas[len(ativas) // 2] if ativas else 0
+    status = list(StatusTarefa)
+    circular = reservadas * 2
+    def lote(i):
+        comeco = (i * TAMANHO_LOTE) % len(reservadas)
+        return circular[comeco:comeco + TAMANHO_LOTE]
+    return [
+        ("revisao_atual", lambda i: db.revisao_atual(), False),
+        ("contar_tarefas", lambda i: db.contar_tarefas(), False),
+        ("buscar_tarefa_por_id", lambda i: db.buscar_tarefa_por_id(reservadas[i % len(reservadas)]), False),
+        ("listar_tarefas_paginado (primeira página)", lambda i: db.listar_tarefas_paginado(), False),
+        ("listar_tarefas_paginado (página profunda)", lambda i: db.listar_tarefas_paginado(after_id=meio), False),
+        ("listar_tarefas_paginado (status)",
+         lambda i: db.listar_tarefas_paginado(status=StatusTarefa.CONCLUIDA), False),
+        ("listar_tarefas_excluidas_paginado", lambda i: db.listar_tarefas_excluidas_paginado(), False),
+        # O caso comum do polling: o cliente já está na revisão atual
+        ("listar_alteracoes (sem novidades)", lambda i: db.listar_alteracoes(revisao), False),
+        ("buscar_tarefas", lambda i: db.buscar_tarefas(termo), False),
+        ("listar_tarefas", lambda i: db.listar_tarefas(), True),
+        ("listar_tarefas_excluidas", lambda i: db.listar_tarefas_excluidas(), True),
+        ("iterar_tarefas", lambda i: sum(len(l) for l in db.iterar_tarefas(True)), True),
+        ("adicionar_tarefa", lambda i: db.adicionar_tarefa(f"Tarefa do benchmark {i}"), False),
+        ("atualizar_status",
+         lambda i: db.atualizar_status(reservadas[i % len(reservadas)], status[i % 3]), False),
+        ("desativar_tarefa", lambda i: db.desativar_tarefa(reservadas[i % len(reservadas)]), False),
+        ("recuperar_tarefa", lambda i: db.recuperar_tarefa(reservadas[i % len(reservadas)]), False),
+        ("adicionar_tarefas", lambda i: db.adicionar_tarefas([f"Lote do benchmark {i}"] * TAMANHO_LOTE), False),
+        ("atualizar_status_em_lote",
+         lambda i: db.atualizar_status_em_lote([(id_, status[i % 3]) for id_ in lote(i)]), False),
+        ("desativar_tarefas", lambda i: db.desativar_tarefas(lote(i)), False),
+        ("recuperar_tarefas", lambda i: db.recuperar_tarefas(lote(i)), False),
+    ]
+
+def medir_banco(casos, repeticoes):
+    resultados = []
+    for nome, chamar, pesada in casos:
+        r = medir_chamadas(chamar, max(3, repeticoes // 10) if pesada else repeticoes, 1 if pesada else 3)
+        resultados.append({'nome': nome, **r})
+        print(f"  {nome:<44} p50 {r['p50_ms']:>9} ms  p99 {r['p99_ms']:>9} ms")
+    return resultados
+
+def medir_em_memoria(linhas):
+    """ns por linha do mapeamento e da serialização, sem banco (o melhor de 5 rodadas)."""
+    amostra = bench_tarefa.linhas_tupla(linhas)
+    tarefas = list(map(db._tarefa_da_linha, amostra))
+    paginas = [tarefas[i:i + 100] for i in range(0, len(tarefas), 100)]
+    casos = [
+        ("_map_row_to_tarefa", lambda: list(map(db._map_row_to_tarefa, amostra))),
+        ("_tarefa_da_linha", lambda: list(map(db._tarefa_da_linha, amostra))),
+        ("tarefa_json", lambda: list(map(comum.tarefa_json, tarefas))),
+        ("lista_json (páginas de 100)", lambda: list(map(comum.lista_json, paginas))),
+    ]
+    resultados = []
+    for nome, rodar in casos:
+        melhor = min(_cronometrar_ns(rodar) for _ in range(5))
+        resultados.append({'nome': nome, 'ns_linha': round(melhor / linhas, 1)})
+        print(f"  {nome:<44} {melhor / linhas:>9.1f} ns/linha")
+    return resultados
+
+def _cronometrar_ns(rodar):
+    # Como o timeit: sem coletas do gc no meio, que dependem do que mais está vivo no processo
+    gc.collect()
+    gc.disable()
+    try:
+        inicio = time.perf_counter_ns()
+        rodar()
+        return time.perf_counter_ns() - inicio
+    finally:
+        gc.enable()
+
+# --- ROTAS HTTP ---
+
+def rotas_http(ativas, reservadas, revisao, termo):
+    """(nome, rotas) para bench_carga.medir; cada conexão começa numa posição diferente da lista."""
+    meio = ativas[len(ativas) // 2] if ativas else 0
+    status = cycle(StatusTarefa)
+    lotes = [reservadas[i:i + TAMANHO_LOTE] for i in range(0, len(reservadas), TAMANHO_LOTE)]
+    return [
+        ("GET /tarefas (primeira página)", [("GET", "/tarefas?limit=100", None)]),
+        ("GET /tarefas (página profunda)", [("GET", f"/tarefas?limit=100&after_id={meio}", None)]),
+        ("GET /tarefas (status)", [("GET", f"/tarefas?limit=100&status={quote('concluída')}", None)]),
+        ("GET /tarefas (lista completa)", [("GET", "/tarefas", None)]),
+        ("GET /tarefas?stream=1", [("GET", "/tarefas?stream=1", None)]),
+        ("GET /tarefas/excluidas (primeira página)", [("GET", "/tarefas/excluidas?limit=100", None)]),
+        ("GET /tarefas/excluidas (lista completa)", [("GET", "/tarefas/excluidas", None)]),
+        ("GET /tarefas/search", [("GET", f"/tarefas/search?q={quote(termo)}", None)]),
+        ("GET /tarefas/stats", [("GET", "/tarefas/stats", None)]),
+        ("GET /tarefas/changes", [("GET", f"/tarefas/changes?since={revisao}", None)]),
+        ("GET /tarefas/revisao", [("GET", "/tarefas/revisao", None)]),
+        ("GET /pool", [("GET", "/pool", None)]),
+        ("GET /metrics", [("GET", "/metrics", None)]),
+        ("GET /cache", [("GET", "/cache", None)]),
+        ("POST /tarefas", [("POST", "/tarefas", {'text': "Tarefa do benchmark"})]),
+        ("PUT /tarefas/<id>/status",
+         [("PUT", f"/tarefas/{id_}/status", {'status': next(status).value}) for id_ in reservadas]),
+        # Cada conexão desfaz o que acabou de fazer: a lixeira não cresce durante a medição
+        ("DELETE /tarefas/<id> + PUT /tarefas/<id>/recuperar",
+         [rota for id_ in reservadas for rota in (("DELETE", f"/tarefas/{id_}", None),
+                                                  ("PUT", f"/tarefas/{id_}/recuperar", None))]),
+        ("POST /tarefas/batch",
+         [("POST", "/tarefas/batch", {'tarefas': [{'text': "Lote do benchmark"}] * TAMANHO_LOTE})]),
+        ("PUT /tarefas/status/batch",
+         [("PUT", "/tarefas/status/batch", {'itens': [{'id': id_, 'status': next(status).value} for id_ in ids]})
+          for ids in lotes]),
+        ("PUT /tarefas/lixeira/batch + /tarefas/recuperar/batch",
+         [rota for ids in lotes for rota in (("PUT", "/tarefas/lixeira/batch", {'ids': ids}),
+                                             ("PUT", "/tarefas/recuperar/batch", {'ids': ids}))]),
+    ]
+
+def subir_servidor(servidor, porta, workers, espera=30.0):
+    """Sobe a API num processo separado (o gerador de carga não disputa o GIL com ela)."""
+    comando = SERVIDORES[servidor](porta, workers)
+    processo = subprocess.Popen(comando, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    prazo = time.monotonic() + espera
+    while time.monotonic() < prazo:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou ao subir (código {processo.returncode}): {' '.join(comando)}")
+        try:
+            with urllib.request.urlopen(url + "/tarefas/revisao", timeout=1):
+                return processo, url
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f"O servidor não respondeu em {espera:.0f} s: {' '.join(comando)}")
+
+def medir_http(url, rotas, conexoes, duracao):
+    resultados = []
+    for nome, lista in rotas:
+        r = asyncio.run(bench_carga.medir(url, lista, conexoes, duracao))
+        resultados.append({'rota': nome, **r})
+        print(f"  {nome:<56} {r['rps']:>9} req/s  p50 {r['p50_ms']:>8} ms  "
+              f"p99 {r['p99_ms']:>8} ms  erros {r['erros']}")
+    return resultados
+
+# --- COMPARAÇÃO ENTRE RODADAS ---
+
+def comparar(anterior, atual, tolerancia):
+    """Imprime a variação de cada medida e devolve as que pioraram mais que a tolerância."""
+    pioras = []
+    secoes = [
+        ('banco', 'nome', 'p50_ms', False), ('banco', 'nome', 'p99_ms', False),
+        ('memoria', 'nome', 'ns_linha', False),
+        ('http', 'rota', 'rps', True), ('http', 'rota', 'p99_ms', False),
+    ]
+    print(f"\n{'medida':<64} {'antes':>10} {'agora':>10} {'variação':>9}")
+    for secao, chave, campo, maior_melhor in secoes:
+        antes = {r[chave]: r for r in anterior.get(secao, [])}
+        for r in atual.get(secao, []):
+            if r[chave] not in antes or not antes[r[chave]].get(campo):
+                continue
+            valor_antes, valor = antes[r[chave]][campo], r[campo]
+            variacao = (valor - valor_antes) / valor_antes
+            piorou = -variacao > tolerancia if maior_melhor else variacao > tolerancia
+            nome = f"{r[chave]} {campo}"
+            print(f"{nome:<64} {valor_antes:>10} {valor:>10} {variacao:>+9.1%}{'  PIOROU' if piorou else ''}")
+            if piorou:
+                pioras.append(nome)
+    return pioras
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da camada de armazenamento e das rotas da API.")
+    parser.add_argument("--linhas", type=int, default=100_000, help="tarefas semeadas num banco vazio")
+    parser.add_argument("--lixeira", type=float, default=0.2, help="fração das tarefas semeadas na lixeira")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=200, help="chamadas medidas por função do banco")
+    parser.add_argument("--termo", default=TERMO_BUSCA, help="texto usado nas buscas")
+    parser.add_argument("--servidor", choices=sorted(SERVIDORES), default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--porta", type=int, default=5055)
+    parser.add_argument("--url", help="usa uma API já no ar em vez de subir uma")
+    parser.add_argument("--conexoes", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos de carga por rota")
+    parser.add_argument("--sem-http", action="store_true", help="mede só o banco e o mapeamento")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="resultados de uma rodada anterior (JSON)")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="piora relativa aceita no --comparar; acima dela o código de saída é 1")
+    args = parser.parse_args()
+
+    db.init_db()
+    revisao, contagens = db.contar_tarefas()
+    if not sum(contagens.values()):
+        print(f"Semeando {args.linhas} tarefas ({args.lixeira:.0%} na lixeira, semente {args.semente})...")
+        inicio = time.perf_counter()
+        semear(args.linhas, args.lixeira, args.semente)
+        print(f"Semeadura: {time.perf_counter() - inicio:.1f} s")
+    else:
+        print(f"Banco já tem {sum(contagens.values())} tarefas; reaproveitando sem semear.")
+    ativas, excluidas = ids_das_tarefas(True), ids_das_tarefas(False)
+    if not ativas:
+        sys.exit("O banco não tem tarefas ativas para medir.")
+    # Espalhadas pela tabela, para não medir só as primeiras páginas
+    reservadas = ativas[::max(1, len(ativas) // RESERVADAS)][:RESERVADAS]
+    revisao = db.revisao_atual()
+
+    resultados = {
+        'ambiente': {
+            'data': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'python': platform.python_version(), 'plataforma': platform.platform(),
+            'backend': db.BACKEND, 'cache': db.CACHE_BACKEND,
+            'servidor': args.url or args.servidor, 'workers': args.workers, 'conexoes': args.conexoes,
+            'ativas': len(ativas), 'lixeira': len(excluidas), 'semente': args.semente,
+        },
+    }
+
+    print("\nFunções do banco:")
+    resultados['banco'] = medir_banco(casos_do_banco(ativas, reservadas, revisao, args.termo), args.repeticoes)
+    print("\nMapeamento e serialização (sem banco):")
+    resultados['memoria'] = medir_em_memoria(min(len(ativas), 100_000))
+
+    if not args.sem_http:
+        processo = None
+        url = args.url
+        if not url:
+            processo, url = subir_servidor(args.servidor, args.porta, args.workers)
+        try:
+            print(f"\nRotas ({url}, {args.conexoes} conexões, {args.duracao:.0f} s cada):")
+            rotas = rotas_http(ativas, reservadas, db.revisao_atual(), args.termo)
+            resultados['http'] = medir_http(url, rotas, args.conexoes, args.duracao)
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait()
+            # Uma medição interrompida entre desativar e recuperar deixaria tarefas na lixeira
+            db.recuperar_tarefas(reservadas)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            pioras = comparar(json.load(f), resultados, args.tolerancia)
+        if pioras:
+            print(f"\n{len(pioras)} medida(s) piorou(aram) mais de {args.tolerancia:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench_indices.py
+# Compara plano de execução e latência das consultas quentes antes e depois
+# da migração de índices de database.py, numa tabela semeada com N linhas.
+#
+# Uso: python bench_indices.py [--linhas 1000000] [--lixeira 0.2] [--repeticoes 30] [--manter]
+#
+# Tudo acontece no schema 'bench_indices', recriado a cada rodada, então a tabela real de tarefas
+# não é tocada e nada de uma rodada anterior (--manter) entra na medição.
+import argparse
+import statistics
+import time
+
+import psycopg2
+
+import database as db
+
+SCHEMA = "bench_indices"
+# Só a migração dos índices parciais: as outras (triggers, busca, arquivo) não são o que se mede
+# aqui e criariam funções e extensões no schema de benchmark
+MIGRACAO_INDICES = 1
+
+# As mesmas consultas que database.py executa nos caminhos quentes
+CONSULTAS = [
+    ("primeira página ativas",
+     "SELECT * FROM tarefas WHERE ativo = TRUE AND id > %(after)s ORDER BY id LIMIT 101;", {'after': 0}),
+    ("página profunda ativas",
+     "SELECT * FROM tarefas WHERE ativo = TRUE AND id > %(after)s ORDER BY id LIMIT 101;", {'after': 'meio'}),
+    ("primeira página lixeira",
+     "SELECT * FROM tarefas WHERE ativo = FALSE AND id > %(after)s ORDER BY id LIMIT 101;", {'after': 0}),
+    ("ativas filtradas por status",
+     "SELECT * FROM tarefas WHERE ativo = TRUE AND id > %(after)s AND status = 'concluída' ORDER BY id LIMIT 101;", {'after': 0}),
+    ("atualizar status",
+     "UPDATE tarefas SET status = 'fazendo' WHERE id = %(after)s AND ativo = TRUE;", {'after': 'meio'}),
+]
+
+def semear(cur, linhas, fracao_lixeira):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+    cur.execute(f"CREATE SCHEMA {SCHEMA};")
+    cur.execute(f"SET search_path TO {SCHEMA};")
+    db._criar_tabela(cur)
+    # Status em rodízio e uma fração das linhas na lixeira, espalhadas pela tabela
+    cur.execute("""
+        INSERT INTO tarefas (titulo, status, ativo)
+        SELECT 'Tarefa ' || g,
+               (ARRAY['pendente', 'fazendo', 'concluída'])[1 + g % 3],
+               random() >= %s
+        FROM generate_series(1, %s) AS g;
+    """, (fracao_lixeira, linhas))
+    cur.execute("ANALYZE tarefas;")
+
+def criar_indices(cur):
+    cur.execute(next(sql for versao, _, sql in db.MIGRACOES if versao == MIGRACAO_INDICES))
+    cur.execute("ANALYZE tarefas;")
+
+def _tipo_de_scan(plano):
+    """Devolve o primeiro nó de leitura da tabela no plano (Seq Scan, Index Scan...)."""
+    if 'Scan' in plano['Node Type']:
+        return f"{plano['Node Type']} {plano.get('Index Name', '')}".strip()
+    for filho in plano.get('Plans', []):
+        tipo = _tipo_de_scan(filho)
+        if tipo:
+            return tipo
+    return None
+
+def medir(conn, linhas, repeticoes):
+    resultados = {}
+    for nome, sql, params in CONSULTAS:
+        params = {k: (linhas // 2 if v == 'meio' else v) for k, v in params.items()}
+        with conn.cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plano = cur.fetchone()[0][0]['Plan']
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                cur.execute(sql, params)
+                if cur.description:
+                    cur.fetchall()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        # O UPDATE não pode alterar os dados entre as rodadas
+        conn.rollback()
+        resultados[nome] = (_tipo_de_scan(plano), statistics.median(tempos))
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos índices parciais criados por init_db.")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--lixeira", type=float, default=0.2, help="fração das tarefas na lixeira")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--manter", action="store_true", help="não apaga o schema de benchmark no final")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(db.DATABASE_URL)
+    try:
+        print(f"Semeando {args.linhas} tarefas ({args.lixeira:.0%} na lixeira)...")
+        with conn.cursor() as cur:
+            semear(cur, args.linhas, args.lixeira)
+        conn.commit()
+
+        antes = medir(conn, args.linhas, args.repeticoes)
+        with conn.cursor() as cur:
+            criar_indices(cur)
+        conn.commit()
+        depois = medir(conn, args.linhas, args.repeticoes)
+
+        print(f"\n{'consulta':<30} {'antes (ms)':>11} {'depois (ms)':>12}  plano antes -> depois")
+        for nome, _, _ in CONSULTAS:
+            plano_antes, ms_antes = antes[nome]
+            plano_depois, ms_depois = depois[nome]
+            print(f"{nome:<30} {ms_antes:>11.3f} {ms_depois:>12.3f}  {plano_antes} -> {plano_depois}")
+    finally:
+        if not args.manter:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;")
+            conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_tarefa.py
+# Microbenchmark do caminho linha do cursor -> Tarefa -> JSON, sem banco: mede o formato antigo
+# (RealDictCursor -> @dataclass -> __dict__ -> json.dumps) contra o atual (tupla -> Tarefa -> tarefa_json).
+#
+# Uso: python bench_tarefa.py [--linhas 1000000] [--json resultados.json]
+#
+# Reporta ns por linha (perf_counter_ns) e, com tracemalloc, o pico de memória e as alocações por linha
+# de cada fase: mapear as linhas em objetos e serializar a lista.
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import api_comum as comum
+import database as db
+
+@dataclass
+class TarefaAntiga:
+    """O modelo de antes: dataclass com __dict__ por instância."""
+    id: int
+    titulo: str
+    status: str
+    ativo: bool
+
+STATUS = [status.value for status in db.StatusTarefa]
+
+def linhas_dict(n):
+    # Como o RealDictCursor entregava: um dicionário por linha, e o texto do status repetido
+    return [{'id': i, 'titulo': f"Tarefa {i}", 'status': "".join(STATUS[i % 3]), 'ativo': True}
+            for i in range(1, n + 1)]
+
+def linhas_tupla(n):
+    return [(i, f"Tarefa {i}", "".join(STATUS[i % 3]), True) for i in range(1, n + 1)]
+
+def mapear_antigo(linhas):
+    return [TarefaAntiga(**row) for row in linhas]
+
+def serializar_antigo(tarefas):
+    return json.dumps([task.__dict__ for task in tarefas], sort_keys=True, separators=(",", ":"))
+
+def mapear_novo(linhas):
+    return list(map(db._tarefa_da_linha, linhas))
+
+def serializar_novo(tarefas):
+    return comum.lista_json(tarefas)
+
+def _medir(funcao, entrada, n):
+    """(ns por linha, pico em bytes por linha, alocações vivas por linha, resultado)."""
+    gc.collect()
+    inicio = time.perf_counter_ns()
+    resultado = funcao(entrada)
+    ns = time.perf_counter_ns() - inicio
+    del resultado
+
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    resultado = funcao(entrada)
+    depois = tracemalloc.take_snapshot()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    alocacoes = sum(d.count_diff for d in depois.compare_to(antes, "filename") if d.count_diff > 0)
+    return round(ns / n, 1), round(pico / n, 1), round(alocacoes / n, 2), resultado
+
+def medir(nome, gerar_linhas, mapear, serializar, n):
+    linhas = gerar_linhas(n)
+    ns_map, bytes_map, aloc_map, tarefas = _medir(mapear, linhas, n)
+    del linhas
+    ns_ser, bytes_ser, aloc_ser, texto = _medir(serializar, tarefas, n)
+    return {
+        'formato': nome,
+        'mapear_ns_linha': ns_map, 'mapear_bytes_linha': bytes_map, 'mapear_alocacoes_linha': aloc_map,
+        'serializar_ns_linha': ns_ser, 'serializar_bytes_linha': bytes_ser, 'serializar_alocacoes_linha': aloc_ser,
+        'json_bytes': len(texto),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark do mapeamento e da serialização de Tarefa.")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args()
+
+    # Os dois formatos têm que produzir exatamente o mesmo JSON
+    amostra = 1000
+    assert (serializar_antigo(mapear_antigo(linhas_dict(amostra)))
+            == serializar_novo(mapear_novo(linhas_tupla(amostra))))
+
+    print(f"Medindo {args.linhas} linhas...")
+    resultados = [
+        medir("antes: dict -> dataclass -> json.dumps", linhas_dict, mapear_antigo, serializar_antigo, args.linhas),
+        medir("depois: tupla -> Tarefa -> tarefa_json", linhas_tupla, mapear_novo, serializar_novo, args.linhas),
+    ]
+    print(f"\n{'formato':<42} {'fase':<11} {'ns/linha':>9} {'bytes/linha':>12} {'alocações/linha':>16}")
+    for r in resultados:
+        for fase in ("mapear", "serializar"):
+            print(f"{r['formato']:<42} {fase:<11} {r[fase + '_ns_linha']:>9} "
+                  f"{r[fase + '_bytes_linha']:>12} {r[fase + '_alocacoes_linha']:>16}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == "__main__":
+    main()
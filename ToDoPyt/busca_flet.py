@@ -0,0 +1,154 @@
+# busca_flet.py
+# Caixa de busca dos apps Flet. A consulta sai enquanto o usuário digita, mas só depois de uma pausa
+# (debounce): digitar "reunião" faz uma busca, não sete. Respostas de consultas que já foram
+# substituídas por outra são descartadas. Com texto na caixa, cada aba mostra os seus resultados,
+# por relevância, no lugar da lista completa.
+import threading
+
+import flet as ft
+
+from quadro_flet import ALTURA_LINHA
+
+ESPERA_DIGITACAO = 0.3      # segundos sem digitar antes de buscar
+TAMANHO_PAGINA_BUSCA = 50   # resultados pedidos por página
+
+class _Resultados:
+    """Resultados de uma aba (ativas ou lixeira); a próxima página vem quando a rolagem chega ao fim."""
+
+    def __init__(self, criar_linha, carregar_mais, texto_vazio):
+        self.criar_linha = criar_linha
+        self.carregar_mais = carregar_mais
+        self.tarefas = []
+        self.proximo = None   # offset da próxima página, ou None se não há mais
+        self.vazio = ft.Container(ft.Text(texto_vazio), alignment=ft.alignment.center, padding=20, visible=False)
+        self.linhas = ft.Column(spacing=0)
+        self.view = ft.ListView(
+            controls=[self.vazio, self.linhas], expand=True, spacing=0, visible=False,
+            on_scroll=self._rolou, on_scroll_interval=100,
+        )
+
+    def renderizar(self):
+        self.linhas.controls = [ft.Container(self.criar_linha(task), height=ALTURA_LINHA) for task in self.tarefas]
+        self.vazio.visible = not self.tarefas
+
+    def aplicar(self, task, ativo) -> bool:
+        """Atualiza uma tarefa que está nos resultados; sai deles se mudou de aba. True se mudou algo."""
+        for i, atual in enumerate(self.tarefas):
+            if atual['id'] == task['id']:
+                if task.get('remover') or task['ativo'] != ativo:
+                    del self.tarefas[i]
+                else:
+                    self.tarefas[i] = task
+                return True
+        return False
+
+    def _rolou(self, e):
+        if self.proximo is not None and e.pixels >= e.max_scroll_extent - 5 * ALTURA_LINHA:
+            self.carregar_mais(self)
+
+class CaixaDeBusca:
+    """Campo de busca e os resultados de cada aba.
+
+    buscar(q, ativo, offset, limit) -> (tarefas, proximo_offset), ou None se falhou. Roda numa thread
+    de fundo, nunca na do evento. atualizar(*controles) é o page.update do app.
+    """
+
+    def __init__(self, buscar, criar_linha_ativa, criar_linha_excluida, atualizar, em_paralelo=None):
+        self.buscar = buscar
+        self.atualizar = atualizar
+        self.em_paralelo = em_paralelo
+        self.resultados = {
+            True: _Resultados(criar_linha_ativa, self._carregar_mais, "Nenhuma tarefa ativa encontrada."),
+            False: _Resultados(criar_linha_excluida, self._carregar_mais, "Nada encontrado na lixeira."),
+        }
+        self.campo = ft.TextField(
+            hint_text="Buscar tarefas", prefix_icon="search", expand=True,
+            on_change=self._digitou, on_submit=lambda e: self._agendar(0),
+        )
+        self.texto = ""
+        self._listas = {}
+        self._sequencia = 0
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def conteudo(self, ativo, lista):
+        """Conteúdo da aba: a lista completa ou, durante uma busca, os resultados."""
+        self._listas[ativo] = lista
+        return ft.Column([lista, self.resultados[ativo].view], expand=True, spacing=0)
+
+    def _digitou(self, e):
+        self._agendar(ESPERA_DIGITACAO)
+
+    def _agendar(self, espera):
+        # Cada tecla reinicia a espera; só a última consulta chega a ser feita
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(espera, self._buscar, args=((self.campo.value or "").strip(),))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _buscar(self, texto):
+        with self._lock:
+            self._sequencia += 1
+            sequencia = self._sequencia
+            self.texto = texto
+        if not texto:
+            self._mostrar_resultados(False)
+            return
+        chamadas = [lambda ativo=ativo: self.buscar(texto, ativo, 0, TAMANHO_PAGINA_BUSCA) for ativo in (True, False)]
+        if self.em_paralelo:
+            paginas = self.em_paralelo(*chamadas)
+        else:
+            paginas = [chamada() for chamada in chamadas]
+        with self._lock:
+            # Outra consulta começou enquanto esta esperava a resposta
+            if sequencia != self._sequencia:
+                return
+            for ativo, pagina in zip((True, False), paginas):
+                resultados = self.resultados[ativo]
+                resultados.tarefas, resultados.proximo = pagina if pagina is not None else ([], None)
+                resultados.renderizar()
+            self._mostrar_resultados(True)
+
+    def _mostrar_resultados(self, buscando):
+        with self._lock:
+            for ativo, resultados in self.resultados.items():
+                resultados.view.visible = buscando
+                if ativo in self._listas:
+                    self._listas[ativo].visible = not buscando
+            self.atualizar(*self._listas.values(), *(r.view for r in self.resultados.values()))
+
+    def _carregar_mais(self, resultados):
+        with self._lock:
+            sequencia, texto, offset = self._sequencia, self.texto, resultados.proximo
+            if offset is None:
+                return
+            # Evita pedir a mesma página de novo enquanto a rolagem continua
+            resultados.proximo = None
+        ativo = resultados is self.resultados[True]
+        pagina = self.buscar(texto, ativo, offset, TAMANHO_PAGINA_BUSCA)
+        with self._lock:
+            if sequencia != self._sequencia:
+                return
+            if pagina is None:
+                resultados.proximo = offset
+                return
+            tarefas, resultados.proximo = pagina
+            resultados.tarefas.extend(tarefas)
+            resultados.renderizar()
+            self.atualizar(resultados.view)
+
+    def aplicar(self, tarefas):
+        """Leva aos resultados as mudanças já aplicadas no quadro. Retorna os controles que mudaram."""
+        with self._lock:
+            if not self.texto:
+                return []
+            alteradas = set()
+            for task in tarefas:
+                for ativo, resultados in self.resultados.items():
+                    if resultados.aplicar(task, ativo):
+                        alteradas.add(ativo)
+            for ativo in alteradas:
+                self.resultados[ativo].renderizar()
+            return [self.resultados[ativo].view for ativo in alteradas]
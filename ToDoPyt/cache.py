@@ -0,0 +1,230 @@
+# cache.py
+# Cache read-through das listagens de tarefas, com TTL, despejo LRU e invalidação por namespace.
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+class _Contadores:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+
+    def contar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def como_dict(self):
+        total = self.acertos + self.faltas
+        return {
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+            'invalidacoes': self.invalidacoes,
+            'taxa_acerto': round(self.acertos / total, 4) if total else 0.0,
+        }
+
+class CacheMemoria:
+    """Cache do próprio processo. Com vários workers, cada um enxerga só as próprias invalidações."""
+
+    nome = "memoria"
+
+    def __init__(self, ttl, max_entradas):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.contadores = _Contadores()
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # chave -> (expira_em, valor)
+        self._geracoes = {}
+
+    def geracao(self, namespace):
+        with self._lock:
+            return self._geracoes.get(namespace, 0)
+
+    def obter(self, namespace, chave):
+        with self._lock:
+            entrada = self._entradas.get((namespace, chave))
+            if entrada and entrada[0] > time.monotonic():
+                self._entradas.move_to_end((namespace, chave))
+                self.contadores.contar('acertos')
+                return True, entrada[1]
+            if entrada:
+                del self._entradas[(namespace, chave)]
+        self.contadores.contar('faltas')
+        return False, None
+
+    def guardar(self, namespace, chave, valor, geracao):
+        with self._lock:
+            # Se houve escrita enquanto o valor era calculado, ele já nasceu velho
+            if self._geracoes.get(namespace, 0) != geracao:
+                return
+            self._entradas[(namespace, chave)] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end((namespace, chave))
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, namespace):
+        with self._lock:
+            self._geracoes[namespace] = self._geracoes.get(namespace, 0) + 1
+            for chave in [c for c in self._entradas if c[0] == namespace]:
+                del self._entradas[chave]
+        self.contadores.contar('invalidacoes')
+
+    def estatisticas(self):
+        with self._lock:
+            entradas = len(self._entradas)
+        return {'backend': self.nome, 'entradas': entradas, **self.contadores.como_dict()}
+
+class CacheArquivo:
+    """Cache num arquivo SQLite local, compartilhado por todos os workers da mesma máquina."""
+
+    nome = "arquivo"
+
+    def __init__(self, ttl, max_entradas, caminho):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.caminho = caminho
+        self.contadores = _Contadores()
+        self._local = threading.local()
+        with _Transacao(self._conexao()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entradas (
+                    namespace TEXT NOT NULL,
+                    chave TEXT NOT NULL,
+                    valor BLOB NOT NULL,
+                    expira_em REAL NOT NULL,
+                    ultimo_acesso REAL NOT NULL,
+                    PRIMARY KEY (namespace, chave)
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS geracoes (namespace TEXT PRIMARY KEY, geracao INTEGER NOT NULL)")
+
+    def _conexao(self):
+        # Uma conexão por thread (e por processo: o pid invalida conexões herdadas num fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # Leituras: um SELECT em autocommit já lê um snapshot consistente e, no WAL, não trava ninguém.
+    # Só as escritas (guardar, invalidar) abrem BEGIN IMMEDIATE.
+
+    def geracao(self, namespace):
+        row = self._conexao().execute("SELECT geracao FROM geracoes WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def obter(self, namespace, chave):
+        # Um acerto não atualiza ultimo_acesso: seria uma escrita por leitura. Com o TTL curto, o despejo
+        # pela ordem de gravação basta
+        row = self._conexao().execute(
+            "SELECT valor FROM entradas WHERE namespace = ? AND chave = ? AND expira_em > ?",
+            (namespace, chave, time.time())
+        ).fetchone()
+        if row:
+            self.contadores.contar('acertos')
+            return True, pickle.loads(row[0])
+        self.contadores.contar('faltas')
+        return False, None
+
+    def guardar(self, namespace, chave, valor, geracao):
+        agora = time.time()
+        with _Transacao(self._conexao()) as conn:
+            row = conn.execute("SELECT geracao FROM geracoes WHERE namespace = ?", (namespace,)).fetchone()
+            if (row[0] if row else 0) != geracao:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?)",
+                (namespace, chave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), agora + self.ttl, agora)
+            )
+            conn.execute("DELETE FROM entradas WHERE expira_em <= ?", (agora,))
+            conn.execute("""
+                DELETE FROM entradas WHERE rowid IN (
+                    SELECT rowid FROM entradas ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entradas,))
+
+    def invalidar(self, namespace):
+        with _Transacao(self._conexao()) as conn:
+            conn.execute("""
+                INSERT INTO geracoes VALUES (?, 1)
+                ON CONFLICT (namespace) DO UPDATE SET geracao = geracao + 1
+            """, (namespace,))
+            conn.execute("DELETE FROM entradas WHERE namespace = ?", (namespace,))
+        self.contadores.contar('invalidacoes')
+
+    def estatisticas(self):
+        entradas = self._conexao().execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        # Acertos e faltas são contados por processo; as entradas são as do arquivo compartilhado
+        return {'backend': self.nome, 'caminho': self.caminho, 'entradas': entradas, **self.contadores.como_dict()}
+
+class _Transacao:
+    """'with' que abre BEGIN IMMEDIATE e faz COMMIT/ROLLBACK numa conexão em autocommit."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, tipo, valor, tb):
+        self.conn.execute("ROLLBACK" if tipo else "COMMIT")
+
+class CacheDesligado:
+    """Backend nulo: toda leitura vai ao banco."""
+
+    nome = "desligado"
+
+    def __init__(self):
+        self.contadores = _Contadores()
+
+    def geracao(self, namespace):
+        return 0
+
+    def obter(self, namespace, chave):
+        self.contadores.contar('faltas')
+        return False, None
+
+    def guardar(self, namespace, chave, valor, geracao):
+        pass
+
+    def invalidar(self, namespace):
+        pass
+
+    def estatisticas(self):
+        return {'backend': self.nome, 'entradas': 0, **self.contadores.como_dict()}
+
+def _arquivo_padrao():
+    """Arquivo do cache num diretório só do usuário atual.
+
+    Os valores são lidos com pickle: quem puder escrever no arquivo executa código na API. Por isso
+    não fica solto no /tmp compartilhado, e um diretório com o mesmo nome criado por outro usuário
+    (ou aberto para o grupo) é recusado em vez de usado.
+    """
+    if not hasattr(os, "getuid"):
+        # Windows: o diretório temporário já é por usuário
+        return os.path.join(tempfile.gettempdir(), "todo_cache.sqlite3")
+    diretorio = os.path.join(tempfile.gettempdir(), f"todo_cache-{os.getuid()}")
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    info = os.lstat(diretorio)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{diretorio} não é um diretório privado deste usuário; defina CACHE_ARQUIVO")
+    return os.path.join(diretorio, "todo_cache.sqlite3")
+
+def criar_cache(backend, ttl, max_entradas, caminho=None):
+    """Fábrica dos backends pelo nome configurado em CACHE_BACKEND."""
+    if backend == "memoria":
+        return CacheMemoria(ttl, max_entradas)
+    if backend == "arquivo":
+        return CacheArquivo(ttl, max_entradas, caminho or _arquivo_padrao())
+    if backend == "desligado":
+        return CacheDesligado()
+    raise ValueError(f"CACHE_BACKEND desconhecido: {backend!r} (use memoria, arquivo ou desligado)")
@@ -0,0 +1,103 @@
+# cliente_api.py
+# Cliente HTTP da API de tarefas usado pelos apps Flet (gui_flet.py e app_flet_final.py).
+# Uma sessão requests por app: conexões keep-alive reaproveitadas, timeouts em toda chamada
+# (uma API travada não congela mais a tela), gzip e GET condicional por ETag.
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Segundos para abrir a conexão e para esperar cada resposta
+API_TIMEOUT_CONEXAO = float(os.getenv("API_TIMEOUT_CONEXAO", "3"))
+API_TIMEOUT_LEITURA = float(os.getenv("API_TIMEOUT_LEITURA", "10"))
+# Conexões mantidas abertas com a API (listas em paralelo + fila de escrita + stream)
+API_CONEXOES = int(os.getenv("API_CONEXOES", "8"))
+# O stream SSE manda keep-alive a cada 15 s; sem nada por 60 s a conexão é dada como morta
+TIMEOUT_STREAM = 60
+
+class ClienteApi:
+    def __init__(self, url_base):
+        self.url_base = url_base.rstrip("/")
+        self.timeout = (API_TIMEOUT_CONEXAO, API_TIMEOUT_LEITURA)
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=API_CONEXOES)
+        self.sessao.mount("http://", adaptador)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+        # Última resposta de cada URL, reaproveitada quando a API responde 304 Not Modified
+        self._ultimas_respostas = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cliente-api")
+        # Vira False se a API não tiver /tarefas/stream (404); aí resta o botão de atualizar
+        self.stream_disponivel = True
+
+    def requisitar(self, method, url_path, json_data=None, **kwargs):
+        """Requisição com timeout; levanta requests.exceptions.RequestException em erro de rede ou HTTP."""
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.sessao.request(method, f"{self.url_base}{url_path}", json=json_data, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def get_condicional(self, url_path, params=None):
+        """GET com If-None-Match: se nada mudou, a API responde 304 e o corpo guardado é reaproveitado."""
+        chave = (url_path, tuple(sorted((params or {}).items())))
+        with self._lock:
+            ultima = self._ultimas_respostas.get(chave)
+        headers = {'If-None-Match': ultima[0]} if ultima else {}
+        response = self.sessao.get(f"{self.url_base}{url_path}", params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and ultima:
+            return ultima[1]
+        response.raise_for_status()
+        dados = response.json()
+        if response.headers.get('ETag'):
+            with self._lock:
+                self._ultimas_respostas[chave] = (response.headers['ETag'], dados)
+        return dados
+
+    def em_paralelo(self, *chamadas):
+        """Roda as chamadas (funções sem argumentos) ao mesmo tempo e devolve os resultados na ordem.
+
+        Como o Promise.all do cliente React: o tempo total é o da mais lenta, não a soma.
+        """
+        futuros = [self._executor.submit(chamada) for chamada in chamadas]
+        return [futuro.result() for futuro in futuros]
+
+    # --- Rotas da API ---
+
+    def revisao(self) -> int:
+        return self.requisitar("GET", "/tarefas/revisao").json()['revisao']
+
+    def estatisticas(self):
+        """Totais por status e da lixeira (GET condicional: 304 enquanto nada mudar)."""
+        return self.get_condicional("/tarefas/stats")
+
+    def pagina(self, ativo, after_id, limit):
+        url_path = "/tarefas" if ativo else "/tarefas/excluidas"
+        pagina = self.get_condicional(url_path, params={'after_id': after_id or 0, 'limit': limit})
+        return pagina['tarefas'], pagina['proximo_cursor']
+
+    def buscar(self, q, ativo, offset, limit):
+        params = {'q': q, 'offset': offset, 'limit': limit}
+        if not ativo:
+            params['lixeira'] = 1
+        # Sem GET condicional: guardar uma resposta por texto digitado só faria a memória crescer
+        pagina = self.requisitar("GET", "/tarefas/search", params=params).json()
+        return pagina['tarefas'], pagina['proximo_cursor']
+
+    def alteracoes(self, since):
+        return self.requisitar("GET", "/tarefas/changes", params={'since': since}).json()
+
+    def revisoes_do_stream(self):
+        """Gera as revisões anunciadas pelo stream SSE até a conexão cair."""
+        with self.sessao.get(f"{self.url_base}/tarefas/stream", stream=True,
+                             timeout=(API_TIMEOUT_CONEXAO, TIMEOUT_STREAM)) as response:
+            if response.status_code == 404:
+                self.stream_disponivel = False
+                return
+            response.raise_for_status()
+            for linha in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if linha and linha.startswith("data:"):
+                    yield json.loads(linha[5:])['revisao']
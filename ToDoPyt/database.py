@@ -1,11 +1,22 @@
 # database.py
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import execute_values
+from concurrent.futures import Future
+from contextlib import contextmanager
+import contextvars
+from functools import wraps
 from enum import Enum
-from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, Iterator, NamedTuple, Optional, List, Set, Tuple
 import os
+import re
+import sys
+import threading
+import time
 from dotenv import load_dotenv
+from cache import criar_cache
+import eventos
+import metricas
 
 # Carrega as variáveis do arquivo .env
 load_dotenv()
@@ -13,9 +24,62 @@ load_dotenv()
 # --- NOVA CONFIGURAÇÃO DE CONEXÃO ---
 DATABASE_URL = os.getenv("DB_CONNECTION_STRING")
 
-# --- O DATACLASS E O ENUM NÃO MUDAM ---
-@dataclass
-class Tarefa:
+# --- CONFIGURAÇÃO DO POOL DE CONEXÕES ---
+# Por processo: DB_POOL_MIN conexões abertas já na criação, até DB_POOL_MAX abertas ao mesmo tempo.
+# As devolvidas ficam guardadas (com as consultas já preparadas) até o máximo, sem reconectar. Dimensione
+# DB_POOL_MAX pelas threads que usam o banco juntas (threads do gthread + streams SSE, ou o pool do
+# servico_tarefas) e mantenha workers * DB_POOL_MAX abaixo do max_connections do servidor.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Tempo máximo (s) esperando uma conexão livre antes de desistir
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Conexões paradas há mais tempo que isso (s) são testadas com SELECT 1 antes do uso
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+# --- PAGINAÇÃO ---
+LIMITE_PAGINA_PADRAO = 100
+LIMITE_PAGINA_MAXIMO = 500
+
+# --- OPERAÇÕES EM LOTE ---
+LIMITE_LOTE = 5000
+
+# --- ARQUIVO DA LIXEIRA ---
+# Tarefas na lixeira sem alteração há mais que isto saem da tabela quente para tarefas_arquivo
+# (arquivar_lixeira.py). Para os clientes continuam na lixeira e podem ser restauradas.
+LIXEIRA_RETENCAO_DIAS = float(os.getenv("LIXEIRA_RETENCAO_DIAS", "30"))
+# Linhas movidas (ou apagadas) por transação: cada lote trava só as próprias linhas, e por pouco tempo
+ARQUIVO_LOTE = int(os.getenv("ARQUIVO_LOTE", "1000"))
+# Dias no arquivo antes de a tarefa ser apagada de vez (purgar_arquivo). Vazio: o arquivo guarda tudo
+ARQUIVO_RETENCAO_DIAS = float(os.environ["ARQUIVO_RETENCAO_DIAS"]) if os.getenv("ARQUIVO_RETENCAO_DIAS") else None
+
+# --- ESCRITA AGRUPADA (group commit) ---
+# Milissegundos que atualizar_status, desativar_tarefa e recuperar_tarefa esperam por outras
+# escritas para gravar tudo numa transação só. 0 desliga (uma transação por chamada).
+# Só no PostgreSQL: o backend SQLite mantém as próprias funções.
+DB_ESCRITA_AGRUPADA_MS = float(os.getenv("DB_ESCRITA_AGRUPADA_MS", "0"))
+
+# --- LISTAGEM EM STREAMING ---
+# Linhas lidas do cursor do lado do servidor por vez: a memória de uma resposta não cresce com a tabela
+TAMANHO_LOTE_STREAM = 1000
+
+# --- BUSCA ---
+# Palavras consideradas de uma consulta (o resto é ignorado)
+LIMITE_TERMOS_BUSCA = 8
+# Linhas que casam com a consulta e entram na ordenação por relevância. Um termo que casa com
+# meio banco (ex.: "tarefa") custaria uma leitura da tabela inteira; com o teto, custa isto.
+LIMITE_CANDIDATOS_BUSCA = 1000
+
+# --- CACHE DAS LISTAGENS ---
+# 'memoria' vale por processo: no PostgreSQL, as escritas dos outros workers o invalidam pelo NOTIFY
+# da revisão; 'arquivo' compartilha as entradas entre os workers da máquina
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "5"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "256"))
+CACHE_ARQUIVO = os.getenv("CACHE_ARQUIVO")
+
+# --- TAREFA E STATUS ---
+class Tarefa(NamedTuple):
+    """Uma linha de 'tarefas'. É uma tupla: sai pronta da linha do cursor, sem __dict__ por instância."""
     id: int
     titulo: str
     status: str
@@ -26,104 +90,1135 @@ class StatusTarefa(Enum):
     FAZENDO = "fazendo"
     CONCLUIDA = "concluída"
 
+# Cada status lido do banco passa a apontar para a mesma string, em vez de uma cópia por linha
+_STATUS_INTERNADO = {status.value: sys.intern(status.value) for status in StatusTarefa}
+
+# Colunas na ordem dos campos de Tarefa; as consultas pedem só estas, num cursor de tuplas
+COLUNAS_TAREFA = "id, titulo, status, ativo"
+
 # --- FUNÇÕES ADAPTADAS PARA POSTGRESQL ---
 
+class _CursorMedido(psycopg2.extensions.cursor):
+    """Cursor que registra em metricas o tempo de execute e de cada fetch, e as linhas lidas."""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metricas.fase('executar', inicio, query)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        row = super().fetchone()
+        metricas.fase('buscar', inicio, self.query, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        metricas.fase('buscar', inicio, self.query, len(rows))
+        return rows
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        rows = super().fetchall()
+        metricas.fase('buscar', inicio, self.query, len(rows))
+        return rows
+
+class _ConexaoMedida(psycopg2.extensions.connection):
+    """Conexão cujos cursores são medidos, assim como commit e rollback."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Consultas de _PREPARADAS já preparadas nesta sessão do servidor
+        self.preparadas = set()
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', _CursorMedido)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            metricas.fase('confirmar', inicio)
+
+    def rollback(self):
+        inicio = time.perf_counter()
+        try:
+            return super().rollback()
+        finally:
+            metricas.fase('desfazer', inicio)
+
+class PoolDeConexoes:
+    """Pool de conexões thread-safe com limite de tamanho, health check e estatísticas."""
+
+    def __init__(self, dsn, minconn, maxconn, timeout, healthcheck_idle):
+        self.pid = os.getpid()
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn, connection_factory=_ConexaoMedida)
+        # O ThreadedConnectionPool lança erro quando esgota; o semáforo faz a thread esperar
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._ultimo_uso = {}
+        # As ociosas ficam aqui, não no ThreadedConnectionPool: o putconn dele fecha toda conexão além de
+        # minconn, e cada reconexão perderia as consultas preparadas. Para ele, continuam emprestadas;
+        # só volta para ele (fechada) a conexão descartada. Começa com as minconn que ele abriu.
+        self._ociosas = [self._pool.getconn() for _ in range(minconn)]
+        self._em_uso = 0
+        self._retiradas = 0
+        self._descartadas = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def obter(self):
+        inicio = time.monotonic()
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(f"Nenhuma conexão livre após {self.timeout}s (máximo: {self.maxconn}).")
+        espera = time.monotonic() - inicio
+        metricas.espera_pool(espera)
+        try:
+            # Depois de um restart do banco todas as ociosas podem estar mortas: descarta uma a uma até
+            # achar uma boa ou o pool abrir uma nova (que também é verificada)
+            for _ in range(self.maxconn + 1):
+                conn = self._retirar()
+                if self._saudavel(conn):
+                    break
+                self._descartar(conn)
+            else:
+                raise psycopg2.OperationalError(f"Nenhuma conexão saudável após {self.maxconn + 1} tentativas.")
+        except Exception:
+            self._vagas.release()
+            raise
+        with self._lock:
+            self._em_uso += 1
+            self._retiradas += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+        return conn
+
+    def devolver(self, conn):
+        try:
+            with self._lock:
+                self._em_uso -= 1
+                self._ultimo_uso[id(conn)] = time.monotonic()
+            self._guardar(conn)
+        finally:
+            self._vagas.release()
+
+    def _retirar(self):
+        with self._lock:
+            # A última devolvida primeiro: é a que tem menos chance de ter caído
+            if self._ociosas:
+                return self._ociosas.pop()
+        # Sem ociosas, abre uma nova (o semáforo garante que não passa de maxconn)
+        return self._pool.getconn()
+
+    def _guardar(self, conn):
+        try:
+            if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # Transação aberta ou com erro: como o putconn faria antes de guardar
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+        if conn.closed or conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self._descartar(conn)
+            return
+        with self._lock:
+            self._ociosas.append(conn)
+
+    def _saudavel(self, conn):
+        if conn.closed:
+            return False
+        ultimo_uso = self._ultimo_uso.get(id(conn))
+        if ultimo_uso is not None and time.monotonic() - ultimo_uso < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._ultimo_uso.pop(id(conn), None)
+            self._descartadas += 1
+        self._pool.putconn(conn, close=True)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'min': self._pool.minconn,
+                'max': self.maxconn,
+                'em_uso': self._em_uso,
+                'ociosas': len(self._ociosas),
+                'retiradas': self._retiradas,
+                'descartadas': self._descartadas,
+                'espera_total_ms': round(self._espera_total * 1000, 3),
+                'espera_media_ms': round(self._espera_total * 1000 / self._retiradas, 3) if self._retiradas else 0.0,
+                'espera_max_ms': round(self._espera_max * 1000, 3),
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _obter_pool() -> PoolDeConexoes:
+    """Cria o pool sob demanda, uma vez por processo (cada worker do gunicorn tem o seu)."""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                # Após um fork as conexões herdadas pertencem ao processo pai: não as reutilizamos
+                _pool = PoolDeConexoes(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE)
+    return _pool
+
+@contextmanager
 def get_db_connection():
-    """Cria e retorna uma nova conexão com o banco de dados."""
-    conn = psycopg2.connect(DATABASE_URL)
-    return conn
+    """Empresta uma conexão do pool do processo e a devolve ao final do bloco 'with'."""
+    pool = _obter_pool()
+    inicio = time.perf_counter()
+    conn = pool.obter()
+    metricas.fase('conectar', inicio)
+    try:
+        yield conn
+    finally:
+        pool.devolver(conn)
 
-def init_db():
-    """Cria a tabela de tarefas se ela não existir."""
-    conn = get_db_connection()
+def estatisticas_pool() -> dict:
+    """Retorna os números do pool (em uso, ociosas, tempo de espera) para dimensionamento."""
+    return _obter_pool().estatisticas()
+
+# --- CONSULTAS PREPARADAS, UMA IDA E VOLTA POR CHAMADA ---
+# As consultas quentes são preparadas uma vez em cada conexão do pool (PREPARE) e depois só executadas
+# (EXECUTE nome(...)): o servidor não analisa nem planeja o texto de novo. Rodam em autocommit e cada
+# uma é um comando só (as escritas levam revisão, UPDATE e NOTIFY em CTEs), então a chamada custa uma
+# ida e volta ao servidor: sem BEGIN antes nem COMMIT/ROLLBACK depois. A primeira chamada de cada
+# consulta numa conexão custa mais uma, a do PREPARE. O PREPARE vale para a sessão: atrás de um
+# PgBouncer, só com pool_mode=session.
+
+def _sql_escrita(condicao: str, atribuicao: str) -> str:
+    """Escrita de uma tarefa ($1 = id) num comando: revisão nova só se alguma linha cumpre a condição.
+
+    Se outra transação muda a linha entre a leitura de 'alvo' e o UPDATE, a revisão avança sem
+    tarefa alterada (nada é notificado e os clientes não perdem nada).
+    """
+    return f"""
+        WITH alvo AS (SELECT id FROM tarefas WHERE {condicao}),
+        rev AS (
+            UPDATE tarefas_revisao SET revisao = revisao + 1
+            WHERE EXISTS (SELECT FROM alvo)
+            RETURNING revisao
+        ),
+        alteradas AS (
+            UPDATE tarefas SET {atribuicao}, revisao = rev.revisao, atualizada_em = now()
+            FROM rev WHERE {condicao}
+            RETURNING tarefas.id, rev.revisao
+        )
+        SELECT id, pg_notify('{eventos.CANAL}', revisao::text) FROM alteradas"""
+
+def _sql_lixeira(filtro: str = "", limite: str = "") -> str:
+    """Tarefas da lixeira nas duas tabelas (quente e arquivo), por id. 'filtro' começa com AND.
+
+    Cada lado já sai ordenado e limitado pelo próprio índice: o PostgreSQL só intercala os dois.
+    """
+    return f"""
+        (SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = FALSE {filtro} ORDER BY id {limite})
+        UNION ALL
+        (SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE TRUE {filtro} ORDER BY id {limite})
+        ORDER BY id {limite}"""
+
+# nome -> (tipos dos parâmetros, SQL com $1, $2...). Nas listagens, 'ativo' vai no texto e não como
+# parâmetro: com o plano genérico que o PostgreSQL adota depois de algumas execuções, um parâmetro
+# em 'ativo' impediria o uso dos índices parciais (WHERE ativo = TRUE / FALSE).
+_PREPARADAS = {
+    'revisao_atual': ("", "SELECT revisao FROM tarefas_revisao"),
+    # Revisão e contadores num comando só: saem do mesmo snapshot
+    'contar_tarefas': ("", """SELECT r.revisao, c.status, c.ativo, c.total
+                              FROM tarefas_revisao r LEFT JOIN tarefas_contagem c ON TRUE"""),
+    # As tarefas arquivadas mantêm a revisão com que saíram da tabela quente
+    'listar_alteracoes': ("(bigint)", f"""
+        SELECT r.revisao, t.id, t.titulo, t.status, t.ativo
+        FROM tarefas_revisao r LEFT JOIN (
+            SELECT {COLUNAS_TAREFA} FROM tarefas WHERE revisao > $1
+            UNION ALL
+            SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE revisao > $1
+        ) AS t ON TRUE
+        ORDER BY t.id"""),
+    'buscar_tarefa_por_id': ("(integer)", f"""
+        SELECT {COLUNAS_TAREFA} FROM tarefas WHERE id = $1
+        UNION ALL
+        SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE id = $1"""),
+    'adicionar_tarefa': ("(text)", f"""
+        WITH rev AS (UPDATE tarefas_revisao SET revisao = revisao + 1 RETURNING revisao),
+        nova AS (
+            INSERT INTO tarefas (titulo, status, revisao)
+            SELECT $1, '{StatusTarefa.PENDENTE.value}', revisao FROM rev
+            RETURNING {COLUNAS_TAREFA}, revisao
+        )
+        SELECT {COLUNAS_TAREFA}, pg_notify('{eventos.CANAL}', revisao::text) FROM nova"""),
+    'atualizar_status': ("(integer, text)", _sql_escrita("id = $1 AND ativo = TRUE", "status = $2")),
+    'desativar_tarefa': ("(integer)", _sql_escrita("id = $1", "ativo = FALSE")),
+    'recuperar_tarefa': ("(integer)", _sql_escrita("id = $1", "ativo = TRUE")),
+    # Tira do arquivo e devolve à tabela quente, já ativas, com o mesmo id e uma revisão nova
+    # A revisão é travada antes das linhas do arquivo, como em _sql_escrita e na purga
+    'recuperar_do_arquivo': ("(integer[])", f"""
+        WITH rev AS (
+            UPDATE tarefas_revisao SET revisao = revisao + 1
+            WHERE EXISTS (SELECT FROM tarefas_arquivo WHERE id = ANY($1))
+            RETURNING revisao
+        ),
+        saidas AS (
+            DELETE FROM tarefas_arquivo USING rev WHERE tarefas_arquivo.id = ANY($1)
+            RETURNING tarefas_arquivo.id, tarefas_arquivo.titulo, tarefas_arquivo.status, rev.revisao
+        ),
+        voltas AS (
+            INSERT INTO tarefas (id, titulo, status, ativo, revisao)
+            SELECT id, titulo, status, TRUE, revisao FROM saidas
+            RETURNING id, revisao
+        )
+        SELECT id, pg_notify('{eventos.CANAL}', revisao::text) FROM voltas"""),
+    # Um lote da rotina de arquivamento, sem revisão nova: o que os clientes veem não muda.
+    # SKIP LOCKED: linhas presas numa escrita ficam para o próximo lote, ninguém espera
+    'arquivar_lixeira': ("(float8, integer)", """
+        WITH alvo AS (
+            SELECT id FROM tarefas
+            WHERE ativo = FALSE AND atualizada_em < now() - $1 * interval '1 day'
+            ORDER BY atualizada_em LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        ),
+        movidas AS (
+            DELETE FROM tarefas USING alvo WHERE tarefas.id = alvo.id
+            RETURNING tarefas.id, tarefas.titulo, tarefas.status, tarefas.revisao, tarefas.atualizada_em
+        )
+        INSERT INTO tarefas_arquivo (id, titulo, status, revisao, atualizada_em)
+        SELECT id, titulo, status, revisao, atualizada_em FROM movidas"""),
+    'listar_ativas': ("", f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE ORDER BY id"),
+    'pagina_ativas': ("(integer, integer)", f"""
+        SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE AND id > $1 ORDER BY id LIMIT $2"""),
+    'pagina_ativas_status': ("(integer, text, integer)", f"""
+        SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE AND id > $1 AND status = $2 ORDER BY id LIMIT $3"""),
+    # A lixeira soma a tabela quente e o arquivo
+    'listar_excluidas': ("", _sql_lixeira()),
+    'pagina_excluidas': ("(integer, integer)", _sql_lixeira("AND id > $1", "LIMIT $2")),
+    'pagina_excluidas_status': ("(integer, text, integer)", _sql_lixeira("AND id > $1 AND status = $2", "LIMIT $3")),
+}
+
+@contextmanager
+def _cursor_autocommit():
+    """Cursor de uma conexão do pool em autocommit: cada comando é a própria transação."""
+    with get_db_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                yield cur
+        finally:
+            # Numa conexão que caiu, mexer no autocommit levantaria outro erro por cima do original
+            if not conn.closed:
+                conn.autocommit = False
+
+def _executar(cur, nome: str, *parametros):
+    """EXECUTE da consulta preparada 'nome', preparando-a antes se esta conexão ainda não a tem."""
+    conn = cur.connection
+    if nome not in conn.preparadas:
+        tipos, sql = _PREPARADAS[nome]
+        cur.execute(f"PREPARE {nome}{tipos} AS {sql};")
+        conn.preparadas.add(nome)
+    if parametros:
+        cur.execute(f"EXECUTE {nome}({', '.join(['%s'] * len(parametros))});", parametros)
+    else:
+        cur.execute(f"EXECUTE {nome};")
+
+# --- CACHE READ-THROUGH ---
+# Namespaces: 'ativas' e 'excluidas'. Cada escrita invalida só a(s) lista(s) que pode ter alterado.
+# A chave leva a revisão lida antes da consulta: o valor guardado nunca é mais velho que ela, então
+# um ETag montado com a mesma revisão nunca acompanha uma lista velha, nem quando a escrita foi feita
+# em outro worker e a invalidação ainda não chegou aqui.
+cache_listas = criar_cache(CACHE_BACKEND, CACHE_TTL, CACHE_MAX_ENTRADAS, CACHE_ARQUIVO)
+
+# Revisão já lida pela requisição (a do ETag); sem ela, o cache lê a revisão atual antes de procurar
+_revisao_da_leitura = contextvars.ContextVar("revisao_da_leitura", default=None)
+
+@contextmanager
+def lendo_na_revisao(revisao: int):
+    """As listagens cacheadas dentro do 'with' usam 'revisao' (lida antes delas) na chave do cache."""
+    token = _revisao_da_leitura.set(revisao)
+    try:
+        yield
+    finally:
+        _revisao_da_leitura.reset(token)
+
+def _cacheado(namespace):
+    """Decorador: serve a listagem do cache ou consulta o banco e guarda o resultado."""
+    def decorador(func):
+        @wraps(func)
+        def envoltorio(*args, **kwargs):
+            # Sem a revisão do ETag, a que o NOTIFY já trouxe: um acerto não vai ao banco
+            revisao = _revisao_da_leitura.get()
+            if revisao is None:
+                revisao = _revisao_acompanhada()
+            if revisao is None:
+                revisao = revisao_atual()
+            chave = repr((func.__name__, revisao, args, sorted(kwargs.items())))
+            achou, valor = cache_listas.obter(namespace, chave)
+            if achou:
+                return valor
+            # A geração é lida antes da consulta para descartar resultados que uma escrita já tornou velhos
+            geracao = cache_listas.geracao(namespace)
+            valor = func(*args, **kwargs)
+            cache_listas.guardar(namespace, chave, valor, geracao)
+            return valor
+        return envoltorio
+    return decorador
+
+def _invalidar(*namespaces):
+    for namespace in namespaces:
+        cache_listas.invalidar(namespace)
+
+# No PostgreSQL, uma thread por worker assina o NOTIFY da revisão e guarda a última recebida, que
+# vira a chave das listagens chamadas fora de uma requisição com ETag. A cada revisão nova (de
+# qualquer worker) o cache 'memoria' também é invalidado: ele só vê as invalidações do próprio
+# processo, e a notificação não diz qual lista mudou. Se a escuta cair, a revisão guardada para de
+# andar, mas cada entrada ainda expira pelo TTL e a próxima falta lê o banco.
+_acompanhando_pid = None
+_acompanhando_lock = threading.Lock()
+# (pid, revisão): o pid descarta o valor herdado do processo pai num fork
+_revisao_notificada = None
+
+def _revisao_acompanhada() -> Optional[int]:
+    """Última revisão recebida pelo NOTIFY neste processo; None até chegar a primeira (ou no SQLite)."""
+    global _acompanhando_pid
+    if BACKEND != "postgresql" or cache_listas.nome == "desligado":
+        return None
+    pid = os.getpid()
+    if _acompanhando_pid != pid:
+        with _acompanhando_lock:
+            if _acompanhando_pid != pid:
+                fila = assinar_alteracoes()
+                threading.Thread(target=_acompanhar_revisoes, args=(fila, pid), name="cache-revisoes", daemon=True).start()
+                _acompanhando_pid = pid
+    notificada = _revisao_notificada
+    return notificada[1] if notificada is not None and notificada[0] == pid else None
+
+def _acompanhar_revisoes(fila, pid):
+    global _revisao_notificada
+    while True:
+        revisao = fila.get()
+        if cache_listas.nome == "memoria":
+            _invalidar('ativas', 'excluidas')
+        # Só depois de invalidar: quem ler a revisão nova não acha uma entrada velha guardada com ela
+        _revisao_notificada = (pid, revisao)
+
+def estatisticas_cache() -> dict:
+    """Acertos, faltas e invalidações do cache das listagens."""
+    return cache_listas.estatisticas()
+
+# --- MIGRAÇÕES DE ESQUEMA ---
+# Cada migração roda uma única vez, em ordem, e fica registrada em 'schema_versao'.
+# Para evoluir o banco, acrescente uma nova tupla (versão, descrição, SQL) no final.
+MIGRACOES = [
+    (1, "índices parciais para listagens e filtro por status", """
+        CREATE INDEX IF NOT EXISTS idx_tarefas_ativas_id ON tarefas (id) WHERE ativo = TRUE;
+        CREATE INDEX IF NOT EXISTS idx_tarefas_excluidas_id ON tarefas (id) WHERE ativo = FALSE;
+        CREATE INDEX IF NOT EXISTS idx_tarefas_ativas_status_id ON tarefas (status, id) WHERE ativo = TRUE;
+    """),
+    (2, "contador de revisão do conjunto de tarefas (ETag)", """
+        CREATE TABLE IF NOT EXISTS tarefas_revisao (
+            unica BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (unica),
+            revisao BIGINT NOT NULL
+        );
+        INSERT INTO tarefas_revisao (revisao) VALUES (0) ON CONFLICT DO NOTHING;
+    """),
+    (3, "revisão e data de alteração por tarefa (sincronização incremental)", """
+        ALTER TABLE tarefas
+            ADD COLUMN IF NOT EXISTS revisao BIGINT NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS atualizada_em TIMESTAMPTZ NOT NULL DEFAULT now();
+        CREATE INDEX IF NOT EXISTS idx_tarefas_revisao ON tarefas (revisao);
+    """),
+    (4, "busca textual (tsvector em português sem acentos) e por trigramas nos títulos", """
+        CREATE EXTENSION IF NOT EXISTS unaccent;
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        -- unaccent() não é IMMUTABLE (depende do dicionário); índices e colunas geradas exigem que seja
+        CREATE OR REPLACE FUNCTION tarefas_sem_acento(texto TEXT) RETURNS TEXT
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            AS $$ SELECT unaccent('unaccent', texto) $$;
+        ALTER TABLE tarefas ADD COLUMN IF NOT EXISTS busca TSVECTOR
+            GENERATED ALWAYS AS (to_tsvector('portuguese', tarefas_sem_acento(titulo))) STORED;
+        CREATE INDEX IF NOT EXISTS idx_tarefas_busca ON tarefas USING GIN (busca);
+        CREATE INDEX IF NOT EXISTS idx_tarefas_titulo_trgm ON tarefas
+            USING GIN (tarefas_sem_acento(lower(titulo)) gin_trgm_ops);
+    """),
+    (5, "contadores por status e ativo, mantidos por triggers (/tarefas/stats)", """
+        CREATE TABLE IF NOT EXISTS tarefas_contagem (
+            status TEXT NOT NULL,
+            ativo BOOLEAN NOT NULL,
+            total BIGINT NOT NULL,
+            PRIMARY KEY (status, ativo)
+        );
+        -- Triggers por comando, com as tabelas de transição: um lote de 5000 linhas vira
+        -- um upsert por (status, ativo), não 5000. As escritas já são serializadas pela linha de
+        -- tarefas_revisao, então os contadores não criam disputa nova.
+        CREATE OR REPLACE FUNCTION tarefas_contar() RETURNS TRIGGER LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO tarefas_contagem (status, ativo, total)
+                SELECT status, ativo, count(*) FROM novas GROUP BY status, ativo
+                ON CONFLICT (status, ativo) DO UPDATE SET total = tarefas_contagem.total + EXCLUDED.total;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE tarefas_contagem AS c SET total = c.total - d.n
+                FROM (SELECT status, ativo, count(*) AS n FROM antigas GROUP BY status, ativo) AS d
+                WHERE c.status = d.status AND c.ativo = d.ativo;
+            ELSE
+                INSERT INTO tarefas_contagem (status, ativo, total)
+                SELECT status, ativo, sum(n) FROM (
+                    SELECT status, ativo, count(*) AS n FROM novas GROUP BY status, ativo
+                    UNION ALL
+                    SELECT status, ativo, -count(*) FROM antigas GROUP BY status, ativo
+                ) AS delta
+                GROUP BY status, ativo HAVING sum(n) <> 0
+                ON CONFLICT (status, ativo) DO UPDATE SET total = tarefas_contagem.total + EXCLUDED.total;
+            END IF;
+            RETURN NULL;
+        END $$;
+        DROP TRIGGER IF EXISTS tarefas_contar_inserir ON tarefas;
+        DROP TRIGGER IF EXISTS tarefas_contar_alterar ON tarefas;
+        DROP TRIGGER IF EXISTS tarefas_contar_apagar ON tarefas;
+        CREATE TRIGGER tarefas_contar_inserir AFTER INSERT ON tarefas
+            REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION tarefas_contar();
+        CREATE TRIGGER tarefas_contar_alterar AFTER UPDATE ON tarefas
+            REFERENCING OLD TABLE AS antigas NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION tarefas_contar();
+        CREATE TRIGGER tarefas_contar_apagar AFTER DELETE ON tarefas
+            REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION tarefas_contar();
+        -- CREATE TRIGGER bloqueou as escritas até o fim da migração: a contagem inicial não perde nada
+        DELETE FROM tarefas_contagem;
+        INSERT INTO tarefas_contagem (status, ativo, total)
+        SELECT status, ativo, count(*) FROM tarefas GROUP BY status, ativo;
+    """),
+    (6, "arquivo da lixeira (tarefas excluídas há mais de LIXEIRA_RETENCAO_DIAS)", """
+        -- Mesmas colunas de tarefas, sem a busca: o que está aqui continua na lixeira para os clientes
+        CREATE TABLE IF NOT EXISTS tarefas_arquivo (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            ativo BOOLEAN NOT NULL DEFAULT FALSE CHECK (NOT ativo),
+            revisao BIGINT NOT NULL,
+            atualizada_em TIMESTAMPTZ NOT NULL,
+            arquivada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_revisao ON tarefas_arquivo (revisao);
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_status_id ON tarefas_arquivo (status, id);
+        -- Candidatas ao arquivamento, das mais antigas para as mais novas
+        CREATE INDEX IF NOT EXISTS idx_tarefas_excluidas_atualizada ON tarefas (atualizada_em) WHERE ativo = FALSE;
+        -- As linhas do arquivo também contam em tarefas_contagem (como ativo = FALSE): mover da
+        -- tabela quente para o arquivo não muda os totais da lixeira
+        DROP TRIGGER IF EXISTS tarefas_arquivo_contar_inserir ON tarefas_arquivo;
+        DROP TRIGGER IF EXISTS tarefas_arquivo_contar_apagar ON tarefas_arquivo;
+        CREATE TRIGGER tarefas_arquivo_contar_inserir AFTER INSERT ON tarefas_arquivo
+            REFERENCING NEW TABLE AS novas FOR EACH STATEMENT EXECUTE FUNCTION tarefas_contar();
+        CREATE TRIGGER tarefas_arquivo_contar_apagar AFTER DELETE ON tarefas_arquivo
+            REFERENCING OLD TABLE AS antigas FOR EACH STATEMENT EXECUTE FUNCTION tarefas_contar();
+    """),
+    (7, "índice da purga do arquivo da lixeira (ARQUIVO_RETENCAO_DIAS)", """
+        CREATE INDEX IF NOT EXISTS idx_tarefas_arquivo_arquivada ON tarefas_arquivo (arquivada_em);
+    """),
+    (8, "chaves de idempotência das criações em lote (POST /tarefas/batch)", """
+        -- Some junto com a tarefa (lixeira arquivada, purga): a chave só serve para reenvios recentes
+        CREATE TABLE IF NOT EXISTS tarefas_criacoes (
+            chave TEXT PRIMARY KEY,
+            id INTEGER NOT NULL REFERENCES tarefas (id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_tarefas_criacoes_id ON tarefas_criacoes (id);
+    """),
+    (9, "tarefas_sem_acento chama o unaccent pelo schema da extensão, independente do search_path", """
+        -- Sem isso a função (usada na coluna gerada e no índice) falha em sessões cujo search_path
+        -- não inclui o schema da extensão, ex.: pg_dump/pg_restore, que o esvaziam
+        DO $migracao$
+        DECLARE
+            esquema TEXT := (SELECT extnamespace::regnamespace::text FROM pg_extension WHERE extname = 'unaccent');
+        BEGIN
+            EXECUTE format($funcao$
+                CREATE OR REPLACE FUNCTION tarefas_sem_acento(texto TEXT) RETURNS TEXT
+                    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                    AS $corpo$ SELECT %1$s.unaccent('%1$s.unaccent'::regdictionary, texto) $corpo$;
+            $funcao$, esquema);
+        END
+        $migracao$;
+    """),
+]
+
+# Chave arbitrária do advisory lock que serializa init_db entre workers
+_LOCK_MIGRACOES = 7_201_001
+
+def _criar_tabela(cur):
+    # Sintaxe do PostgreSQL: SERIAL PRIMARY KEY auto-incrementa o ID.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id SERIAL PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            ativo BOOLEAN NOT NULL DEFAULT TRUE
+        );
+    """)
+
+def _aplicar_migracoes(conn) -> List[int]:
+    """Aplica as migrações pendentes na conexão dada e retorna as versões aplicadas."""
+    aplicadas = []
     with conn.cursor() as cur:
-        # Sintaxe do PostgreSQL: SERIAL PRIMARY KEY auto-incrementa o ID.
+        # Vários workers do gunicorn podem chamar init_db ao mesmo tempo
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_MIGRACOES,))
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS tarefas (
-                id SERIAL PRIMARY KEY,
-                titulo TEXT NOT NULL,
-                status TEXT NOT NULL,
-                ativo BOOLEAN NOT NULL DEFAULT TRUE
+            CREATE TABLE IF NOT EXISTS schema_versao (
+                versao INTEGER PRIMARY KEY,
+                descricao TEXT NOT NULL,
+                aplicada_em TIMESTAMPTZ NOT NULL DEFAULT now()
             );
         """)
+        cur.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao;")
+        versao_atual = cur.fetchone()[0]
+        for versao, descricao, sql in MIGRACOES:
+            if versao <= versao_atual:
+                continue
+            cur.execute(sql)
+            cur.execute("INSERT INTO schema_versao (versao, descricao) VALUES (%s, %s);", (versao, descricao))
+            aplicadas.append(versao)
     conn.commit()
-    conn.close()
+    return aplicadas
+
+def init_db():
+    """Cria a tabela de tarefas se ela não existir e aplica as migrações pendentes."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            _criar_tabela(cur)
+        conn.commit()
+        _aplicar_migracoes(conn)
+
+# --- REVISÃO DO CONJUNTO DE TAREFAS ---
+# Toda escrita incrementa o contador na mesma transação. O lock da linha faz as
+# revisões seguirem a ordem de commit, então revisão igual significa dados iguais.
+# O NOTIFY só é entregue se a transação for confirmada.
+
+def _proxima_revisao(cur) -> int:
+    cur.execute("UPDATE tarefas_revisao SET revisao = revisao + 1 RETURNING revisao;")
+    revisao = cur.fetchone()[0]
+    cur.execute("SELECT pg_notify(%s, %s);", (eventos.CANAL, str(revisao)))
+    return revisao
+
+def _finalizar_escrita(conn, alterou: bool):
+    """Confirma a transação só se algo mudou; senão desfaz, inclusive o incremento da revisão."""
+    if alterou:
+        conn.commit()
+    else:
+        conn.rollback()
+
+def revisao_atual() -> int:
+    """Revisão corrente das tarefas: muda a cada escrita confirmada."""
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'revisao_atual')
+        return cur.fetchone()[0]
+
+def assinar_alteracoes():
+    """Fila que recebe a revisão nova a cada escrita confirmada (em qualquer processo)."""
+    return eventos.ouvinte(DATABASE_URL).assinar()
+
+def cancelar_assinatura(fila):
+    eventos.ouvinte(DATABASE_URL).cancelar(fila)
+
+def contar_tarefas() -> Tuple[int, Dict[Tuple[str, bool], int]]:
+    """Totais por (status, ativo), lidos dos contadores (sem COUNT na tabela), e a revisão deles."""
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'contar_tarefas')
+        rows = cur.fetchall()
+    return rows[0][0], {(status, ativo): total for _, status, ativo, total in rows if status is not None}
+
+def _tarefa_da_linha(row) -> Tarefa:
+    """Linha (id, titulo, status, ativo) de um cursor comum -> Tarefa, sem dicionário no meio."""
+    status = row[2]
+    return Tarefa(row[0], row[1], _STATUS_INTERNADO.get(status, status), row[3])
 
 def _map_row_to_tarefa(row):
-    """Converte uma linha do banco (dicionário) em um objeto Tarefa."""
+    """Como _tarefa_da_linha, mas aceita None (busca que não achou nada)."""
     if not row:
         return None
-    # O status vem do DB como texto, convertemos para nosso Enum para consistência
-    # O dataclass não precisa mais do campo 'status', pois já está no objeto
-    return Tarefa(id=row['id'], titulo=row['titulo'], status=row['status'], ativo=row['ativo'])
+    return _tarefa_da_linha(row)
+
 
+def listar_alteracoes(desde: int) -> Tuple[int, List[Tarefa]]:
+    """Tarefas criadas ou alteradas depois da revisão 'desde', e a revisão que elas levam o cliente."""
+    with _cursor_autocommit() as cur:
+        # Contador e linhas no mesmo comando, logo no mesmo snapshot: nada fica entre as duas leituras.
+        # Linhas anteriores à migração 3 têm revisão 0: desde=0 precisa trazê-las também
+        _executar(cur, 'listar_alteracoes', desde if desde > 0 else -1)
+        rows = cur.fetchall()
+    return rows[0][0], [_tarefa_da_linha(row[1:]) for row in rows if row[1] is not None]
 
+@_cacheado('ativas')
 def listar_tarefas() -> List[Tarefa]:
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        # Placeholders no psycopg2 são '%s' em vez de '?'
-        cur.execute("SELECT * FROM tarefas WHERE ativo = TRUE ORDER BY id;")
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'listar_ativas')
         rows = cur.fetchall()
-    conn.close()
-    return [_map_row_to_tarefa(row) for row in rows]
+    return list(map(_tarefa_da_linha, rows))
 
+@_cacheado('excluidas')
 def listar_tarefas_excluidas() -> List[Tarefa]:
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("SELECT * FROM tarefas WHERE ativo = FALSE ORDER BY id;")
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'listar_excluidas')
+        rows = cur.fetchall()
+    return list(map(_tarefa_da_linha, rows))
+
+def _listar_pagina(ativo: bool, after_id: Optional[int], limit: int, status: Optional[StatusTarefa]) -> Tuple[List[Tarefa], Optional[int]]:
+    """Busca uma página por keyset (id > after_id) e devolve (tarefas, cursor da próxima página)."""
+    limit = max(1, min(limit, LIMITE_PAGINA_MAXIMO))
+    nome = 'pagina_ativas' if ativo else 'pagina_excluidas'
+    params = [after_id or 0]
+    if status is not None:
+        nome += '_status'
+        params.append(status.value)
+    # Pedimos uma linha a mais só para saber se existe próxima página
+    params.append(limit + 1)
+    with _cursor_autocommit() as cur:
+        _executar(cur, nome, *params)
         rows = cur.fetchall()
-    conn.close()
-    return [_map_row_to_tarefa(row) for row in rows]
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    proximo_cursor = tarefas[-1].id if len(rows) > limit else None
+    return tarefas, proximo_cursor
+
+@_cacheado('ativas')
+def listar_tarefas_paginado(after_id: Optional[int] = None, limit: int = LIMITE_PAGINA_PADRAO,
+                            status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return _listar_pagina(True, after_id, limit, status)
+
+@_cacheado('excluidas')
+def listar_tarefas_excluidas_paginado(after_id: Optional[int] = None, limit: int = LIMITE_PAGINA_PADRAO,
+                                      status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return _listar_pagina(False, after_id, limit, status)
+
+def iterar_tarefas(ativo: bool, tamanho_lote: int = TAMANHO_LOTE_STREAM) -> Iterator[List[Tarefa]]:
+    """Percorre as tarefas ativas (ou da lixeira) em lotes, por um cursor nomeado (do lado do servidor).
+
+    A conexão fica emprestada até o gerador terminar ou ser fechado.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(name="iterar_tarefas") as cur:
+            cur.itersize = tamanho_lote
+            if ativo:
+                cur.execute(f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE ORDER BY id;")
+            else:
+                cur.execute(_sql_lixeira() + ";")
+            while (rows := cur.fetchmany(tamanho_lote)):
+                yield list(map(_tarefa_da_linha, rows))
+        conn.rollback()
+
+def termos_de_busca(q: str) -> List[str]:
+    """Palavras da consulta, em minúsculas; pontuação e operadores digitados são descartados."""
+    return re.findall(r"\w+", q.lower())[:LIMITE_TERMOS_BUSCA]
+
+# Texto completo (cada palavra como prefixo, 'acao:* & urg:*') OU semelhança de trigramas com alguma
+# palavra do título, que pega erros de digitação. Os dois lados usam índice GIN (migração 4); a
+# relevância soma os dois e é calculada só sobre as LIMITE_CANDIDATOS_BUSCA tarefas mais novas que
+# casaram (ordem por id: a mesma a cada requisição, então as páginas por offset não mudam entre si).
+# Uma linha a mais diz se ficaram tarefas de fora: 'truncada' avisa o cliente.
+_SQL_BUSCA = f"""
+    SELECT {COLUNAS_TAREFA}, truncada FROM (
+        SELECT {COLUNAS_TAREFA},
+               ts_rank_cd(busca, to_tsquery('portuguese', tarefas_sem_acento(%(prefixos)s)))
+               + word_similarity(tarefas_sem_acento(%(termo)s), tarefas_sem_acento(lower(titulo))) AS relevancia,
+               count(*) OVER () > %(candidatos)s AS truncada
+        FROM (
+            SELECT {COLUNAS_TAREFA}, busca FROM tarefas
+            WHERE ativo = %(ativo)s
+              AND (busca @@ to_tsquery('portuguese', tarefas_sem_acento(%(prefixos)s))
+                   OR tarefas_sem_acento(%(termo)s) <%% tarefas_sem_acento(lower(titulo)))
+            ORDER BY id DESC
+            LIMIT %(candidatos)s + 1
+        ) AS casaram
+        ORDER BY id DESC
+        LIMIT %(candidatos)s
+    ) AS candidatos
+    ORDER BY relevancia DESC, id
+    LIMIT %(limit)s OFFSET %(offset)s;
+"""
+
+def _parametros_busca(termos: List[str], ativo: bool, offset: int, limit: int) -> dict:
+    return {
+        'prefixos': " & ".join(f"{t}:*" for t in termos),
+        'termo': " ".join(termos),
+        'ativo': ativo, 'candidatos': LIMITE_CANDIDATOS_BUSCA, 'limit': limit + 1, 'offset': offset,
+    }
+
+def buscar_tarefas(q: str, ativo: bool = True, offset: int = 0,
+                   limit: int = LIMITE_PAGINA_PADRAO) -> Tuple[List[Tarefa], Optional[int], bool]:
+    """Tarefas cujo título casa com 'q', das mais relevantes para as menos.
+
+    Paginada por deslocamento (a ordem é por relevância, não por id): devolve (tarefas, próximo offset,
+    truncada). truncada: mais de LIMITE_CANDIDATOS_BUSCA tarefas casaram e só as mais novas entraram.
+    """
+    termos = termos_de_busca(q)
+    if not termos:
+        return [], None, False
+    limit = max(1, min(limit, LIMITE_PAGINA_MAXIMO))
+    # Sem PREPARE: o melhor plano depende das palavras buscadas. O autocommit já poupa o BEGIN e o ROLLBACK
+    with _cursor_autocommit() as cur:
+        cur.execute(_SQL_BUSCA, _parametros_busca(termos, ativo, offset, limit))
+        rows = cur.fetchall()
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    return tarefas, (offset + limit if len(rows) > limit else None), bool(rows) and rows[0][4]
 
 def adicionar_tarefa(titulo: str) -> Tarefa:
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        # RETURNING id, titulo, status, ativo faz o DB retornar a linha recém-criada
-        cur.execute(
-            "INSERT INTO tarefas (titulo, status) VALUES (%s, %s) RETURNING *;",
-            (titulo, StatusTarefa.PENDENTE.value)
-        )
+    with _cursor_autocommit() as cur:
+        # Revisão, INSERT ... RETURNING e NOTIFY num comando (consulta preparada 'adicionar_tarefa')
+        _executar(cur, 'adicionar_tarefa', titulo)
         nova_tarefa_row = cur.fetchone()
-    conn.commit()
-    conn.close()
+    _invalidar('ativas')
     return _map_row_to_tarefa(nova_tarefa_row)
 
 # ... (as outras funções: buscar_por_id, atualizar_status, desativar_tarefa, recuperar_tarefa)
 # seguem o mesmo padrão de adaptação para psycopg2 e placeholders %s ...
 def buscar_tarefa_por_id(id_tarefa: int) -> Optional[Tarefa]:
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("SELECT * FROM tarefas WHERE id = %s;", (id_tarefa,))
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'buscar_tarefa_por_id', id_tarefa)
         row = cur.fetchone()
-    conn.close()
     return _map_row_to_tarefa(row)
 
 def atualizar_status(id_tarefa: int, novo_status: StatusTarefa) -> bool:
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute(
-            "UPDATE tarefas SET status = %s WHERE id = %s AND ativo = TRUE;",
-            (novo_status.value, id_tarefa)
-        )
+    if _escrita_agrupada is not None:
+        return _escrita_agrupada.gravar(id_tarefa, 'status', novo_status.value)
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'atualizar_status', id_tarefa, novo_status.value)
         updated_rows = cur.rowcount
-    conn.commit()
-    conn.close()
+    if updated_rows:
+        _invalidar('ativas')
     return updated_rows > 0
 
 def desativar_tarefa(id_tarefa: int) -> bool:
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("UPDATE tarefas SET ativo = FALSE WHERE id = %s;", (id_tarefa,))
+    if _escrita_agrupada is not None:
+        return _escrita_agrupada.gravar(id_tarefa, 'ativo', False)
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'desativar_tarefa', id_tarefa)
         updated_rows = cur.rowcount
-    conn.commit()
-    conn.close()
+    if updated_rows:
+        _invalidar('ativas', 'excluidas')
     return updated_rows > 0
 
 def recuperar_tarefa(id_tarefa: int) -> bool:
-    conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("UPDATE tarefas SET ativo = TRUE WHERE id = %s;", (id_tarefa,))
+    # Fora da tabela quente, a tarefa ainda pode estar no arquivo da lixeira
+    if _escrita_agrupada is not None:
+        return _escrita_agrupada.gravar(id_tarefa, 'ativo', True) or bool(_recuperar_do_arquivo([id_tarefa]))
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'recuperar_tarefa', id_tarefa)
         updated_rows = cur.rowcount
-    conn.commit()
-    conn.close()
-    return updated_rows > 0
\ No newline at end of file
+    if updated_rows:
+        _invalidar('ativas', 'excluidas')
+        return True
+    return bool(_recuperar_do_arquivo([id_tarefa]))
+
+def _recuperar_do_arquivo(ids: List[int]) -> Set[int]:
+    """Restaura as tarefas de 'ids' que estão no arquivo da lixeira; retorna os ids restaurados."""
+    if not ids:
+        return set()
+    with _cursor_autocommit() as cur:
+        _executar(cur, 'recuperar_do_arquivo', list(ids))
+        rows = cur.fetchall()
+    if rows:
+        _invalidar('ativas', 'excluidas')
+    return {row[0] for row in rows}
+
+# --- OPERAÇÕES EM LOTE: um único comando SQL e uma única transação por chamada ---
+
+def _criacoes_pendentes(chaves: List[Optional[str]], existentes: Dict[str, Tarefa]) -> List[int]:
+    """Posições que precisam de INSERT: sem chave, ou a primeira de cada chave ainda não usada."""
+    vistas = set(existentes)
+    pendentes = []
+    for posicao, chave in enumerate(chaves):
+        if chave is None or chave not in vistas:
+            pendentes.append(posicao)
+            vistas.add(chave)
+    return pendentes
+
+def _montar_criacoes(chaves, existentes, pendentes, novas) -> List[Tarefa]:
+    """A tarefa de cada posição: a recém-criada ou a que já tinha sido criada com a mesma chave."""
+    por_chave = dict(existentes)
+    resultado = [None] * len(chaves)
+    for posicao, tarefa in zip(pendentes, novas):
+        resultado[posicao] = tarefa
+        if chaves[posicao] is not None:
+            por_chave[chaves[posicao]] = tarefa
+    return [tarefa or por_chave[chave] for tarefa, chave in zip(resultado, chaves)]
+
+def adicionar_tarefas(titulos: List[str], chaves: Optional[List[Optional[str]]] = None) -> List[Tarefa]:
+    """Insere várias tarefas de uma vez e retorna-as na mesma ordem dos títulos.
+
+    chaves (opcional, na ordem dos títulos): chave de idempotência de cada criação. Uma chave já usada
+    devolve a tarefa criada da primeira vez em vez de criar outra, então o cliente pode reenviar o lote
+    quando a resposta se perde.
+    """
+    if not titulos:
+        return []
+    chaves = chaves or [None] * len(titulos)
+    existentes, rows = {}, []
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # A trava da revisão também serializa dois reenvios do mesmo lote: o segundo vê as chaves do primeiro
+            revisao = _proxima_revisao(cur)
+            usadas = [chave for chave in chaves if chave is not None]
+            if usadas:
+                cur.execute(
+                    """SELECT c.chave, t.id, t.titulo, t.status, t.ativo
+                       FROM tarefas_criacoes c JOIN tarefas t ON t.id = c.id WHERE c.chave = ANY(%s);""",
+                    (usadas,)
+                )
+                existentes = {row[0]: _tarefa_da_linha(row[1:]) for row in cur.fetchall()}
+            pendentes = _criacoes_pendentes(chaves, existentes)
+            if pendentes:
+                rows = execute_values(
+                    cur,
+                    f"INSERT INTO tarefas (titulo, status, revisao) VALUES %s RETURNING {COLUNAS_TAREFA};",
+                    [(titulos[i], StatusTarefa.PENDENTE.value, revisao) for i in pendentes],
+                    page_size=len(pendentes), fetch=True
+                )
+                novas_chaves = [(chaves[i], row[0]) for i, row in zip(pendentes, rows) if chaves[i] is not None]
+                if novas_chaves:
+                    execute_values(cur, "INSERT INTO tarefas_criacoes (chave, id) VALUES %s;",
+                                   novas_chaves, page_size=len(novas_chaves))
+        _finalizar_escrita(conn, bool(rows))
+    if rows:
+        _invalidar('ativas')
+    return _montar_criacoes(chaves, existentes, pendentes, list(map(_tarefa_da_linha, rows)))
+
+def atualizar_status_em_lote(mudancas: List[Tuple[int, StatusTarefa]]) -> Set[int]:
+    """Aplica (id, novo_status) a tarefas ativas e retorna os ids efetivamente atualizados."""
+    if not mudancas:
+        return set()
+    # Um id repetido fica só com o último status (no UPDATE ... FROM, qual deles valeria seria indefinido)
+    mudancas = list(dict(mudancas).items())
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            revisao = _proxima_revisao(cur)
+            rows = execute_values(
+                cur,
+                """UPDATE tarefas AS t SET status = v.status, revisao = v.revisao, atualizada_em = now()
+                   FROM (VALUES %s) AS v(id, status, revisao)
+                   WHERE t.id = v.id AND t.ativo = TRUE
+                   RETURNING t.id;""",
+                [(id_tarefa, status.value, revisao) for id_tarefa, status in mudancas],
+                template="(%s::integer, %s::text, %s::bigint)", page_size=len(mudancas), fetch=True
+            )
+        _finalizar_escrita(conn, bool(rows))
+    if rows:
+        _invalidar('ativas')
+    return {row[0] for row in rows}
+
+def _definir_ativo_em_lote(ids: List[int], ativo: bool) -> Set[int]:
+    if not ids:
+        return set()
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            revisao = _proxima_revisao(cur)
+            cur.execute(
+                "UPDATE tarefas SET ativo = %s, revisao = %s, atualizada_em = now() WHERE id = ANY(%s) RETURNING id;",
+                (ativo, revisao, list(ids))
+            )
+            rows = cur.fetchall()
+        _finalizar_escrita(conn, bool(rows))
+    if rows:
+        _invalidar('ativas', 'excluidas')
+    return {row[0] for row in rows}
+
+def desativar_tarefas(ids: List[int]) -> Set[int]:
+    """Move várias tarefas para a lixeira; retorna os ids encontrados."""
+    return _definir_ativo_em_lote(ids, False)
+
+def recuperar_tarefas(ids: List[int]) -> Set[int]:
+    """Restaura várias tarefas da lixeira (inclusive do arquivo); retorna os ids encontrados."""
+    encontrados = _definir_ativo_em_lote(ids, True)
+    return encontrados | _recuperar_do_arquivo([id_tarefa for id_tarefa in ids if id_tarefa not in encontrados])
+
+# --- ARQUIVAMENTO DA LIXEIRA ---
+# A tabela quente (tarefas) guarda as ativas e só a lixeira recente; o resto da lixeira fica em
+# tarefas_arquivo. As listagens e a busca por id da lixeira leem as duas tabelas, recuperar_tarefa
+# procura no arquivo quando não acha a tarefa na tabela quente. A busca textual só vê a tabela quente.
+# Com ARQUIVO_RETENCAO_DIAS, purgar_arquivo apaga de vez o que está no arquivo há mais tempo que isso.
+
+def validar_retencao(dias: float, lote: int):
+    """Dias negativos virariam um corte no futuro; lote < 1 nunca terminaria."""
+    if dias < 0:
+        raise ValueError(f"dias não pode ser negativo: {dias}")
+    if lote < 1:
+        raise ValueError(f"lote deve ser pelo menos 1: {lote}")
+
+def arquivar_lixeira(dias: float = LIXEIRA_RETENCAO_DIAS, lote: int = ARQUIVO_LOTE, pausa: float = 0.0) -> int:
+    """Move para o arquivo as tarefas na lixeira sem alteração há mais de 'dias'; retorna quantas.
+
+    Um comando (e uma transação curta) por lote de até 'lote' linhas, com 'pausa' segundos entre
+    os lotes para não disputar E/S com a API. Pode rodar junto com a API e com outra rotina igual.
+    """
+    validar_retencao(dias, lote)
+    total = 0
+    while True:
+        with _cursor_autocommit() as cur:
+            _executar(cur, 'arquivar_lixeira', dias, lote)
+            movidas = cur.rowcount
+        total += movidas
+        if movidas < lote:
+            return total
+        if pausa:
+            time.sleep(pausa)
+
+
+def purgar_arquivo(dias: float, lote: int = ARQUIVO_LOTE, pausa: float = 0.0) -> int:
+    """Apaga de vez as tarefas arquivadas há mais de 'dias'; retorna quantas.
+
+    Ao contrário do arquivamento, muda a lixeira que os clientes veem: cada lote é uma escrita comum,
+    com revisão nova (o ETag muda e /tarefas/stream avisa). /tarefas/changes não tem como anunciar uma
+    remoção: réplicas que só sincronizam por ele guardam as tarefas apagadas até recarregar a lista.
+    """
+    validar_retencao(dias, lote)
+    total = 0
+    while True:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Revisão antes das linhas, a mesma ordem de trava das outras escritas
+                _proxima_revisao(cur)
+                cur.execute(
+                    """DELETE FROM tarefas_arquivo WHERE id IN (
+                           SELECT id FROM tarefas_arquivo WHERE arquivada_em < now() - %s * interval '1 day'
+                           ORDER BY arquivada_em LIMIT %s
+                           FOR UPDATE SKIP LOCKED
+                       );""",
+                    (dias, lote)
+                )
+                apagadas = cur.rowcount
+            _finalizar_escrita(conn, apagadas > 0)
+        if apagadas:
+            _invalidar('excluidas')
+        total += apagadas
+        if apagadas < lote:
+            return total
+        if pausa:
+            time.sleep(pausa)
+
+# --- ESCRITA AGRUPADA ---
+# Com DB_ESCRITA_AGRUPADA_MS > 0, as escritas de uma tarefa por vez (status, lixeira, restaurar) entram
+# numa fila. A chamada que encontra a fila vazia vira a líder: espera esse tempo (ou a fila chegar a
+# LIMITE_LOTE), pega tudo o que chegou e grava numa transação. As outras só esperam. Cada chamada
+# retorna depois do commit do seu grupo, com o mesmo resultado que teria sozinha; se o commit falha,
+# todas recebem o erro. Precisa de várias requisições ao mesmo tempo no processo (gunicorn gthread,
+# servidor com threads): com um worker síncrono só há atraso, sem agrupamento.
+
+def _simular_grupo(grupo, estado):
+    """Aplica as escritas na ordem de chegada sobre estado {id: [status, ativo]} (alterado no lugar).
+
+    Retorna o resultado de cada escrita: False se a tarefa não existe ou, para status, está na lixeira
+    naquele ponto da sequência. Várias escritas no mesmo id ficam só com o último valor.
+    """
+    resultados = []
+    for id_tarefa, campo, valor, _ in grupo:
+        linha = estado.get(id_tarefa)
+        if linha is None or (campo == 'status' and not linha[1]):
+            resultados.append(False)
+            continue
+        linha[0 if campo == 'status' else 1] = valor
+        resultados.append(True)
+    return resultados
+
+def _gravar_grupo(grupo) -> List[bool]:
+    ids = sorted({item[0] for item in grupo})
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # Primeiro a linha da revisão, depois as tarefas: a mesma ordem de trava das outras escritas
+            # (lotes e consultas preparadas), senão um grupo e um lote nos mesmos ids podem se esperar
+            # em círculo. Se nada mudar, o rollback desfaz o incremento.
+            revisao = _proxima_revisao(cur)
+            # Trava as linhas em ordem de id e lê o estado atual
+            cur.execute("SELECT id, status, ativo FROM tarefas WHERE id = ANY(%s) ORDER BY id FOR UPDATE;", (ids,))
+            antes = {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+            estado = {id_tarefa: list(valores) for id_tarefa, valores in antes.items()}
+            resultados = _simular_grupo(grupo, estado)
+            # Só as linhas que de fato mudaram são gravadas, todas num UPDATE
+            mudancas = [(id_tarefa, status, ativo) for id_tarefa, (status, ativo) in estado.items()
+                        if (status, ativo) != antes[id_tarefa]]
+            if mudancas:
+                execute_values(
+                    cur,
+                    """UPDATE tarefas AS t SET status = v.status, ativo = v.ativo, revisao = v.revisao,
+                                              atualizada_em = now()
+                       FROM (VALUES %s) AS v(id, status, ativo, revisao)
+                       WHERE t.id = v.id;""",
+                    [(id_tarefa, status, ativo, revisao) for id_tarefa, status, ativo in mudancas],
+                    template="(%s::integer, %s::text, %s::boolean, %s::bigint)", page_size=len(mudancas)
+                )
+        _finalizar_escrita(conn, bool(mudancas))
+    # Só conta grupos que viraram commit
+    if mudancas:
+        metricas.escritas_por_commit(len(grupo))
+    if any(ativo != antes[id_tarefa][1] for id_tarefa, _, ativo in mudancas):
+        _invalidar('ativas', 'excluidas')
+    elif mudancas:
+        _invalidar('ativas')
+    return resultados
+
+class _EscritaAgrupada:
+    """Fila das escritas de uma tarefa por vez, gravadas em grupo pela primeira chamada de cada grupo."""
+
+    def __init__(self, espera: float, limite: int):
+        self.espera = espera
+        self.limite = limite
+        self._fila = []   # (id, campo, valor, Future), na ordem de chegada
+        self._cond = threading.Condition()
+
+    def gravar(self, id_tarefa: int, campo: str, valor) -> bool:
+        futuro = Future()
+        with self._cond:
+            self._fila.append((id_tarefa, campo, valor, futuro))
+            lider = len(self._fila) == 1
+            if len(self._fila) >= self.limite:
+                self._cond.notify_all()
+        if lider:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._fila) >= self.limite, timeout=self.espera)
+                grupo, self._fila = self._fila, []
+            try:
+                resultados = _gravar_grupo(grupo)
+            except Exception as e:
+                for *_, f in grupo:
+                    f.set_exception(e)
+            else:
+                for (*_, f), resultado in zip(grupo, resultados):
+                    f.set_result(resultado)
+        return futuro.result()
+
+_escrita_agrupada = _EscritaAgrupada(DB_ESCRITA_AGRUPADA_MS / 1000, LIMITE_LOTE) if DB_ESCRITA_AGRUPADA_MS > 0 else None
+
+# --- BACKEND ESCOLHIDO PELO ESQUEMA DA URL ---
+# postgres:// ou postgresql:// (ou sem URL): as funções acima, sobre o PostgreSQL.
+# sqlite:///arquivo.db: armazenamento_sqlite, local e sem servidor, com as mesmas funções.
+# Quem usa 'import database as db' ou 'from database import ...' não precisa saber qual está ativo.
+FUNCOES_ARMAZENAMENTO = (
+    'init_db', 'revisao_atual', 'assinar_alteracoes', 'cancelar_assinatura', 'estatisticas_pool', 'contar_tarefas',
+    'listar_alteracoes', 'listar_tarefas', 'listar_tarefas_excluidas',
+    'listar_tarefas_paginado', 'listar_tarefas_excluidas_paginado', 'iterar_tarefas', 'buscar_tarefas',
+    'buscar_tarefa_por_id',
+    'adicionar_tarefa', 'atualizar_status', 'desativar_tarefa', 'recuperar_tarefa',
+    'adicionar_tarefas', 'atualizar_status_em_lote', 'desativar_tarefas', 'recuperar_tarefas',
+    'arquivar_lixeira', 'purgar_arquivo',
+)
+
+def esquema_da_url(url: Optional[str]) -> str:
+    return (url or "postgresql:").split(":", 1)[0].lower()
+
+BACKEND = "sqlite" if esquema_da_url(DATABASE_URL) == "sqlite" else "postgresql"
+
+if BACKEND == "sqlite":
+    import armazenamento_sqlite
+    for _nome in FUNCOES_ARMAZENAMENTO:
+        globals()[_nome] = getattr(armazenamento_sqlite, _nome)
+
+# --- MÉTRICAS ---
+# Tempo total de cada função pública (do backend ativo) e o nome que rotula as fases das consultas
+for _nome in FUNCOES_ARMAZENAMENTO:
+    if _nome not in ('estatisticas_pool', 'assinar_alteracoes', 'cancelar_assinatura'):
+        globals()[_nome] = metricas.medir_funcao(_nome)(globals()[_nome])
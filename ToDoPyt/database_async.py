@@ -0,0 +1,405 @@
+# database_async.py
+# Versão assíncrona das funções de database.py, sobre asyncpg, para a API ASGI (api_asgi.py).
+# Mesmo esquema, mesmas regras: revisão + NOTIFY em toda escrita, exclusão lógica e cache das listagens.
+import asyncio
+from functools import wraps
+from typing import AsyncIterator, Dict, Optional, List, Set, Tuple
+
+import asyncpg
+
+import database as db
+import eventos
+import metricas
+from database import Tarefa, StatusTarefa, COLUNAS_TAREFA, _tarefa_da_linha, _map_row_to_tarefa, cache_listas, _invalidar
+
+_pool: Optional[asyncpg.Pool] = None
+_conn_escuta: Optional[asyncpg.Connection] = None
+_assinantes: Set[asyncio.Queue] = set()
+# Última revisão recebida pelo LISTEN (None sem escuta): chave do cache das listagens fora do ETag
+_revisao_notificada: Optional[int] = None
+
+# --- POOL E CICLO DE VIDA ---
+
+async def abrir_pool():
+    """Cria o pool assíncrono e a conexão de LISTEN. Chamar na inicialização do servidor ASGI."""
+    global _pool
+    _pool = await asyncpg.create_pool(
+        db.DATABASE_URL, min_size=db.DB_POOL_MIN, max_size=db.DB_POOL_MAX,
+        timeout=db.DB_POOL_TIMEOUT,
+    )
+    await _escutar()
+
+async def fechar_pool():
+    global _pool, _conn_escuta, _revisao_notificada
+    # Zerar o pool antes avisa _reconectar_escuta que o fechamento é proposital
+    pool, _pool = _pool, None
+    _revisao_notificada = None
+    if _conn_escuta is not None and not _conn_escuta.is_closed():
+        await _conn_escuta.close()
+    _conn_escuta = None
+    if pool is not None:
+        await pool.close()
+
+def estatisticas_pool() -> dict:
+    return {
+        'min': _pool.get_min_size(),
+        'max': _pool.get_max_size(),
+        'abertas': _pool.get_size(),
+        'ociosas': _pool.get_idle_size(),
+        'em_uso': _pool.get_size() - _pool.get_idle_size(),
+    }
+
+# --- LISTEN/NOTIFY: uma conexão por processo, repassada a todos os streams SSE ---
+
+def _ao_notificar(conn, pid, canal, payload):
+    global _revisao_notificada
+    revisao = int(payload)
+    # Escrita de qualquer worker: o cache 'memoria' deste processo não veria a invalidação dela
+    if cache_listas.nome == "memoria":
+        _invalidar('ativas', 'excluidas')
+    _revisao_notificada = revisao
+    for fila in list(_assinantes):
+        # Fila de tamanho 1: só a revisão mais recente importa
+        if fila.full():
+            fila.get_nowait()
+        fila.put_nowait(revisao)
+
+def _ao_cair(conn):
+    global _revisao_notificada
+    # Sem escuta, a revisão guardada envelheceria: o cache volta a perguntar ao banco até reconectar
+    _revisao_notificada = None
+    # Reconecta em segundo plano; quem assina recebe a revisão atual ao voltar
+    if _pool is not None:
+        asyncio.get_running_loop().create_task(_reconectar_escuta())
+
+async def _reconectar_escuta():
+    espera = 1.0
+    while _pool is not None:
+        try:
+            await _escutar()
+            return
+        except (OSError, asyncpg.PostgresError) as e:
+            print(f"Ouvinte assíncrono desconectado ({e}); tentando de novo em {espera:.0f}s")
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 30.0)
+
+async def _escutar():
+    global _conn_escuta
+    _conn_escuta = await asyncpg.connect(db.DATABASE_URL)
+    _conn_escuta.add_termination_listener(_ao_cair)
+    await _conn_escuta.add_listener(eventos.CANAL, _ao_notificar)
+    _ao_notificar(_conn_escuta, None, eventos.CANAL, str(await revisao_atual()))
+
+def assinar_alteracoes() -> asyncio.Queue:
+    fila = asyncio.Queue(maxsize=1)
+    _assinantes.add(fila)
+    return fila
+
+def cancelar_assinatura(fila):
+    _assinantes.discard(fila)
+
+# --- CACHE ---
+
+def _cacheado(namespace):
+    """Igual ao decorador de database.py, para corrotinas."""
+    def decorador(func):
+        @wraps(func)
+        async def envoltorio(*args, **kwargs):
+            # Sem a revisão do ETag, a que o LISTEN já trouxe: um acerto não vai ao banco
+            revisao = db._revisao_da_leitura.get()
+            if revisao is None:
+                revisao = _revisao_notificada
+            if revisao is None:
+                revisao = await revisao_atual()
+            chave = repr((func.__name__, revisao, args, sorted(kwargs.items())))
+            achou, valor = cache_listas.obter(namespace, chave)
+            if achou:
+                return valor
+            geracao = cache_listas.geracao(namespace)
+            valor = await func(*args, **kwargs)
+            cache_listas.guardar(namespace, chave, valor, geracao)
+            return valor
+        return envoltorio
+    return decorador
+
+# --- ESCRITAS ---
+
+async def _escrever(operacao):
+    """Roda operacao(conn, revisao) numa transação que só é confirmada se ela retornar algo."""
+    async with _pool.acquire() as conn:
+        transacao = conn.transaction()
+        await transacao.start()
+        try:
+            revisao = await conn.fetchval("UPDATE tarefas_revisao SET revisao = revisao + 1 RETURNING revisao;")
+            await conn.execute("SELECT pg_notify($1, $2);", eventos.CANAL, str(revisao))
+            resultado = await operacao(conn, revisao)
+        except BaseException:
+            await transacao.rollback()
+            raise
+        if resultado:
+            await transacao.commit()
+        else:
+            await transacao.rollback()
+        return resultado
+
+# --- LEITURAS ---
+
+async def revisao_atual() -> int:
+    async with _pool.acquire() as conn:
+        return await conn.fetchval("SELECT revisao FROM tarefas_revisao;")
+
+async def listar_alteracoes(desde: int) -> Tuple[int, List[Tarefa]]:
+    async with _pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            revisao = await conn.fetchval("SELECT revisao FROM tarefas_revisao;")
+            rows = await conn.fetch(
+                f"""SELECT {COLUNAS_TAREFA} FROM tarefas WHERE revisao > $1
+                    UNION ALL
+                    SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE revisao > $1
+                    ORDER BY id;""",
+                desde if desde > 0 else -1
+            )
+    return revisao, list(map(_tarefa_da_linha, rows))
+
+async def contar_tarefas() -> Tuple[int, Dict[Tuple[str, bool], int]]:
+    async with _pool.acquire() as conn:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            revisao = await conn.fetchval("SELECT revisao FROM tarefas_revisao;")
+            rows = await conn.fetch("SELECT status, ativo, total FROM tarefas_contagem;")
+    return revisao, {(row[0], row[1]): row[2] for row in rows}
+
+@_cacheado('ativas')
+async def listar_tarefas() -> List[Tarefa]:
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE ORDER BY id;")
+    return list(map(_tarefa_da_linha, rows))
+
+@_cacheado('excluidas')
+async def listar_tarefas_excluidas() -> List[Tarefa]:
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(db._sql_lixeira() + ";")
+    return list(map(_tarefa_da_linha, rows))
+
+async def _listar_pagina(ativo: bool, after_id: Optional[int], limit: int, status: Optional[StatusTarefa]) -> Tuple[List[Tarefa], Optional[int]]:
+    limit = max(1, min(limit, db.LIMITE_PAGINA_MAXIMO))
+    params = [after_id or 0]
+    filtro = "AND id > $1"
+    if status is not None:
+        params.append(status.value)
+        filtro += " AND status = $2"
+    params.append(limit + 1)
+    limite = f"LIMIT ${len(params)}"
+    if ativo:
+        sql = f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE {filtro} ORDER BY id {limite};"
+    else:
+        # A lixeira soma a tabela quente e o arquivo, como em database.py
+        sql = db._sql_lixeira(filtro, limite) + ";"
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(sql, *params)
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    proximo_cursor = tarefas[-1].id if len(rows) > limit else None
+    return tarefas, proximo_cursor
+
+@_cacheado('ativas')
+async def listar_tarefas_paginado(after_id: Optional[int] = None, limit: int = db.LIMITE_PAGINA_PADRAO,
+                                  status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return await _listar_pagina(True, after_id, limit, status)
+
+@_cacheado('excluidas')
+async def listar_tarefas_excluidas_paginado(after_id: Optional[int] = None, limit: int = db.LIMITE_PAGINA_PADRAO,
+                                            status: Optional[StatusTarefa] = None) -> Tuple[List[Tarefa], Optional[int]]:
+    return await _listar_pagina(False, after_id, limit, status)
+
+async def iterar_tarefas(ativo: bool, tamanho_lote: int = db.TAMANHO_LOTE_STREAM) -> AsyncIterator[List[Tarefa]]:
+    """Como database.iterar_tarefas: cursor do lado do servidor, lidos em lotes."""
+    async with _pool.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            if ativo:
+                cursor = await conn.cursor(f"SELECT {COLUNAS_TAREFA} FROM tarefas WHERE ativo = TRUE ORDER BY id;")
+            else:
+                cursor = await conn.cursor(db._sql_lixeira() + ";")
+            while (rows := await cursor.fetch(tamanho_lote)):
+                yield list(map(_tarefa_da_linha, rows))
+
+# Mesma consulta de database._SQL_BUSCA, com os parâmetros posicionais do asyncpg
+_SQL_BUSCA = f"""
+    SELECT {COLUNAS_TAREFA}, truncada FROM (
+        SELECT {COLUNAS_TAREFA},
+               ts_rank_cd(busca, to_tsquery('portuguese', tarefas_sem_acento($1)))
+               + word_similarity(tarefas_sem_acento($2), tarefas_sem_acento(lower(titulo))) AS relevancia,
+               count(*) OVER () > $4 AS truncada
+        FROM (
+            SELECT {COLUNAS_TAREFA}, busca FROM tarefas
+            WHERE ativo = $3
+              AND (busca @@ to_tsquery('portuguese', tarefas_sem_acento($1))
+                   OR tarefas_sem_acento($2) <% tarefas_sem_acento(lower(titulo)))
+            ORDER BY id DESC
+            LIMIT $4 + 1
+        ) AS casaram
+        ORDER BY id DESC
+        LIMIT $4
+    ) AS candidatos
+    ORDER BY relevancia DESC, id
+    LIMIT $5 OFFSET $6;
+"""
+
+async def buscar_tarefas(q: str, ativo: bool = True, offset: int = 0,
+                         limit: int = db.LIMITE_PAGINA_PADRAO) -> Tuple[List[Tarefa], Optional[int], bool]:
+    termos = db.termos_de_busca(q)
+    if not termos:
+        return [], None, False
+    limit = max(1, min(limit, db.LIMITE_PAGINA_MAXIMO))
+    p = db._parametros_busca(termos, ativo, offset, limit)
+    async with _pool.acquire() as conn:
+        rows = await conn.fetch(_SQL_BUSCA, p['prefixos'], p['termo'], ativo, p['candidatos'], p['limit'], offset)
+    tarefas = list(map(_tarefa_da_linha, rows[:limit]))
+    return tarefas, (offset + limit if len(rows) > limit else None), bool(rows) and rows[0]['truncada']
+
+async def buscar_tarefa_por_id(id_tarefa: int) -> Optional[Tarefa]:
+    async with _pool.acquire() as conn:
+        row = await conn.fetchrow(
+            f"""SELECT {COLUNAS_TAREFA} FROM tarefas WHERE id = $1
+                UNION ALL
+                SELECT {COLUNAS_TAREFA} FROM tarefas_arquivo WHERE id = $1;""",
+            id_tarefa
+        )
+    return _map_row_to_tarefa(row)
+
+# --- ESCRITAS UNITÁRIAS ---
+
+async def adicionar_tarefa(titulo: str) -> Tarefa:
+    async def operacao(conn, revisao):
+        return await conn.fetchrow(
+            f"INSERT INTO tarefas (titulo, status, revisao) VALUES ($1, $2, $3) RETURNING {COLUNAS_TAREFA};",
+            titulo, StatusTarefa.PENDENTE.value, revisao
+        )
+    row = await _escrever(operacao)
+    _invalidar('ativas')
+    return _map_row_to_tarefa(row)
+
+async def atualizar_status(id_tarefa: int, novo_status: StatusTarefa) -> bool:
+    async def operacao(conn, revisao):
+        return await conn.fetchval(
+            "UPDATE tarefas SET status = $1, revisao = $2, atualizada_em = now() WHERE id = $3 AND ativo = TRUE RETURNING id;",
+            novo_status.value, revisao, id_tarefa
+        )
+    alterou = await _escrever(operacao) is not None
+    if alterou:
+        _invalidar('ativas')
+    return alterou
+
+async def _restaurar_arquivadas(conn, revisao, ids) -> List[int]:
+    """Devolve à tabela quente, já ativas, as tarefas de 'ids' que estão no arquivo da lixeira."""
+    rows = await conn.fetch(
+        """WITH saidas AS (DELETE FROM tarefas_arquivo WHERE id = ANY($1::integer[]) RETURNING id, titulo, status)
+           INSERT INTO tarefas (id, titulo, status, ativo, revisao)
+           SELECT id, titulo, status, TRUE, $2 FROM saidas
+           RETURNING id;""",
+        list(ids), revisao
+    )
+    return [row['id'] for row in rows]
+
+async def _definir_ativo(id_tarefa: int, ativo: bool) -> bool:
+    async def operacao(conn, revisao):
+        id_alterado = await conn.fetchval(
+            "UPDATE tarefas SET ativo = $1, revisao = $2, atualizada_em = now() WHERE id = $3 RETURNING id;",
+            ativo, revisao, id_tarefa
+        )
+        if id_alterado is None and ativo:
+            # Fora da tabela quente, a tarefa ainda pode estar no arquivo da lixeira
+            restauradas = await _restaurar_arquivadas(conn, revisao, [id_tarefa])
+            return restauradas[0] if restauradas else None
+        return id_alterado
+    alterou = await _escrever(operacao) is not None
+    if alterou:
+        _invalidar('ativas', 'excluidas')
+    return alterou
+
+async def desativar_tarefa(id_tarefa: int) -> bool:
+    return await _definir_ativo(id_tarefa, False)
+
+async def recuperar_tarefa(id_tarefa: int) -> bool:
+    return await _definir_ativo(id_tarefa, True)
+
+# --- ESCRITAS EM LOTE (unnest: um comando e uma transação por chamada) ---
+
+async def adicionar_tarefas(titulos: List[str], chaves: Optional[List[Optional[str]]] = None) -> List[Tarefa]:
+    """Como database.adicionar_tarefas, inclusive as chaves de idempotência."""
+    if not titulos:
+        return []
+    chaves = chaves or [None] * len(titulos)
+    existentes, pendentes = {}, []
+    async def operacao(conn, revisao):
+        usadas = [chave for chave in chaves if chave is not None]
+        if usadas:
+            for row in await conn.fetch(
+                """SELECT c.chave, t.id, t.titulo, t.status, t.ativo
+                   FROM tarefas_criacoes c JOIN tarefas t ON t.id = c.id WHERE c.chave = ANY($1::text[]);""",
+                usadas
+            ):
+                existentes[row['chave']] = _tarefa_da_linha(tuple(row)[1:])
+        pendentes.extend(db._criacoes_pendentes(chaves, existentes))
+        if not pendentes:
+            return []
+        rows = await conn.fetch(
+            f"""INSERT INTO tarefas (titulo, status, revisao)
+               SELECT t.titulo, $2, $3 FROM unnest($1::text[]) WITH ORDINALITY AS t(titulo, ordem)
+               ORDER BY t.ordem
+               RETURNING {COLUNAS_TAREFA};""",
+            [titulos[i] for i in pendentes], StatusTarefa.PENDENTE.value, revisao
+        )
+        novas_chaves = [(chaves[i], row['id']) for i, row in zip(pendentes, rows) if chaves[i] is not None]
+        if novas_chaves:
+            await conn.executemany("INSERT INTO tarefas_criacoes (chave, id) VALUES ($1, $2);", novas_chaves)
+        return rows
+    rows = await _escrever(operacao) or []
+    if rows:
+        _invalidar('ativas')
+    return db._montar_criacoes(chaves, existentes, pendentes, list(map(_tarefa_da_linha, rows)))
+
+async def atualizar_status_em_lote(mudancas: List[Tuple[int, StatusTarefa]]) -> Set[int]:
+    if not mudancas:
+        return set()
+    # Um id repetido fica só com o último status (no UPDATE ... FROM, qual deles valeria seria indefinido)
+    mudancas = list(dict(mudancas).items())
+    async def operacao(conn, revisao):
+        return await conn.fetch(
+            """UPDATE tarefas AS t SET status = v.status, revisao = $3, atualizada_em = now()
+               FROM unnest($1::integer[], $2::text[]) AS v(id, status)
+               WHERE t.id = v.id AND t.ativo = TRUE
+               RETURNING t.id;""",
+            [i for i, _ in mudancas], [s.value for _, s in mudancas], revisao
+        )
+    rows = await _escrever(operacao)
+    if rows:
+        _invalidar('ativas')
+    return {row['id'] for row in rows}
+
+async def _definir_ativo_em_lote(ids: List[int], ativo: bool) -> Set[int]:
+    if not ids:
+        return set()
+    async def operacao(conn, revisao):
+        rows = await conn.fetch(
+            "UPDATE tarefas SET ativo = $1, revisao = $2, atualizada_em = now() WHERE id = ANY($3::integer[]) RETURNING id;",
+            ativo, revisao, list(ids)
+        )
+        alterados = [row['id'] for row in rows]
+        if ativo and len(alterados) < len(set(ids)):
+            alterados += await _restaurar_arquivadas(conn, revisao, set(ids) - set(alterados))
+        return alterados
+    alterados = await _escrever(operacao)
+    if alterados:
+        _invalidar('ativas', 'excluidas')
+    return set(alterados)
+
+async def desativar_tarefas(ids: List[int]) -> Set[int]:
+    return await _definir_ativo_em_lote(ids, False)
+
+async def recuperar_tarefas(ids: List[int]) -> Set[int]:
+    return await _definir_ativo_em_lote(ids, True)
+
+# --- MÉTRICAS ---
+# Tempo total por função, como em database.py (as fases de cada consulta não são separadas no asyncpg)
+for _nome in db.FUNCOES_ARMAZENAMENTO:
+    if _nome in globals() and _nome not in ('estatisticas_pool', 'assinar_alteracoes', 'cancelar_assinatura'):
+        globals()[_nome] = metricas.medir_funcao(_nome)(globals()[_nome])
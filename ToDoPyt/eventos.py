@@ -0,0 +1,105 @@
+# eventos.py
+# Distribui as notificações do PostgreSQL (LISTEN/NOTIFY) para os assinantes do processo.
+# Uma única conexão de escuta por processo/worker, não importa quantos clientes SSE estejam ligados.
+import os
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+CANAL = "tarefas_alteradas"
+# Intervalo máximo (s) sem eventos antes de conferir a conexão de escuta
+INTERVALO_POLL = 5.0
+# Keepalive TCP da conexão de escuta: uma conexão derrubada em silêncio (NAT, proxy) faz a conferência
+# falhar em cerca de 10 + 3 * 5 segundos, em vez de esperar pelos minutos de retransmissão do kernel
+_KEEPALIVE = {'keepalives': 1, 'keepalives_idle': 10, 'keepalives_interval': 5, 'keepalives_count': 3}
+
+class OuvinteDeAlteracoes:
+    """Thread que faz LISTEN no canal e repassa a revisão nova para a fila de cada assinante."""
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._assinantes = set()
+        self._thread = threading.Thread(target=self._rodar, name="ouvinte-tarefas", daemon=True)
+        self._thread.start()
+
+    def assinar(self) -> queue.Queue:
+        # Fila de tamanho 1: só a revisão mais recente importa para quem está atrasado
+        fila = queue.Queue(maxsize=1)
+        with self._lock:
+            self._assinantes.add(fila)
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def total_assinantes(self) -> int:
+        with self._lock:
+            return len(self._assinantes)
+
+    def _publicar(self, revisao):
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for fila in assinantes:
+            try:
+                fila.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                fila.put_nowait(revisao)
+            except queue.Full:
+                pass
+
+    def _rodar(self):
+        espera = 1.0
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn, **_KEEPALIVE)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL};")
+                    # O que mudou enquanto estávamos desconectados chega como um evento com a revisão atual
+                    cur.execute("SELECT revisao FROM tarefas_revisao;")
+                    row = cur.fetchone()
+                if row:
+                    self._publicar(row[0])
+                espera = 1.0
+                while True:
+                    if select.select([conn], [], [], INTERVALO_POLL) == ([], [], []):
+                        # Sem eventos: confere se a conexão ainda está viva. Se caiu, o erro leva à
+                        # reconexão abaixo, e os assinantes recebem a revisão atual quando ela volta
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT 1;")
+                    conn.poll()
+                    revisao = None
+                    # Várias notificações acumuladas viram um único evento com a maior revisão
+                    while conn.notifies:
+                        notificacao = conn.notifies.pop(0)
+                        revisao = max(revisao or 0, int(notificacao.payload))
+                    if revisao is not None:
+                        self._publicar(revisao)
+            except (psycopg2.Error, OSError, ValueError) as e:
+                print(f"Ouvinte de alterações desconectado ({e}); tentando de novo em {espera:.0f}s")
+                if conn is not None and not conn.closed:
+                    conn.close()
+                time.sleep(espera)
+                espera = min(espera * 2, 30.0)
+
+_ouvinte = None
+_ouvinte_lock = threading.Lock()
+
+def ouvinte(dsn) -> OuvinteDeAlteracoes:
+    """Retorna o ouvinte do processo atual, criando-o no primeiro uso (um por worker do gunicorn)."""
+    global _ouvinte
+    if _ouvinte is None or _ouvinte.pid != os.getpid():
+        with _ouvinte_lock:
+            if _ouvinte is None or _ouvinte.pid != os.getpid():
+                _ouvinte = OuvinteDeAlteracoes(dsn)
+    return _ouvinte
@@ -0,0 +1,96 @@
+# fila_flet.py
+# Fila de requisições em segundo plano dos apps Flet. O clique muda a tela na hora (atualização otimista)
+# e a chamada à API vai para esta fila: alterações repetidas na mesma tarefa viram uma só, falhas
+# transitórias são repetidas e, se a operação falhar de vez, a tela volta ao estado anterior.
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+TENTATIVAS = 4        # envios de uma operação antes de desistir
+ESPERA_INICIAL = 0.5  # segundos antes da primeira repetição; dobra a cada tentativa
+
+def transitorio(erro) -> bool:
+    """Falhas que valem uma nova tentativa: rede, timeout, 429 e 5xx. O resto (4xx) é definitivo."""
+    if isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(erro, requests.exceptions.HTTPError) and erro.response is not None:
+        return erro.response.status_code == 429 or erro.response.status_code >= 500
+    return False
+
+class _Operacao:
+    def __init__(self, executar, desfazer, ao_concluir):
+        self.executar = executar
+        self.desfazer = desfazer
+        self.ao_concluir = ao_concluir
+
+class FilaDeRequisicoes:
+    """Uma thread que envia as operações na ordem em que foram pedidas.
+
+    Cada operação tem uma chave (ex.: ('status', id)). Enquanto uma operação espera na fila, outra com a
+    mesma chave toma o lugar dela, mas o 'desfazer' da primeira é mantido: se a última falhar, a tela
+    volta ao estado de antes do primeiro clique.
+    """
+
+    def __init__(self, ao_falhar):
+        # ao_falhar(erro): chamado depois de desfazer uma operação que não pôde ser concluída
+        self.ao_falhar = ao_falhar
+        self._pendentes = OrderedDict()
+        self._cond = threading.Condition()
+        self._sequencia = 0
+        self._thread = threading.Thread(target=self._rodar, name="fila-requisicoes", daemon=True)
+        self._thread.start()
+
+    def enviar(self, chave, executar, desfazer=None, ao_concluir=None):
+        """Agenda executar(); chave None desliga a coalescência (ex.: criação de tarefa)."""
+        with self._cond:
+            if chave is None:
+                self._sequencia += 1
+                chave = ('unica', self._sequencia)
+            anterior = self._pendentes.get(chave)
+            if anterior is not None:
+                desfazer = anterior.desfazer
+            self._pendentes[chave] = _Operacao(executar, desfazer, ao_concluir)
+            self._cond.notify()
+
+    def _rodar(self):
+        while True:
+            with self._cond:
+                while not self._pendentes:
+                    self._cond.wait()
+                _, operacao = self._pendentes.popitem(last=False)
+            try:
+                self._executar(operacao)
+            except Exception as erro:
+                # Nem um erro no desfazer/ao_falhar pode parar a única thread: as próximas operações
+                # ficariam na tela sem nunca serem enviadas
+                print(f"Erro na fila de requisições: {erro!r}")
+
+    def _executar(self, operacao):
+        espera = ESPERA_INICIAL
+        for tentativa in range(1, TENTATIVAS + 1):
+            try:
+                resultado = operacao.executar()
+            except Exception as erro:
+                # Além da rede: resposta que não é JSON (ValueError), campo faltando (KeyError)...
+                if transitorio(erro) and tentativa < TENTATIVAS:
+                    print(f"Falha transitória ({erro}); nova tentativa em {espera:.1f}s")
+                    time.sleep(espera)
+                    espera *= 2
+                    continue
+                self._desfazer(operacao, erro)
+                return
+            break
+        if operacao.ao_concluir:
+            # Fora das tentativas: um erro aqui não pode reenviar uma operação que já foi aplicada
+            try:
+                operacao.ao_concluir(resultado)
+            except Exception as erro:
+                self._desfazer(operacao, erro)
+
+    def _desfazer(self, operacao, erro):
+        print(f"Operação desfeita: {erro!r}")
+        if operacao.desfazer:
+            operacao.desfazer()
+        self.ao_falhar(erro)
@@ -1,7 +1,14 @@
 import flet as ft
+import threading
+import time
 import requests
+from quadro_flet import QuadroDeTarefas, ContadoresDasAbas, TAMANHO_PAGINA
+from busca_flet import CaixaDeBusca
+from fila_flet import FilaDeRequisicoes
+from cliente_api import ClienteApi
 
 API_URL = "http://127.0.0.1:5000"
+ERRO_CARGA = "Não foi possível buscar dados. A API está rodando?"
 
 def main(page: ft.Page):
     page.title = "To-Do List Full-Stack"
@@ -23,65 +30,61 @@ def main(page: ft.Page):
         icon="add", on_click=lambda e: add_task_clicked(), tooltip="Adicionar Tarefa"
     )
 
-    # --- Funções de API (não mudam) ---
-    def get_tasks_from_api():
-        try:
-            response = requests.get(f"{API_URL}/tarefas")
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao buscar tarefas: {e}")
-            page.snack_bar = ft.SnackBar(ft.Text("Erro de conexão com a API."), bgcolor="red")
-            page.snack_bar.open = True
-            page.update()
-            return []
+    # --- Funções de API ---
+    def show_error_snackbar(message="Erro de conexão com a API."):
+        page.snack_bar = ft.SnackBar(ft.Text(message), bgcolor="red")
+        page.snack_bar.open = True
+        page.update()
+
+    # Sessão keep-alive com timeouts, compartilhada por todas as chamadas do app
+    cliente = ClienteApi(API_URL)
 
-    def get_trashed_tasks_from_api():
-        try:
-            response = requests.get(f"{API_URL}/tarefas/excluidas")
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao buscar lixeira: {e}")
-            return []
-            
     # --- Funções de Ação (Event Handlers) ---
+    # Cliques mudam a tela na hora; a chamada à API segue pela fila, em segundo plano
+    fila = FilaDeRequisicoes(ao_falhar=lambda erro: show_error_snackbar("A operação falhou e foi desfeita."))
+
+    def aplicar_local(tarefas):
+        with ui_lock:
+            controles = quadro.aplicar(tarefas) + busca.aplicar(tarefas)
+            if controles:
+                page.update(*controles)
+
+    def alterar_tarefa(tipo, task_id, mudancas, method, url_path, json_data=None):
+        """Atualização otimista: aplica 'mudancas' na tela e enfileira a requisição que as confirma."""
+        anterior = quadro.tarefa(task_id)
+        if anterior is None:
+            return
+        aplicar_local([{**anterior, **mudancas}])
+        fila.enviar(
+            (tipo, task_id), lambda: cliente.requisitar(method, url_path, json_data),
+            desfazer=lambda: aplicar_local([anterior]),
+        )
+
     def add_task_clicked(e=None):
         task_title = new_task_field.value
         if not task_title.strip():
             return
-        try:
-            requests.post(f"{API_URL}/tarefas", json={"text": task_title})
-            new_task_field.value = ""
-            new_task_field.focus()
-            update_ui()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao adicionar tarefa: {e}")
+        # O id vem do servidor: a tarefa entra na lista quando a criação é confirmada
+        fila.enviar(
+            None, lambda: cliente.requisitar("POST", "/tarefas", json_data={"text": task_title}).json(),
+            ao_concluir=lambda task: aplicar_local([task]),
+        )
+        new_task_field.value = ""
+        new_task_field.focus()
+        new_task_field.update()
 
     def status_changed(e):
         task_id = e.control.data['id']
         new_status = e.control.data['status']
-        try:
-            requests.put(f"{API_URL}/tarefas/{task_id}/status", json={"status": new_status})
-            update_ui()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao atualizar status: {e}")
+        alterar_tarefa('status', task_id, {'status': new_status}, "PUT", f"/tarefas/{task_id}/status", {"status": new_status})
 
     def move_to_trash_clicked(e):
         task_id = e.control.data
-        try:
-            requests.delete(f"{API_URL}/tarefas/{task_id}")
-            update_ui()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao mover para lixeira: {e}")
-    
+        alterar_tarefa('ativo', task_id, {'ativo': False}, "DELETE", f"/tarefas/{task_id}")
+
     def restore_from_trash_clicked(e):
         task_id = e.control.data
-        try:
-            requests.put(f"{API_URL}/tarefas/{task_id}/recuperar")
-            update_ui()
-        except requests.exceptions.RequestException as e:
-            print(f"Erro ao restaurar: {e}")
+        alterar_tarefa('ativo', task_id, {'ativo': True}, "PUT", f"/tarefas/{task_id}/recuperar")
 
     # --- Funções para Construir a UI ---
     def create_task_view(task):
@@ -153,28 +156,86 @@ def main(page: ft.Page):
 
     # --- Controles Principais e Função de Atualização ---
     new_task_field = ft.TextField(hint_text="O que precisa ser feito?", expand=True, on_submit=add_task_clicked)
-    active_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
-    trashed_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
+
+    # Estado local: última revisão aplicada (None até a primeira carga) e as listas virtuais
+    estado = {'revisao': None}
+
+    def carregar_pagina(ativo, after_id):
+        """Uma página de uma das listas, pedida pela lista virtual conforme a rolagem."""
+        try:
+            return cliente.pagina(ativo, after_id, TAMANHO_PAGINA)
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao buscar página ({'ativas' if ativo else 'lixeira'}): {e}")
+            show_error_snackbar(ERRO_CARGA)
+            return None
+
+    def get_changes_from_api():
+        """Só o que mudou desde a última revisão aplicada."""
+        try:
+            return cliente.alteracoes(estado['revisao'])
+        except requests.exceptions.RequestException as e:
+            print(f"Erro ao buscar alterações: {e}")
+            show_error_snackbar(ERRO_CARGA)
+            return None
+
+    def buscar(q, ativo, offset, limit):
+        try:
+            return cliente.buscar(q, ativo, offset, limit)
+        except requests.exceptions.RequestException as e:
+            print(f"Erro na busca: {e}")
+            show_error_snackbar(ERRO_CARGA)
+            return None
+
+    quadro = QuadroDeTarefas(create_task_view, create_trashed_task_view, carregar_pagina)
+    busca = CaixaDeBusca(buscar, create_task_view, create_trashed_task_view, page.update, em_paralelo=cliente.em_paralelo)
+    contadores = ContadoresDasAbas()
+
+    # update_ui roda tanto nos cliques quanto na thread do stream
+    ui_lock = threading.Lock()
 
     def update_ui(e=None):
-        active_tasks_column.controls.clear()
-        trashed_tasks_column.controls.clear()
-        
-        active_tasks = get_tasks_from_api()
-        if active_tasks:
-            for task in active_tasks:
-                active_tasks_column.controls.append(create_task_view(task))
-        else:
-            active_tasks_column.controls.append(ft.Container(ft.Text("Nenhuma tarefa ativa."), alignment=ft.alignment.center, padding=20))
-            
-        trashed_tasks = get_trashed_tasks_from_api()
-        if trashed_tasks:
-            for task in trashed_tasks:
-                trashed_tasks_column.controls.append(create_trashed_task_view(task))
-        else:
-            trashed_tasks_column.controls.append(ft.Container(ft.Text("A lixeira está vazia."), alignment=ft.alignment.center, padding=20))
-            
-        page.update()
+        with ui_lock:
+            if estado['revisao'] is None:
+                # Primeira carga: a revisão é lida antes das páginas, então nenhum delta se perde
+                try:
+                    revisao = cliente.revisao()
+                except requests.exceptions.RequestException as erro:
+                    print(f"Erro ao buscar revisão: {erro}")
+                    show_error_snackbar(ERRO_CARGA)
+                    return
+                # As duas listas são buscadas ao mesmo tempo
+                controles = quadro.carregar(em_paralelo=cliente.em_paralelo)
+                estado['revisao'] = revisao
+            else:
+                alteracoes = get_changes_from_api()
+                if alteracoes is None:
+                    return
+                tarefas = alteracoes['ativas'] + alteracoes['excluidas']
+                controles = quadro.aplicar(tarefas) + busca.aplicar(tarefas)
+                estado['revisao'] = alteracoes['revisao']
+            # Totais das abas: uma linha por status no servidor, não as listas inteiras
+            try:
+                controles += contadores.atualizar(cliente.estatisticas())
+            except requests.exceptions.RequestException as erro:
+                print(f"Erro ao buscar totais: {erro}")
+            if controles:
+                page.update(*controles)
+
+    def escutar_alteracoes():
+        """Assina o stream SSE da API e atualiza a tela quando as tarefas mudam em outro lugar."""
+        espera = 1
+        while True:
+            try:
+                for revisao in cliente.revisoes_do_stream():
+                    espera = 1
+                    if revisao > (estado['revisao'] or 0):
+                        update_ui()
+                if not cliente.stream_disponivel:
+                    return  # API sem stream: resta o botão de atualizar
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Stream de alterações interrompido: {e}")
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
 
     # --- Montagem da Página com a nova estrutura ---
     tabs = ft.Tabs(
@@ -182,17 +243,19 @@ def main(page: ft.Page):
         expand=1,
         tabs=[
             # CORREÇÃO: Ícones como texto
-            ft.Tab(text="Tarefas Ativas", icon="list_alt_rounded", content=active_tasks_column),
-            ft.Tab(text="Lixeira", icon="delete_sweep_outlined", content=trashed_tasks_column),
+            ft.Tab(tab_content=contadores.rotulo(True, "Tarefas Ativas", "list_alt_rounded"), content=busca.conteudo(True, quadro.coluna_ativas)),
+            ft.Tab(tab_content=contadores.rotulo(False, "Lixeira", "delete_sweep_outlined"), content=busca.conteudo(False, quadro.coluna_lixeira)),
         ]
     )
     
     page.add(
         ft.Row(controls=[new_task_field]),
+        ft.Row(controls=[busca.campo]),
         ft.Container(content=tabs, expand=True)
     )
     
     update_ui()
+    threading.Thread(target=escutar_alteracoes, daemon=True).start()
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
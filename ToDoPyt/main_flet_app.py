@@ -1,33 +1,15 @@
 import flet as ft
 import threading
+from functools import partial
 from api import app as flask_app # Importamos a app Flask do nosso arquivo api.py
 import database as db # Importamos o banco de dados diretamente
-
-# --- Funções que agora falam DIRETAMENTE com o banco ---
-
-def add_task(title):
-    if title and title.strip():
-        db.adicionar_tarefa(title)
-
-def get_active_tasks():
-    return [task.__dict__ for task in db.listar_tarefas()]
-
-def get_trashed_tasks():
-    return [task.__dict__ for task in db.listar_tarefas_excluidas()]
-
-def update_task_status(task_id, new_status_str):
-    status_enum = db.StatusTarefa(new_status_str)
-    db.atualizar_status(task_id, status_enum)
-
-def move_task_to_trash(task_id):
-    db.desativar_tarefa(task_id)
-
-def restore_task_from_trash(task_id):
-    db.recuperar_tarefa(task_id)
+from quadro_flet import QuadroDeTarefas, ContadoresDasAbas, TAMANHO_PAGINA
+from busca_flet import CaixaDeBusca
+from servico_tarefas import ServicoTarefas
 
 # --- A Interface Flet ---
 
-def flet_main(page: ft.Page):
+def flet_main(page: ft.Page, servico: ServicoTarefas):
     page.title = "To-Do List (App Executável)"
     page.window_width = 600
     page.window_height = 700
@@ -44,46 +26,63 @@ def flet_main(page: ft.Page):
         icon="add", on_click=lambda e: add_task_clicked(), tooltip="Adicionar Tarefa"
     )
 
-    def update_ui():
-        # Limpa as colunas antes de preencher
-        active_tasks_column.controls.clear()
-        trashed_tasks_column.controls.clear()
-        
-        # Preenche com tarefas ativas
-        active_tasks = get_active_tasks()
-        if active_tasks:
-            for task in active_tasks:
-                active_tasks_column.controls.append(create_task_view(task))
-        else:
-            active_tasks_column.controls.append(ft.Container(ft.Text("Nenhuma tarefa ativa."), alignment=ft.alignment.center, padding=20))
-        
-        # Preenche com tarefas da lixeira
-        trashed_tasks = get_trashed_tasks()
-        if trashed_tasks:
-            for task in trashed_tasks:
-                trashed_tasks_column.controls.append(create_trashed_task_view(task))
-        else:
-            trashed_tasks_column.controls.append(ft.Container(ft.Text("A lixeira está vazia."), alignment=ft.alignment.center, padding=20))
-            
+    def show_error_snackbar(erro):
+        print(f"Erro no banco de dados: {erro}")
+        page.snack_bar = ft.SnackBar(ft.Text("A operação falhou."), bgcolor="red")
+        page.snack_bar.open = True
         page.update()
 
+    # update_ui roda nas threads do serviço: nunca segura a thread do evento
+    ui_lock = threading.Lock()
+
+    def update_ui():
+        servico.chamar(_update_ui, ao_falhar=show_error_snackbar)
+
+    def escutar_alteracoes():
+        """Recebe do LISTEN/NOTIFY do banco cada escrita confirmada (desta janela, da API ou de outros
+        clientes) e atualiza a tela. É o único gatilho da atualização depois de uma escrita."""
+        servico.esperar_pronto()
+        fila = db.assinar_alteracoes()
+        while True:
+            fila.get()
+            update_ui()
+
+    def _update_ui():
+        with ui_lock:
+            if estado['revisao'] is None:
+                # Primeira carga: a revisão é lida antes das páginas, então nenhum delta se perde
+                revisao = db.revisao_atual()
+                controles = quadro.carregar()
+                estado['revisao'] = revisao
+            else:
+                # Só as linhas que mudaram desde a última revisão aplicada são tocadas
+                estado['revisao'], tarefas = servico.alteracoes(estado['revisao'])
+                controles = quadro.aplicar(tarefas) + busca.aplicar(tarefas)
+            controles += contadores.atualizar(servico.estatisticas())
+            if controles:
+                page.update(*controles)
+
+    def escrever(funcao, *args):
+        """Escrita no pool do serviço. A tela é atualizada pela notificação que ela gera ao confirmar
+        (escutar_alteracoes); atualizar aqui também leria o banco duas vezes por escrita."""
+        servico.chamar(funcao, *args, ao_falhar=show_error_snackbar)
+
     def add_task_clicked():
-        add_task(new_task_field.value)
+        titulo = new_task_field.value
+        if titulo and titulo.strip():
+            escrever(servico.adicionar, titulo)
         new_task_field.value = ""
         new_task_field.focus()
-        update_ui()
+        new_task_field.update()
 
     def status_changed(e):
-        update_task_status(e.control.data['id'], e.control.data['status'])
-        update_ui()
+        escrever(servico.atualizar_status, e.control.data['id'], e.control.data['status'])
 
     def move_to_trash_clicked(e):
-        move_task_to_trash(e.control.data)
-        update_ui()
+        escrever(servico.mover_para_lixeira, e.control.data)
     
     def restore_from_trash_clicked(e):
-        restore_task_from_trash(e.control.data)
-        update_ui()
+        escrever(servico.restaurar, e.control.data)
     
     # Funções que constroem a UI de cada item
     def create_task_view(task):
@@ -150,40 +149,55 @@ def flet_main(page: ft.Page):
 
     # Definição dos controles principais da UI
     new_task_field = ft.TextField(hint_text="O que precisa ser feito?", expand=True, on_submit=lambda e: add_task_clicked())
-    active_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
-    trashed_tasks_column = ft.Column(spacing=10, scroll=ft.ScrollMode.ADAPTIVE)
+
+    # Estado local: última revisão aplicada (None até a primeira carga) e as listas virtuais
+    estado = {'revisao': None}
+    # Páginas pedidas na rolagem vêm direto do pool de conexões (já fora da thread do evento)
+    quadro = QuadroDeTarefas(
+        create_task_view, create_trashed_task_view,
+        lambda ativo, after_id: servico.pagina(ativo, after_id, TAMANHO_PAGINA),
+    )
+
+    def buscar(q, ativo, offset, limit):
+        # A busca já roda numa thread de fundo (a da espera de digitação)
+        try:
+            return servico.buscar(q, ativo, offset, limit)
+        except Exception as erro:
+            show_error_snackbar(erro)
+            return None
+
+    busca = CaixaDeBusca(buscar, create_task_view, create_trashed_task_view, page.update)
+    contadores = ContadoresDasAbas()
     
     tabs = ft.Tabs(
         selected_index=0,
         expand=1,
         tabs=[
-            ft.Tab(text="Tarefas Ativas", icon="list_alt_rounded", content=active_tasks_column),
-            ft.Tab(text="Lixeira", icon="delete_sweep_outlined", content=trashed_tasks_column),
+            ft.Tab(tab_content=contadores.rotulo(True, "Tarefas Ativas", "list_alt_rounded"), content=busca.conteudo(True, quadro.coluna_ativas)),
+            ft.Tab(tab_content=contadores.rotulo(False, "Lixeira", "delete_sweep_outlined"), content=busca.conteudo(False, quadro.coluna_lixeira)),
         ]
     )
     
     # Adiciona os elementos à página
     page.add(
         ft.Row(controls=[new_task_field]),
+        ft.Row(controls=[busca.campo]),
         ft.Container(content=tabs, expand=True)
     )
     
     # Carrega os dados iniciais
     update_ui()
+    threading.Thread(target=escutar_alteracoes, daemon=True).start()
 
 # --- Ponto de Entrada Principal que inicia as Threads ---
-def run_flask():
-    """Função para rodar o Flask."""
-    flask_app.run(host="0.0.0.0", port=5000) 
-
 if __name__ == "__main__":
-    db.init_db()
-    
-    # 1. Inicia o servidor Flask em uma thread de fundo
+    # Migrações, API e interface sobem juntas: a janela não espera o banco nem o Flask
+    servico = ServicoTarefas()
+
+    # 1. A API Flask sobe em segundo plano assim que o banco estiver pronto, no mesmo pool de conexões
     print("Iniciando servidor da API em segundo plano...")
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    servico.iniciar_api(flask_app, host="0.0.0.0", port=5000)
 
     # 2. Inicia a aplicação Flet na thread principal
     print("Iniciando interface gráfica Flet...")
-    ft.app(target=flet_main)
\ No newline at end of file
+    ft.app(target=partial(flet_main, servico=servico))
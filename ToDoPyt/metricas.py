@@ -0,0 +1,239 @@
+# metricas.py
+# Métricas de desempenho da API no formato texto do Prometheus (GET /metrics), sem dependências:
+#  - latência e bytes de resposta por rota;
+#  - por função do banco (listar_tarefas, atualizar_status...): tempo total e de cada fase das
+#    consultas (conectar, executar, buscar, confirmar, desfazer) e linhas lidas;
+#  - espera por uma conexão livre no pool;
+#  - log de consultas lentas acima de METRICAS_CONSULTA_LENTA_MS.
+# Cada observação custa um bisect e um lock curto (alguns microssegundos): fica sempre ligado.
+#
+# Os números são por processo. Com vários workers do gunicorn, cada scrape cai em um deles;
+# rode com um worker por porta ou some as séries no Prometheus pelo rótulo 'instance'.
+import bisect
+import contextvars
+import inspect
+import os
+import threading
+import time
+from functools import wraps
+
+# Fases de consulta (execute, fetch) mais lentas que isto são impressas com o SQL
+METRICAS_CONSULTA_LENTA_MS = float(os.getenv("METRICAS_CONSULTA_LENTA_MS", "200"))
+
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LIMITES_QUANTIDADE = (1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000)
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes, valores, extra="") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+_LE = 'le="%s"'
+
+class Histograma:
+    """Contagens por balde, soma e total para cada combinação de rótulos."""
+
+    def __init__(self, nome, ajuda, rotulos, limites):
+        self.nome, self.ajuda, self.rotulos, self.limites = nome, ajuda, rotulos, limites
+        # valores dos rótulos -> [n por balde (não acumulado) ..., n acima do último, soma]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        balde = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [0] * (len(self.limites) + 1) + [0.0]
+            serie[balde] += 1
+            serie[-1] += valor
+
+    def linhas(self):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} histogram"
+        with self._lock:
+            series = {rotulos: list(serie) for rotulos, serie in self._series.items()}
+        for rotulos, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, n in zip(self.limites, serie):
+                acumulado += n
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, rotulos, _LE % limite)} {acumulado}"
+            acumulado += serie[len(self.limites)]
+            yield f"{self.nome}_bucket{_rotulos(self.rotulos, rotulos, _LE % '+Inf')} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {serie[-1]}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {acumulado}"
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def somar(self, valor, *rotulos):
+        with self._lock:
+            self._series[rotulos] = self._series.get(rotulos, 0) + valor
+
+    def linhas(self):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} counter"
+        with self._lock:
+            series = dict(self._series)
+        for rotulos, valor in sorted(series.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, rotulos)} {valor}"
+
+HTTP_SEGUNDOS = Histograma("todo_http_requisicao_segundos",
+                           "Tempo até a resposta (cabeçalhos, no caso de streams) por rota.",
+                           ("rota", "metodo", "status"), LIMITES_SEGUNDOS)
+HTTP_BYTES = Histograma("todo_http_resposta_bytes", "Tamanho do corpo das respostas com tamanho conhecido.",
+                        ("rota",), LIMITES_BYTES)
+DB_FUNCAO_SEGUNDOS = Histograma("todo_db_funcao_segundos",
+                                "Tempo total de cada função do banco, incluindo acertos de cache.",
+                                ("funcao",), LIMITES_SEGUNDOS)
+DB_FASE_SEGUNDOS = Histograma("todo_db_fase_segundos",
+                              "Tempo por fase das consultas (conectar, executar, buscar, confirmar, desfazer).",
+                              ("funcao", "fase"), LIMITES_SEGUNDOS)
+DB_LINHAS = Contador("todo_db_linhas_total", "Linhas lidas do banco por função.", ("funcao",))
+DB_ESPERA_POOL = Histograma("todo_db_pool_espera_segundos", "Espera por uma conexão livre no pool.",
+                            (), LIMITES_SEGUNDOS)
+DB_ESCRITAS_POR_COMMIT = Histograma("todo_db_escritas_por_commit",
+                                    "Escritas gravadas por transação no modo de escrita agrupada.",
+                                    (), LIMITES_QUANTIDADE)
+DB_CONSULTAS_LENTAS = Contador("todo_db_consultas_lentas_total",
+                               "Fases de consulta acima de METRICAS_CONSULTA_LENTA_MS.", ("funcao",))
+
+_METRICAS = [HTTP_SEGUNDOS, HTTP_BYTES, DB_FUNCAO_SEGUNDOS, DB_FASE_SEGUNDOS, DB_LINHAS,
+             DB_ESPERA_POOL, DB_ESCRITAS_POR_COMMIT, DB_CONSULTAS_LENTAS]
+# Funções chamadas a cada scrape que devolvem {nome: valor} de gauges (ex.: pool, cache)
+_coletores = []
+
+def registrar_coletor(prefixo, coletar):
+    """coletar() -> dict; os valores numéricos viram gauges '<prefixo>_<chave>'."""
+    _coletores.append((prefixo, coletar))
+
+def texto() -> str:
+    """Todas as métricas no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+    linhas = [linha for metrica in _METRICAS for linha in metrica.linhas()]
+    for prefixo, coletar in _coletores:
+        try:
+            valores = coletar()
+        except Exception as e:
+            print(f"Coletor de métricas '{prefixo}' falhou: {e}")
+            continue
+        for chave, valor in valores.items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                linhas.append(f"# TYPE {prefixo}_{chave} gauge")
+                linhas.append(f"{prefixo}_{chave} {valor}")
+    return "\n".join(linhas) + "\n"
+
+# --- REQUISIÇÕES HTTP ---
+
+def observar_requisicao(rota, metodo, status, inicio, tamanho):
+    """inicio: time.perf_counter() do começo da requisição; tamanho None para streams."""
+    HTTP_SEGUNDOS.observar(time.perf_counter() - inicio, rota, metodo, status)
+    if tamanho is not None:
+        HTTP_BYTES.observar(tamanho, rota)
+
+# --- BANCO ---
+# A função do banco em execução fica numa ContextVar (vale por thread e por task do asyncio):
+# as fases medidas no cursor e na conexão são atribuídas a ela.
+
+_funcao_atual = contextvars.ContextVar("funcao_db", default="outra")
+
+def fase(nome_fase, inicio, sql=None, linhas=None):
+    """Registra uma fase iniciada em 'inicio' (perf_counter) na função do banco em execução."""
+    duracao = time.perf_counter() - inicio
+    funcao = _funcao_atual.get()
+    DB_FASE_SEGUNDOS.observar(duracao, funcao, nome_fase)
+    if linhas:
+        DB_LINHAS.somar(linhas, funcao)
+    if duracao * 1000 >= METRICAS_CONSULTA_LENTA_MS:
+        DB_CONSULTAS_LENTAS.somar(1, funcao)
+        if isinstance(sql, bytes):
+            sql = sql.decode(errors="replace")
+        consulta = " ".join(str(sql).split())[:300] if sql is not None else ""
+        print(f"[consulta lenta] {funcao} {nome_fase} {duracao * 1000:.1f} ms {consulta}")
+
+def espera_pool(segundos):
+    DB_ESPERA_POOL.observar(segundos)
+
+def escritas_por_commit(n):
+    DB_ESCRITAS_POR_COMMIT.observar(n)
+
+def medir_funcao(nome):
+    """Decorador das funções públicas do banco: tempo total e nome para as fases das consultas.
+
+    Aceita funções comuns, corrotinas e geradores (síncronos ou não; o tempo de cada passo é somado).
+    """
+    def decorador(func):
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def envoltorio_gerador(*args, **kwargs):
+                gerador = func(*args, **kwargs)
+                total = 0.0
+                try:
+                    while True:
+                        token = _funcao_atual.set(nome)
+                        inicio = time.perf_counter()
+                        try:
+                            item = next(gerador)
+                        except StopIteration:
+                            return
+                        finally:
+                            total += time.perf_counter() - inicio
+                            _funcao_atual.reset(token)
+                        yield item
+                finally:
+                    gerador.close()
+                    DB_FUNCAO_SEGUNDOS.observar(total, nome)
+            return envoltorio_gerador
+
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def envoltorio_gerador_async(*args, **kwargs):
+                gerador = func(*args, **kwargs)
+                total = 0.0
+                try:
+                    while True:
+                        token = _funcao_atual.set(nome)
+                        inicio = time.perf_counter()
+                        try:
+                            item = await gerador.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            total += time.perf_counter() - inicio
+                            _funcao_atual.reset(token)
+                        yield item
+                finally:
+                    await gerador.aclose()
+                    DB_FUNCAO_SEGUNDOS.observar(total, nome)
+            return envoltorio_gerador_async
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def envoltorio_async(*args, **kwargs):
+                token = _funcao_atual.set(nome)
+                inicio = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    DB_FUNCAO_SEGUNDOS.observar(time.perf_counter() - inicio, nome)
+                    _funcao_atual.reset(token)
+            return envoltorio_async
+
+        @wraps(func)
+        def envoltorio(*args, **kwargs):
+            token = _funcao_atual.set(nome)
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                DB_FUNCAO_SEGUNDOS.observar(time.perf_counter() - inicio, nome)
+                _funcao_atual.reset(token)
+        return envoltorio
+    return decorador
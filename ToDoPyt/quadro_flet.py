@@ -0,0 +1,197 @@
+# quadro_flet.py
+# Listas de tarefas virtualizadas dos apps Flet. Cada lista carrega páginas da API (ou do banco)
+# conforme o usuário rola, mantém viva só uma janela fixa de linhas e recicla essas linhas.
+# Abrir um quadro com 100 mil tarefas custa o mesmo que abrir um com 100.
+# Os totais das abas vêm prontos do servidor (ContadoresDasAbas), sem carregar as listas.
+import bisect
+import threading
+
+import flet as ft
+
+ALTURA_LINHA = 50      # altura fixa de cada linha (px): permite converter rolagem em índice
+JANELA = 60            # linhas (controles) vivas por lista
+TAMANHO_PAGINA = 100   # tarefas pedidas por página
+
+class ListaVirtual:
+    """Uma coluna virtualizada: dados carregados por página, controles reciclados numa janela."""
+
+    def __init__(self, criar_linha, carregar_pagina, texto_vazio):
+        self.criar_linha = criar_linha
+        # carregar_pagina(after_id) -> (tarefas, proximo_cursor), ou None se a carga falhou
+        self.carregar_pagina = carregar_pagina
+        self.tarefas = []   # dicts já carregados, ordenados por id
+        self.ids = []
+        self.cursor = None
+        self.fim = False
+        self.inicio = 0     # índice em self.tarefas da primeira linha da janela
+        self.lock = threading.RLock()
+        # Espaçadores ocupam a altura das linhas fora da janela, para a barra de rolagem ficar certa
+        self.topo = ft.Container(height=0)
+        self.base = ft.Container(height=0)
+        self.vazio = ft.Container(ft.Text(texto_vazio), alignment=ft.alignment.center, padding=20, visible=False)
+        self.celulas = [ft.Container(height=ALTURA_LINHA, visible=False) for _ in range(JANELA)]
+        self.view = ft.ListView(
+            controls=[self.vazio, self.topo, *self.celulas, self.base],
+            expand=True, spacing=0, on_scroll=self._rolou, on_scroll_interval=50,
+        )
+
+    def carregar_mais(self) -> bool:
+        """Busca a próxima página; retorna True se algo foi acrescentado."""
+        if self.fim:
+            return False
+        pagina = self.carregar_pagina(self.cursor)
+        if pagina is None:
+            return False
+        tarefas, proximo_cursor = pagina
+        ultimo = self.ids[-1] if self.ids else 0
+        # Tarefas que já chegaram por um delta não são duplicadas
+        novas = [task for task in tarefas if task['id'] > ultimo]
+        self.tarefas.extend(novas)
+        self.ids.extend(task['id'] for task in novas)
+        self.cursor = proximo_cursor
+        self.fim = proximo_cursor is None
+        return bool(novas) or self.fim
+
+    def buscar(self, id_tarefa):
+        posicao = bisect.bisect_left(self.ids, id_tarefa)
+        if posicao < len(self.ids) and self.ids[posicao] == id_tarefa:
+            return self.tarefas[posicao]
+        return None
+
+    def aplicar(self, task) -> bool:
+        """Insere, atualiza ou remove uma tarefa vinda de um delta; retorna True se a lista mudou."""
+        posicao = bisect.bisect_left(self.ids, task['id'])
+        existe = posicao < len(self.ids) and self.ids[posicao] == task['id']
+        if task.get('remover'):
+            if existe:
+                del self.ids[posicao]
+                del self.tarefas[posicao]
+            return existe
+        if existe:
+            self.tarefas[posicao] = task
+            return True
+        # Além do que já foi carregado a tarefa chega com a próxima página
+        if not self.fim and (not self.ids or task['id'] > self.ids[-1]):
+            return False
+        self.ids.insert(posicao, task['id'])
+        self.tarefas.insert(posicao, task)
+        return True
+
+    def renderizar(self):
+        """Liga as células da janela às tarefas visíveis; células com a mesma tarefa não são refeitas."""
+        total = len(self.tarefas)
+        self.inicio = max(0, min(self.inicio, total - JANELA))
+        for i, celula in enumerate(self.celulas):
+            j = self.inicio + i
+            if j < total:
+                task = self.tarefas[j]
+                chave = (task['id'], task['titulo'], task['status'])
+                if celula.data != chave:
+                    celula.content = self.criar_linha(task)
+                    celula.data = chave
+                celula.visible = True
+            elif celula.visible:
+                celula.visible, celula.content, celula.data = False, None, None
+        self.topo.height = self.inicio * ALTURA_LINHA
+        self.base.height = max(0, total - self.inicio - JANELA) * ALTURA_LINHA
+        self.vazio.visible = total == 0 and self.fim
+
+    def _rolou(self, e):
+        with self.lock:
+            primeira = int(e.pixels // ALTURA_LINHA)
+            mudou = False
+            # Perto do fim do que foi carregado: busca a próxima página
+            if primeira + JANELA >= len(self.tarefas) and not self.fim:
+                mudou = self.carregar_mais()
+            # Recentraliza a janela quando a rolagem se afasta dela
+            novo_inicio = max(0, primeira - JANELA // 4)
+            if abs(novo_inicio - self.inicio) >= JANELA // 4:
+                self.inicio = novo_inicio
+                mudou = True
+            if mudou:
+                self.renderizar()
+                self.view.update()
+
+class QuadroDeTarefas:
+    """As duas listas (ativas e lixeira), alimentadas por páginas e corrigidas por deltas."""
+
+    def __init__(self, criar_linha_ativa, criar_linha_excluida, carregar_pagina):
+        # carregar_pagina(ativo, after_id) -> (tarefas, proximo_cursor), ou None se falhou
+        self.listas = {
+            True: ListaVirtual(criar_linha_ativa, lambda cursor: carregar_pagina(True, cursor), "Nenhuma tarefa ativa."),
+            False: ListaVirtual(criar_linha_excluida, lambda cursor: carregar_pagina(False, cursor), "A lixeira está vazia."),
+        }
+        self.coluna_ativas = self.listas[True].view
+        self.coluna_lixeira = self.listas[False].view
+
+    def carregar(self, em_paralelo=None):
+        """Primeira página de cada lista. Retorna os controles a passar para page.update().
+
+        em_paralelo(*chamadas), se dado, busca as duas páginas ao mesmo tempo.
+        """
+        def carregar_lista(lista):
+            with lista.lock:
+                lista.carregar_mais()
+                lista.renderizar()
+        chamadas = [lambda lista=lista: carregar_lista(lista) for lista in self.listas.values()]
+        if em_paralelo:
+            em_paralelo(*chamadas)
+        else:
+            for chamada in chamadas:
+                chamada()
+        return [self.coluna_ativas, self.coluna_lixeira]
+
+    def tarefa(self, id_tarefa):
+        """A tarefa como está na tela (em qualquer das listas), ou None se não foi carregada."""
+        for lista in self.listas.values():
+            with lista.lock:
+                task = lista.buscar(id_tarefa)
+            if task is not None:
+                return task
+        return None
+
+    def aplicar(self, tarefas):
+        """Aplica tarefas novas/alteradas na lista certa e as tira da outra ({'id', 'remover': True} tira das duas).
+
+        Retorna só as listas que mudaram, para o chamador passar a page.update(*controles).
+        """
+        alteradas = set()
+        for task in tarefas:
+            for ativo, lista in self.listas.items():
+                with lista.lock:
+                    mudou = lista.aplicar(task if not task.get('remover') and task['ativo'] == ativo else {'id': task['id'], 'remover': True})
+                if mudou:
+                    alteradas.add(ativo)
+        for ativo in alteradas:
+            with self.listas[ativo].lock:
+                self.listas[ativo].renderizar()
+        return [self.listas[ativo].view for ativo in alteradas]
+
+class ContadoresDasAbas:
+    """Rótulos das abas com o total de cada lista (badge), vindos de /tarefas/stats: nada de contar linhas."""
+
+    def __init__(self):
+        self.badges = {
+            ativo: ft.Container(
+                ft.Text("", size=11, weight=ft.FontWeight.BOLD), bgcolor="surfacevariant",
+                border_radius=10, padding=ft.padding.symmetric(horizontal=7, vertical=1), visible=False,
+            )
+            for ativo in (True, False)
+        }
+
+    def rotulo(self, ativo, texto, icone):
+        """Conteúdo para o tab_content de ft.Tab."""
+        return ft.Row([ft.Icon(icone), ft.Text(texto), self.badges[ativo]], spacing=8, tight=True)
+
+    def atualizar(self, estatisticas):
+        """Aplica um resultado de /tarefas/stats. Retorna os badges que mudaram (para page.update)."""
+        alterados = []
+        for ativo, chave in ((True, 'ativas'), (False, 'excluidas')):
+            contagem = estatisticas[chave]
+            badge = self.badges[ativo]
+            texto = str(contagem['total'])
+            detalhe = " · ".join(f"{status}: {total}" for status, total in contagem['por_status'].items())
+            if badge.content.value != texto or badge.tooltip != detalhe or not badge.visible:
+                badge.content.value, badge.tooltip, badge.visible = texto, detalhe, True
+                alterados.append(badge)
+        return alterados
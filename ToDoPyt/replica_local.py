@@ -0,0 +1,304 @@
+# replica_local.py
+# Réplica local das tarefas para o app de desktop (app_flet_final.py), em SQLite.
+# A tela lê só daqui, sem esperar a rede; escritas vão para um diário de saída que uma thread
+# envia à API em lotes, e as alterações remotas chegam por /tarefas/changes.
+#
+# Tabelas:
+#   remotas - estado das tarefas como o servidor as conhece (última sincronização)
+#   saida   - alterações locais ainda não confirmadas: uma linha por (tarefa, campo)
+#   tarefas - o que a tela mostra: remotas + saida aplicada por cima, recalculado a cada mudança
+#   busca   - índice FTS5 dos títulos de 'tarefas', mantido junto com ela por _recalcular
+#   contagem - totais de 'tarefas' por (status, ativo), também mantidos por _recalcular
+#   criadas - id definitivo de cada id temporário já criado no servidor
+#
+# Política de conflito (determinística): uma alteração local pendente vale sobre o valor remoto,
+# campo a campo, até ser enviada. O servidor aplica na ordem restaurar -> status -> lixeira; o que
+# ele recusar (ex.: status de uma tarefa que foi para a lixeira em outro cliente) é descartado e a
+# tela volta ao valor do servidor. Assim a lixeira vence uma troca de status concorrente, e entre
+# lixeira/restaurar vale a última enviada.
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+
+import requests
+
+# Segundos entre sincronizações quando nada acontece (o stream SSE antecipa a próxima)
+INTERVALO_SINCRONIZACAO = float(os.getenv("REPLICA_INTERVALO", "30"))
+# Itens por requisição de lote (a API aceita até database.LIMITE_LOTE)
+LOTE_ENVIO = 500
+
+def caminho_padrao(api_url):
+    """Um arquivo por servidor, para réplicas de APIs diferentes não se misturarem."""
+    sufixo = format(zlib.crc32(api_url.encode()), "08x")
+    return os.getenv("REPLICA_ARQUIVO") or os.path.join(os.path.expanduser("~"), f".todolist_replica_{sufixo}.db")
+
+class ReplicaLocal:
+    def __init__(self, cliente, caminho, ao_alterar, ao_descartar):
+        # ao_alterar(tarefas): dicts para QuadroDeTarefas.aplicar (com 'remover' para sumir da tela)
+        # ao_descartar(n): o servidor recusou n alterações locais, já desfeitas na réplica
+        self.cliente = cliente
+        self.ao_alterar = ao_alterar
+        self.ao_descartar = ao_descartar
+        self._lock = threading.RLock()
+        self._acordar = threading.Event()
+        self._conn = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._conn.execute("PRAGMA synchronous = NORMAL;")
+        self._criar_tabelas()
+
+    def _criar_tabelas(self):
+        with self._transacao() as conn:
+            nova_busca = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'busca';").fetchone() is None
+            nova_contagem = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'contagem';").fetchone() is None
+            for comando in (
+                "CREATE TABLE IF NOT EXISTS remotas (id INTEGER PRIMARY KEY, titulo TEXT NOT NULL, status TEXT NOT NULL, ativo INTEGER NOT NULL);",
+                "CREATE TABLE IF NOT EXISTS tarefas (id INTEGER PRIMARY KEY, titulo TEXT NOT NULL, status TEXT NOT NULL, ativo INTEGER NOT NULL);",
+                "CREATE INDEX IF NOT EXISTS idx_tarefas_ativo_id ON tarefas (ativo, id);",
+                # campo: 'criar' (valor = título), 'status' ou 'ativo' ('0'/'1'); ids negativos = ainda não criadas
+                """CREATE TABLE IF NOT EXISTS saida (
+                       seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                       id_tarefa INTEGER NOT NULL, campo TEXT NOT NULL, valor TEXT NOT NULL,
+                       UNIQUE (id_tarefa, campo));""",
+                "CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL);",
+                "INSERT OR IGNORE INTO meta (chave, valor) VALUES ('revisao', 0), ('proximo_temporario', -1);",
+                "CREATE VIRTUAL TABLE IF NOT EXISTS busca USING fts5(titulo, tokenize='unicode61 remove_diacritics 2');",
+                "CREATE TABLE IF NOT EXISTS contagem (status TEXT NOT NULL, ativo INTEGER NOT NULL, total INTEGER NOT NULL, PRIMARY KEY (status, ativo));",
+                "CREATE TABLE IF NOT EXISTS criadas (temporario INTEGER PRIMARY KEY, id INTEGER NOT NULL);",
+            ):
+                conn.execute(comando)
+            # Identifica esta réplica nas chaves de idempotência das criações (id temporário sozinho se repete entre réplicas)
+            conn.execute("INSERT OR IGNORE INTO meta (chave, valor) VALUES ('replica', ?);", (secrets.randbits(63),))
+            self._replica = conn.execute("SELECT valor FROM meta WHERE chave = 'replica';").fetchone()[0]
+            # Réplica de uma versão anterior: indexa e conta o que já estava na tela
+            if nova_busca:
+                conn.execute("INSERT INTO busca (rowid, titulo) SELECT id, titulo FROM tarefas;")
+            if nova_contagem:
+                conn.execute("INSERT INTO contagem (status, ativo, total) SELECT status, ativo, count(*) FROM tarefas GROUP BY status, ativo;")
+
+    @contextmanager
+    def _transacao(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK;")
+                raise
+            self._conn.execute("COMMIT;")
+
+    # --- Estado visível ---
+
+    def _recalcular(self, conn, id_tarefa):
+        """Refaz a linha visível de uma tarefa (remota + pendências) e a devolve no formato da tela."""
+        anterior = conn.execute("SELECT status, ativo FROM tarefas WHERE id = ?;", (id_tarefa,)).fetchone()
+        if anterior is not None:
+            self._contar(conn, anterior['status'], anterior['ativo'], -1)
+        base = conn.execute("SELECT titulo, status, ativo FROM remotas WHERE id = ?;", (id_tarefa,)).fetchone()
+        pendentes = dict(conn.execute("SELECT campo, valor FROM saida WHERE id_tarefa = ?;", (id_tarefa,)).fetchall())
+        if base is not None:
+            titulo, status, ativo = base['titulo'], base['status'], bool(base['ativo'])
+        elif 'criar' in pendentes:
+            titulo, status, ativo = pendentes['criar'], 'pendente', True
+        else:
+            conn.execute("DELETE FROM tarefas WHERE id = ?;", (id_tarefa,))
+            conn.execute("DELETE FROM busca WHERE rowid = ?;", (id_tarefa,))
+            return {'id': id_tarefa, 'remover': True}
+        status = pendentes.get('status', status)
+        ativo = pendentes['ativo'] == '1' if 'ativo' in pendentes else ativo
+        conn.execute("INSERT OR REPLACE INTO tarefas (id, titulo, status, ativo) VALUES (?, ?, ?, ?);",
+                     (id_tarefa, titulo, status, int(ativo)))
+        conn.execute("DELETE FROM busca WHERE rowid = ?;", (id_tarefa,))
+        conn.execute("INSERT INTO busca (rowid, titulo) VALUES (?, ?);", (id_tarefa, titulo))
+        self._contar(conn, status, int(ativo), 1)
+        return {'id': id_tarefa, 'titulo': titulo, 'status': status, 'ativo': ativo}
+
+    @staticmethod
+    def _contar(conn, status, ativo, delta):
+        conn.execute(
+            """INSERT INTO contagem (status, ativo, total) VALUES (?, ?, ?)
+               ON CONFLICT (status, ativo) DO UPDATE SET total = total + excluded.total;""",
+            (status, ativo, delta)
+        )
+
+    def estatisticas(self):
+        """Totais das abas no formato de /tarefas/stats, já com as alterações locais pendentes."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, ativo, total FROM contagem WHERE total > 0;").fetchall()
+        resultado = {}
+        for chave, ativo in (('ativas', 1), ('excluidas', 0)):
+            por_status = {status: 0 for status in ('pendente', 'fazendo', 'concluída')}
+            por_status.update({r['status']: r['total'] for r in rows if r['ativo'] == ativo})
+            resultado[chave] = {'total': sum(por_status.values()), 'por_status': por_status}
+        return resultado
+
+    def pagina(self, ativo, after_id, limit):
+        """Página por keyset da réplica. Tarefas ainda não criadas no servidor (id < 0) vêm primeiro."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, titulo, status, ativo FROM tarefas WHERE ativo = ? AND id > ? ORDER BY id LIMIT ?;",
+                (int(ativo), after_id if after_id is not None else -2**63, limit + 1)
+            ).fetchall()
+        tarefas = [{'id': r['id'], 'titulo': r['titulo'], 'status': r['status'], 'ativo': bool(r['ativo'])} for r in rows[:limit]]
+        return tarefas, (tarefas[-1]['id'] if len(rows) > limit else None)
+
+    def buscar(self, q, ativo, offset, limit):
+        """Busca nos títulos da réplica (prefixo de cada palavra, sem acentos), por relevância."""
+        termos = re.findall(r"\w+", q.lower())[:8]
+        if not termos:
+            return [], None
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT t.id, t.titulo, t.status, t.ativo FROM busca JOIN tarefas AS t ON t.id = busca.rowid
+                   WHERE busca MATCH ? AND t.ativo = ? ORDER BY busca.rank, t.id LIMIT ? OFFSET ?;""",
+                (" AND ".join(f'"{t}"*' for t in termos), int(ativo), limit + 1, offset)
+            ).fetchall()
+        tarefas = [{'id': r['id'], 'titulo': r['titulo'], 'status': r['status'], 'ativo': bool(r['ativo'])} for r in rows[:limit]]
+        return tarefas, (offset + limit if len(rows) > limit else None)
+
+    def revisao(self):
+        with self._lock:
+            return self._conn.execute("SELECT valor FROM meta WHERE chave = 'revisao';").fetchone()[0]
+
+    # --- Escritas locais: gravadas no diário e visíveis na hora ---
+
+    def _registrar(self, id_tarefa, campo, valor):
+        with self._transacao() as conn:
+            if id_tarefa < 0 and campo != 'criar' and conn.execute(
+                "SELECT 1 FROM saida WHERE id_tarefa = ? AND campo = 'criar';", (id_tarefa,)
+            ).fetchone() is None:
+                # A criação já foi enviada (a tela ainda tinha o id temporário): a alteração vai para o id
+                # definitivo; sem ele (criação recusada), não há tarefa a alterar
+                criada = conn.execute("SELECT id FROM criadas WHERE temporario = ?;", (id_tarefa,)).fetchone()
+                if criada is None:
+                    return [self._recalcular(conn, id_tarefa)]
+                id_tarefa = criada['id']
+            # Alterações repetidas no mesmo campo viram uma só
+            conn.execute(
+                """INSERT INTO saida (id_tarefa, campo, valor) VALUES (?, ?, ?)
+                   ON CONFLICT (id_tarefa, campo) DO UPDATE SET valor = excluded.valor;""",
+                (id_tarefa, campo, valor)
+            )
+            tarefa = self._recalcular(conn, id_tarefa)
+        self._acordar.set()
+        return [tarefa]
+
+    def adicionar(self, titulo):
+        with self._transacao() as conn:
+            id_temporario = conn.execute("SELECT valor FROM meta WHERE chave = 'proximo_temporario';").fetchone()[0]
+            conn.execute("UPDATE meta SET valor = valor - 1 WHERE chave = 'proximo_temporario';")
+        return self._registrar(id_temporario, 'criar', titulo)
+
+    def alterar_status(self, id_tarefa, status):
+        return self._registrar(id_tarefa, 'status', status)
+
+    def mover_para_lixeira(self, id_tarefa):
+        return self._registrar(id_tarefa, 'ativo', '0')
+
+    def restaurar(self, id_tarefa):
+        return self._registrar(id_tarefa, 'ativo', '1')
+
+    # --- Sincronização ---
+
+    def sincronizar_agora(self):
+        self._acordar.set()
+
+    def iniciar(self):
+        threading.Thread(target=self._rodar, name="replica-sincronizacao", daemon=True).start()
+
+    def _rodar(self):
+        espera = INTERVALO_SINCRONIZACAO
+        while True:
+            self._acordar.clear()
+            try:
+                self.sincronizar()
+                espera = INTERVALO_SINCRONIZACAO
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                print(f"Sincronização falhou ({e}); nova tentativa em breve")
+                espera = 2 if espera >= INTERVALO_SINCRONIZACAO else min(espera * 2, INTERVALO_SINCRONIZACAO)
+            self._acordar.wait(espera)
+
+    def sincronizar(self):
+        """Envia o diário de saída e depois puxa o que mudou no servidor."""
+        self._enviar_criacoes()
+        self._enviar_campo('ativo', '1', "PUT", "/tarefas/recuperar/batch")
+        self._enviar_campo('status', None, "PUT", "/tarefas/status/batch")
+        self._enviar_campo('ativo', '0', "PUT", "/tarefas/lixeira/batch")
+        self._puxar()
+
+    def _pendentes(self, campo, valor=None):
+        sql = "SELECT seq, id_tarefa, valor FROM saida WHERE campo = ? AND id_tarefa > 0"
+        params = [campo]
+        if campo == 'criar':
+            sql = "SELECT seq, id_tarefa, valor FROM saida WHERE campo = 'criar'"
+            params = []
+        elif valor is not None:
+            sql += " AND valor = ?"
+            params.append(valor)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY seq LIMIT ?;", (*params, LOTE_ENVIO)).fetchall()
+
+    def _enviar_criacoes(self):
+        while (itens := self._pendentes('criar')):
+            # Se a resposta se perder, o reenvio leva as mesmas chaves e o servidor devolve as tarefas já criadas
+            corpo = {'tarefas': [{'text': i['valor'], 'chave': f"{self._replica:016x}:{-i['id_tarefa']}"} for i in itens]}
+            resposta = self.cliente.requisitar("POST", "/tarefas/batch", json_data=corpo)
+            alteradas, descartadas = [], 0
+            with self._transacao() as conn:
+                for item, resultado in zip(itens, resposta.json()['resultados']):
+                    conn.execute("DELETE FROM saida WHERE seq = ?;", (item['seq'],))
+                    if resultado['sucesso']:
+                        task = resultado['tarefa']
+                        conn.execute("INSERT OR REPLACE INTO remotas (id, titulo, status, ativo) VALUES (?, ?, ?, ?);",
+                                     (task['id'], task['titulo'], task['status'], int(task['ativo'])))
+                        # Pendências feitas sobre o id temporário passam para o id definitivo
+                        conn.execute("UPDATE saida SET id_tarefa = ? WHERE id_tarefa = ?;", (task['id'], item['id_tarefa']))
+                        conn.execute("INSERT OR REPLACE INTO criadas (temporario, id) VALUES (?, ?);", (item['id_tarefa'], task['id']))
+                        alteradas.append(self._recalcular(conn, task['id']))
+                    else:
+                        conn.execute("DELETE FROM saida WHERE id_tarefa = ?;", (item['id_tarefa'],))
+                        descartadas += 1
+                    alteradas.append(self._recalcular(conn, item['id_tarefa']))
+            self._avisar(alteradas, descartadas)
+
+    def _enviar_campo(self, campo, valor, metodo, url_path):
+        while (itens := self._pendentes(campo, valor)):
+            if campo == 'status':
+                corpo = {'itens': [{'id': i['id_tarefa'], 'status': i['valor']} for i in itens]}
+            else:
+                corpo = {'ids': [i['id_tarefa'] for i in itens]}
+            resultados = self.cliente.requisitar(metodo, url_path, json_data=corpo).json()['resultados']
+            alteradas, descartadas = [], 0
+            with self._transacao() as conn:
+                for item, resultado in zip(itens, resultados):
+                    # Se o campo mudou de novo durante o envio, a versão nova fica para a próxima rodada
+                    conn.execute("DELETE FROM saida WHERE seq = ? AND valor = ?;", (item['seq'], item['valor']))
+                    if resultado['sucesso']:
+                        coluna_valor = item['valor'] if campo == 'status' else int(item['valor'])
+                        conn.execute(f"UPDATE remotas SET {campo} = ? WHERE id = ?;", (coluna_valor, item['id_tarefa']))
+                    else:
+                        descartadas += 1
+                    alteradas.append(self._recalcular(conn, item['id_tarefa']))
+            self._avisar(alteradas, descartadas)
+
+    def _puxar(self):
+        alteracoes = self.cliente.alteracoes(self.revisao())
+        remotas = alteracoes['ativas'] + alteracoes['excluidas']
+        alteradas = []
+        with self._transacao() as conn:
+            for task in remotas:
+                conn.execute("INSERT OR REPLACE INTO remotas (id, titulo, status, ativo) VALUES (?, ?, ?, ?);",
+                             (task['id'], task['titulo'], task['status'], int(task['ativo'])))
+                alteradas.append(self._recalcular(conn, task['id']))
+            conn.execute("UPDATE meta SET valor = ? WHERE chave = 'revisao';", (alteracoes['revisao'],))
+        self._avisar(alteradas, 0)
+
+    def _avisar(self, alteradas, descartadas):
+        if alteradas:
+            self.ao_alterar(alteradas)
+        if descartadas:
+            self.ao_descartar(descartadas)
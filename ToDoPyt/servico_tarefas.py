@@ -0,0 +1,98 @@
+# servico_tarefas.py
+# Camada de serviço do modo embutido (main_flet_app.py): a interface Flet e a API Flask rodam no
+# mesmo processo e falam com o banco pelo mesmo pool de database.py. O trabalho de banco da interface
+# roda num pool limitado de threads, nunca na thread do evento, e o resultado volta por callback.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import api_comum
+import database as db
+
+# Threads para o trabalho de banco da interface. Junto com as threads da API embutida,
+# não deve passar de DB_POOL_MAX, senão as chamadas esperam conexão livre.
+SERVICO_TRABALHADORES = int(os.getenv("SERVICO_TRABALHADORES", "4"))
+
+class ServicoTarefas:
+    def __init__(self, trabalhadores=SERVICO_TRABALHADORES):
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="servico-tarefas")
+        # As migrações rodam em segundo plano; a janela abre sem esperar por elas
+        self._pronto = self._executor.submit(db.init_db)
+
+    def esperar_pronto(self):
+        """Bloqueia até o banco estar migrado; levanta o erro de init_db, se houve."""
+        self._pronto.result()
+
+    def chamar(self, funcao, *args, ao_concluir=None, ao_falhar=None, **kwargs):
+        """Agenda funcao(*args, **kwargs) no pool e devolve o Future.
+
+        ao_concluir(resultado) ou ao_falhar(erro) rodam na thread do pool, quando a chamada termina.
+        """
+        def executar():
+            self.esperar_pronto()
+            return funcao(*args, **kwargs)
+
+        futuro = self._executor.submit(executar)
+        if ao_concluir or ao_falhar:
+            def repassar(f):
+                erro = f.exception()
+                if erro is None:
+                    if ao_concluir:
+                        ao_concluir(f.result())
+                elif ao_falhar:
+                    ao_falhar(erro)
+                else:
+                    print(f"Erro no serviço de tarefas: {erro}")
+            futuro.add_done_callback(repassar)
+        return futuro
+
+    def iniciar_api(self, app, host="0.0.0.0", port=5000):
+        """Sobe a API Flask numa thread daemon, assim que as migrações terminarem."""
+        def rodar():
+            self.esperar_pronto()
+            app.run(host=host, port=port, threaded=True)
+        thread = threading.Thread(target=rodar, name="api-embutida", daemon=True)
+        thread.start()
+        return thread
+
+    # --- Operações usadas pela interface ---
+
+    @staticmethod
+    def alteracoes(since):
+        """Tarefas (ativas e da lixeira) alteradas desde a revisão 'since', e a revisão atual."""
+        revisao, tarefas = db.listar_alteracoes(since)
+        return revisao, [task._asdict() for task in tarefas]
+
+    @staticmethod
+    def estatisticas():
+        """Totais por status e da lixeira, no formato de /tarefas/stats."""
+        return api_comum.estatisticas(*db.contar_tarefas())
+
+    @staticmethod
+    def pagina(ativo, after_id, limit):
+        """Uma página (keyset) de tarefas ativas ou da lixeira."""
+        listar = db.listar_tarefas_paginado if ativo else db.listar_tarefas_excluidas_paginado
+        tarefas, proximo_cursor = listar(after_id=after_id, limit=limit)
+        return [task._asdict() for task in tarefas], proximo_cursor
+
+    @staticmethod
+    def buscar(q, ativo, offset, limit):
+        """Uma página da busca nos títulos, por relevância."""
+        tarefas, proximo_offset, _ = db.buscar_tarefas(q, ativo=ativo, offset=offset, limit=limit)
+        return [task._asdict() for task in tarefas], proximo_offset
+
+    @staticmethod
+    def adicionar(titulo):
+        return db.adicionar_tarefa(titulo)._asdict()
+
+    @staticmethod
+    def atualizar_status(id_tarefa, status):
+        return db.atualizar_status(id_tarefa, db.StatusTarefa(status))
+
+    @staticmethod
+    def mover_para_lixeira(id_tarefa):
+        return db.desativar_tarefa(id_tarefa)
+
+    @staticmethod
+    def restaurar(id_tarefa):
+        return db.recuperar_tarefa(id_tarefa)
@@ -0,0 +1,39 @@
+# conftest.py
+# Os testes sobem a API Flask (api.py) sobre o backend SQLite, sem servidor de banco: cada teste
+# recebe um arquivo novo e um cache vazio.
+#
+# Uso (em ToDoPyt): python -m pytest tests
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de importar database: o backend é escolhido pela URL na importação. O arquivo de verdade é
+# trocado por teste (fixture cliente); este nunca chega a ser aberto
+os.environ["DB_CONNECTION_STRING"] = "sqlite:///:memory:"
+os.environ["CACHE_BACKEND"] = "memoria"
+
+import api  # noqa: E402
+import armazenamento_sqlite  # noqa: E402
+import database as db  # noqa: E402
+from cache import criar_cache  # noqa: E402
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    """Cliente de teste da API com um banco SQLite novo e migrado."""
+    monkeypatch.setattr(armazenamento_sqlite, "CAMINHO", str(tmp_path / "tarefas.db"))
+    # As conexões por thread apontam para o arquivo do teste anterior
+    monkeypatch.setattr(armazenamento_sqlite, "_local", threading.local())
+    monkeypatch.setattr(db, "cache_listas", criar_cache("memoria", db.CACHE_TTL, db.CACHE_MAX_ENTRADAS))
+    db.init_db()
+    return api.app.test_client()
+
+@pytest.fixture
+def criar(cliente):
+    """criar('título', ...) -> lista das tarefas criadas (dicts), na ordem dos títulos."""
+    def criar(*titulos):
+        return [cliente.post('/tarefas', json={'text': titulo}).get_json() for titulo in titulos]
+    return criar
@@ -0,0 +1,206 @@
+# test_api.py
+# Contrato HTTP da API (api.py) sobre o backend SQLite: respostas, códigos de status e as regras de
+# ETag, paginação, sincronização incremental e operações em lote.
+import api_comum as comum
+
+def ids(tarefas):
+    return [t['id'] for t in tarefas]
+
+# --- Tarefa a tarefa ---
+
+def test_criar_e_listar(cliente):
+    resposta = cliente.post('/tarefas', json={'text': 'Comprar pão'})
+    assert resposta.status_code == 201
+    tarefa = resposta.get_json()
+    assert tarefa == {'id': tarefa['id'], 'titulo': 'Comprar pão', 'status': 'pendente', 'ativo': True}
+    assert cliente.get('/tarefas').get_json() == [tarefa]
+
+def test_criar_sem_texto(cliente):
+    assert cliente.post('/tarefas', json={'text': ''}).status_code == 400
+    assert cliente.post('/tarefas', json={}).status_code == 400
+
+def test_alterar_status(cliente, criar):
+    tarefa, = criar('a')
+    assert cliente.put(f"/tarefas/{tarefa['id']}/status", json={'status': 'fazendo'}).get_json() == {'sucesso': True}
+    assert cliente.get('/tarefas').get_json()[0]['status'] == 'fazendo'
+    assert cliente.put(f"/tarefas/{tarefa['id']}/status", json={'status': 'feito'}).status_code == 400
+    assert cliente.put("/tarefas/999/status", json={'status': 'fazendo'}).status_code == 404
+
+def test_lixeira_e_restaurar(cliente, criar):
+    tarefa, = criar('a')
+    assert cliente.delete(f"/tarefas/{tarefa['id']}").status_code == 200
+    assert cliente.get('/tarefas').get_json() == []
+    assert ids(cliente.get('/tarefas/excluidas').get_json()) == [tarefa['id']]
+    # Status só muda em tarefa ativa
+    assert cliente.put(f"/tarefas/{tarefa['id']}/status", json={'status': 'fazendo'}).status_code == 404
+    assert cliente.put(f"/tarefas/{tarefa['id']}/recuperar").status_code == 200
+    assert ids(cliente.get('/tarefas').get_json()) == [tarefa['id']]
+    # Restaurar é idempotente; só um id que não existe dá 404
+    assert cliente.put(f"/tarefas/{tarefa['id']}/recuperar").status_code == 200
+    assert cliente.put("/tarefas/999/recuperar").status_code == 404
+
+def test_ids_fora_da_faixa_dao_404(cliente):
+    fora = comum.ID_MAXIMO + 1
+    assert cliente.put(f"/tarefas/{fora}/status", json={'status': 'fazendo'}).status_code == 404
+    assert cliente.delete(f"/tarefas/{fora}").status_code == 404
+    assert cliente.put(f"/tarefas/{fora}/recuperar").status_code == 404
+
+# --- ETag / 304 ---
+
+def test_etag_e_304(cliente, criar):
+    criar('a')
+    primeira = cliente.get('/tarefas')
+    etag = primeira.headers['ETag']
+    assert primeira.headers['Cache-Control'] == 'no-cache'
+    repetida = cliente.get('/tarefas', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.headers['ETag'] == etag
+
+    nova, = criar('b')
+    depois = cliente.get('/tarefas', headers={'If-None-Match': etag})
+    assert depois.status_code == 200
+    assert depois.headers['ETag'] != etag
+    assert nova['id'] in ids(depois.get_json())
+
+def test_etag_acompanha_a_revisao(cliente, criar):
+    criar('a')
+    revisao = cliente.get('/tarefas/revisao').get_json()['revisao']
+    assert cliente.get('/tarefas/stats').headers['ETag'].strip('"') == comum.etag(revisao)
+
+# --- Paginação por keyset ---
+
+def test_paginacao_percorre_tudo_em_ordem(cliente, criar):
+    criadas = ids(criar('a', 'b', 'c', 'd', 'e'))
+    vistas, cursor = [], None
+    while True:
+        url = '/tarefas?limit=2' + (f'&after_id={cursor}' if cursor is not None else '')
+        pagina = cliente.get(url).get_json()
+        assert len(pagina['tarefas']) <= 2
+        vistas += ids(pagina['tarefas'])
+        cursor = pagina['proximo_cursor']
+        if cursor is None:
+            break
+    assert vistas == criadas
+
+def test_paginacao_filtra_por_status(cliente, criar):
+    a, b, c = criar('a', 'b', 'c')
+    cliente.put(f"/tarefas/{b['id']}/status", json={'status': 'concluída'})
+    pagina = cliente.get('/tarefas?status=concluída').get_json()
+    assert ids(pagina['tarefas']) == [b['id']]
+    assert pagina['proximo_cursor'] is None
+
+def test_paginacao_da_lixeira(cliente, criar):
+    a, b = criar('a', 'b')
+    cliente.delete(f"/tarefas/{b['id']}")
+    assert ids(cliente.get('/tarefas/excluidas?limit=10').get_json()['tarefas']) == [b['id']]
+
+def test_paginacao_recusa_parametros_invalidos(cliente):
+    for query in ('limit=0', f'limit={comum.LIMITE_PAGINA_MAXIMO + 1}', 'limit=x', 'after_id=x',
+                  'status=feito', f'after_id={comum.ID_MAXIMO + 1}'):
+        assert cliente.get(f'/tarefas?{query}').status_code == 400, query
+
+# --- Sincronização incremental ---
+
+def test_changes_traz_so_o_que_mudou(cliente, criar):
+    a, b, c = criar('a', 'b', 'c')
+    revisao = cliente.get('/tarefas/revisao').get_json()['revisao']
+    cliente.put(f"/tarefas/{a['id']}/status", json={'status': 'fazendo'})
+    cliente.delete(f"/tarefas/{c['id']}")
+
+    alteracoes = cliente.get(f'/tarefas/changes?since={revisao}').get_json()
+    assert [(t['id'], t['status']) for t in alteracoes['ativas']] == [(a['id'], 'fazendo')]
+    assert ids(alteracoes['excluidas']) == [c['id']]
+    assert alteracoes['revisao'] > revisao
+
+    nada = cliente.get(f"/tarefas/changes?since={alteracoes['revisao']}").get_json()
+    assert nada == {'ativas': [], 'excluidas': [], 'revisao': alteracoes['revisao']}
+
+def test_changes_desde_zero_traz_tudo(cliente, criar):
+    criadas = ids(criar('a', 'b'))
+    assert ids(cliente.get('/tarefas/changes').get_json()['ativas']) == criadas
+
+def test_changes_recusa_since_invalido(cliente):
+    assert cliente.get('/tarefas/changes?since=abc').status_code == 400
+
+# --- Contadores e busca ---
+
+def test_stats(cliente, criar):
+    a, b, c = criar('a', 'b', 'c')
+    cliente.put(f"/tarefas/{a['id']}/status", json={'status': 'fazendo'})
+    cliente.delete(f"/tarefas/{c['id']}")
+    stats = cliente.get('/tarefas/stats').get_json()
+    assert stats['ativas'] == {'total': 2, 'por_status': {'pendente': 1, 'fazendo': 1, 'concluída': 0}}
+    assert stats['excluidas'] == {'total': 1, 'por_status': {'pendente': 1, 'fazendo': 0, 'concluída': 0}}
+
+def test_busca_sem_acentos_e_por_prefixo(cliente, criar):
+    relatorio, _ = criar('Relatório mensal', 'Comprar pão')
+    resultado = cliente.get('/tarefas/search?q=relat').get_json()
+    assert ids(resultado['tarefas']) == [relatorio['id']]
+    assert resultado['truncada'] is False
+    assert cliente.get('/tarefas/search?q=').status_code == 400
+
+# --- Lotes ---
+
+def test_criacao_em_lote(cliente):
+    resposta = cliente.post('/tarefas/batch', json={'tarefas': [
+        {'text': 'a'}, {'text': ''}, {'text': 5}, {'text': ['x']}, {'text': 'b'}, 'não é objeto',
+    ]})
+    resultados = resposta.get_json()['resultados']
+    assert [r['sucesso'] for r in resultados] == [True, False, False, False, True, False]
+    assert [r['tarefa']['titulo'] for r in resultados if r['sucesso']] == ['a', 'b']
+    assert ids(cliente.get('/tarefas').get_json()) == [r['tarefa']['id'] for r in resultados if r['sucesso']]
+
+def test_criacao_em_lote_idempotente(cliente):
+    lote = {'tarefas': [{'text': 'a', 'chave': 'r1:1'}, {'text': 'b', 'chave': 'r1:2'}, {'text': 'a de novo', 'chave': 'r1:1'}]}
+    primeira = [r['tarefa'] for r in cliente.post('/tarefas/batch', json=lote).get_json()['resultados']]
+    # A mesma chave repetida no lote cria uma tarefa só
+    assert primeira[0] == primeira[2]
+    revisao = cliente.get('/tarefas/revisao').get_json()['revisao']
+
+    # Reenvio (resposta perdida): as mesmas tarefas, nada novo e nenhuma revisão nova
+    reenvio = [r['tarefa'] for r in cliente.post('/tarefas/batch', json=lote).get_json()['resultados']]
+    assert reenvio == primeira
+    assert len(cliente.get('/tarefas').get_json()) == 2
+    assert cliente.get('/tarefas/revisao').get_json()['revisao'] == revisao
+
+def test_criacao_em_lote_recusa_chave_invalida(cliente):
+    for chave in ('', 5, 'x' * (comum.LIMITE_CHAVE_CRIACAO + 1)):
+        assert cliente.post('/tarefas/batch', json={'tarefas': [{'text': 'a', 'chave': chave}]}).status_code == 400
+
+def test_lote_vazio_ou_grande_demais(cliente):
+    assert cliente.post('/tarefas/batch', json={'tarefas': []}).status_code == 400
+    assert cliente.post('/tarefas/batch', json={}).status_code == 400
+    grande = {'tarefas': [{'text': 'a'}] * (comum.LIMITE_LOTE + 1)}
+    assert cliente.post('/tarefas/batch', json=grande).status_code == 400
+
+def test_status_em_lote_vale_o_ultimo(cliente, criar):
+    a, b = criar('a', 'b')
+    itens = [
+        {'id': a['id'], 'status': 'fazendo'},
+        {'id': b['id'], 'status': 'feito'},
+        {'id': a['id'], 'status': 'concluída'},
+        {'id': str(b['id']), 'status': 'fazendo'},
+        {'id': True, 'status': 'fazendo'},
+        {'id': comum.ID_MAXIMO + 1, 'status': 'fazendo'},
+        {'id': 999, 'status': 'fazendo'},
+    ]
+    resultados = cliente.put('/tarefas/status/batch', json={'itens': itens}).get_json()['resultados']
+    assert [r['sucesso'] for r in resultados] == [False, False, True, False, False, False, False]
+    assert resultados[0]['erro'] == 'Substituído por um item posterior com o mesmo id'
+    assert resultados[6]['erro'] == 'Tarefa não encontrada'
+    assert {t['id']: t['status'] for t in cliente.get('/tarefas').get_json()} == {a['id']: 'concluída', b['id']: 'pendente'}
+
+def test_lixeira_e_recuperacao_em_lote(cliente, criar):
+    a, b = criar('a', 'b')
+    resultados = cliente.put('/tarefas/lixeira/batch', json={'ids': [a['id'], 999]}).get_json()['resultados']
+    assert resultados == [{'id': a['id'], 'sucesso': True},
+                          {'id': 999, 'sucesso': False, 'erro': 'Tarefa não encontrada'}]
+    assert ids(cliente.get('/tarefas/excluidas').get_json()) == [a['id']]
+
+    resultados = cliente.put('/tarefas/recuperar/batch', json={'ids': [a['id'], b['id'], 999]}).get_json()['resultados']
+    assert [r['sucesso'] for r in resultados] == [True, True, False]
+    assert ids(cliente.get('/tarefas').get_json()) == [a['id'], b['id']]
+
+def test_lotes_de_ids_recusam_ids_que_nao_sao_inteiros(cliente):
+    for ids_invalidos in (['1'], [True], [1.5], [comum.ID_MAXIMO + 1]):
+        assert cliente.put('/tarefas/lixeira/batch', json={'ids': ids_invalidos}).status_code == 400
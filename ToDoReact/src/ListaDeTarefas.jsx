@@ -49,11 +49,20 @@ const TrashedTaskItem = ({ task, onRestoreTask }) => {
   );
 };
 
+// Badge da aba com o total vindo de /tarefas/stats; o detalhe por status aparece ao passar o mouse
+const TabBadge = ({ contagem }) => {
+  if (!contagem) return null;
+  const detalhe = Object.entries(contagem.por_status).map(([status, total]) => `${status}: ${total}`).join(' · ');
+  return <span className="tab-badge" title={detalhe}>{contagem.total}</span>;
+};
+
 // --- Componente Principal ---
 const ListaDeTarefasContainer = () => {
   // MUDANÇA 1: Agora temos 3 estados principais
   const [tasks, setTasks] = useState([]);
   const [trashedTasks, setTrashedTasks] = useState([]);
+  // Totais das abas calculados pelo servidor (contadores), não pelo tamanho das listas
+  const [stats, setStats] = useState(null);
   const [activeTab, setActiveTab] = useState('active'); // 'active' ou 'trashed'
   const [loading, setLoading] = useState(true);
 
@@ -62,9 +71,10 @@ const ListaDeTarefasContainer = () => {
     setLoading(true);
     try {
       // Usamos Promise.all para fazer as duas requisições em paralelo
-      const [activeRes, trashedRes] = await Promise.all([
+      const [activeRes, trashedRes, statsRes] = await Promise.all([
         fetch(`${API_URL}/tarefas`),
-        fetch(`${API_URL}/tarefas/excluidas`)
+        fetch(`${API_URL}/tarefas/excluidas`),
+        fetch(`${API_URL}/tarefas/stats`)
       ]);
       if (!activeRes.ok || !trashedRes.ok) throw new Error("Falha em uma das requisições de API.");
       
@@ -73,6 +83,8 @@ const ListaDeTarefasContainer = () => {
       
       setTasks(activeData);
       setTrashedTasks(trashedData);
+      // API antiga, sem /tarefas/stats: as abas ficam sem badge
+      setStats(statsRes.ok ? await statsRes.json() : null);
     } catch (error) {
       console.error("Erro ao buscar dados:", error);
       alert("Não foi possível carregar os dados. Verifique a conexão com a API.");
@@ -114,10 +126,10 @@ const ListaDeTarefasContainer = () => {
       {/* MUDANÇA 4: Adicionado o container das abas */}
       <div className="tabs-container">
         <button className={`tab-button ${activeTab === 'active' ? 'active' : ''}`} onClick={() => setActiveTab('active')}>
-          Tarefas Ativas ({tasks.length})
+          Tarefas Ativas <TabBadge contagem={stats?.ativas} />
         </button>
         <button className={`tab-button ${activeTab === 'trashed' ? 'active' : ''}`} onClick={() => setActiveTab('trashed')}>
-          Lixeira ({trashedTasks.length})
+          Lixeira <TabBadge contagem={stats?.excluidas} />
         </button>
       </div>
 